@@ -0,0 +1,149 @@
+"""
+Fleet-wide anomaly scoring for drone telemetry.
+
+Every drone is scored on every channel at once, with no candidate list:
+
+  - the recorded channels, RotorRPM and Altitude;
+  - ClimbRate, Speed and Jump, derived from consecutive records of the same
+    drone. Jump is the change of the velocity vector between two steps, so it
+    catches a position that jitters even when the average speed looks normal.
+
+Each channel becomes a robust z-score against the drone's own median and MAD,
+all drones at once with grouped medians. A record's score is its largest
+|z| over the channels. A drone's onset is the first flagged record
+(score > threshold) that starts a window of `window` records in which at
+least `min_fraction` are flagged, so single spikes do not count. A drone is
+compromised when most of its records from the onset on are flagged.
+
+For the compromised drones the statistics are then computed a second time,
+from the records before the onset only. The erratic stretch no longer
+inflates the MAD, so the onset lands on the first erratic record.
+"""
+
+import numpy as np
+import pandas as pd
+
+CHANNELS = ["RotorRPM", "Altitude", "ClimbRate", "Speed", "Jump"]
+MAD_TO_STD = 1.4826        # MAD of a normal distribution times this is its standard deviation
+MEAN_AD_TO_STD = 1.2533    # the same for the mean absolute deviation
+TIED_MAD_RATIO = 0.1       # a MAD below this share of the mean absolute deviation means tied values
+MIN_SCALE_FRACTION = 0.01  # a drone's scale is at least this share of the fleet's median scale
+METERS_PER_DEGREE = 111_320
+
+
+def channels(df):
+    """
+    The CHANNELS of df, which must be sorted by DroneID then Timestamp.
+    Derived channels are NaN where the previous record belongs to another drone.
+    """
+    drone = df["DroneID"].to_numpy()
+    seconds = df["Timestamp"].to_numpy().astype("datetime64[ns]").astype(np.int64) / 1e9
+    lat, lon = df["Latitude"].to_numpy(float), df["Longitude"].to_numpy(float)
+    alt = df["Altitude"].to_numpy(float)
+
+    same = np.zeros(len(df), dtype=bool)
+    same[1:] = drone[1:] == drone[:-1]
+    dt = np.diff(seconds, prepend=np.nan)
+    dt[~same | (dt <= 0)] = np.nan   # first record of a drone, or a repeated timestamp
+
+    # local east/north velocity in m/s
+    vx = np.diff(lon, prepend=np.nan) * np.cos(np.radians(lat)) * METERS_PER_DEGREE / dt
+    vy = np.diff(lat, prepend=np.nan) * METERS_PER_DEGREE / dt
+    jump = np.hypot(np.diff(vx, prepend=np.nan), np.diff(vy, prepend=np.nan))
+    jump[~same] = np.nan
+    return pd.DataFrame({"RotorRPM": df["RotorRPM"].to_numpy(float), "Altitude": alt,
+                         "ClimbRate": np.diff(alt, prepend=np.nan) / dt,
+                         "Speed": np.hypot(vx, vy), "Jump": jump}, index=df.index)
+
+
+def robust_z(values, codes, baseline=None):
+    """
+    |x - median| / (MAD_TO_STD * MAD) per channel, with the median and MAD of
+    each record's drone (codes) taken over the baseline rows (all rows by
+    default). Where more than half the values (nearly) equal the median, as
+    on a quantised GPS track, the MAD collapses and the mean absolute
+    deviation stands in.
+    Missing values score 0; a channel that is constant across the whole fleet
+    is ignored.
+    """
+    base = values if baseline is None else values[baseline]
+    base_codes = codes if baseline is None else codes[baseline]
+    center = base.groupby(base_codes).median()
+    deviation = (base - center.to_numpy()[base_codes]).abs().groupby(base_codes)
+    mad, mean_ad = deviation.median(), deviation.mean()
+    scale = (MAD_TO_STD * mad).where(mad >= TIED_MAD_RATIO * mean_ad, MEAN_AD_TO_STD * mean_ad)
+    typical = scale.where(scale > 0).median()   # per channel, over the drones
+    scale = scale.clip(lower=(MIN_SCALE_FRACTION * typical).fillna(np.inf), axis=1)
+    center = center.reindex(range(codes.max() + 1)).to_numpy()
+    scale = scale.reindex(range(codes.max() + 1)).fillna(np.inf).to_numpy()
+    z = np.abs(values.to_numpy() - center[codes]) / scale[codes]
+    return np.nan_to_num(z, nan=0.0)
+
+
+def onsets(flagged, codes, window, min_fraction):
+    """
+    Row index of each drone's onset, -1 for drones without one. Rows must be
+    grouped by drone (codes non-decreasing) and in time order within a drone.
+    """
+    n = len(flagged)
+    counts = np.concatenate([[0], np.cumsum(flagged)])
+    group_end = np.searchsorted(codes, codes, side="right")
+    end = np.minimum(np.arange(n) + window, group_end)
+    starts = np.flatnonzero(flagged & (counts[end] - counts[:n] >= np.ceil(min_fraction * window)))
+    first = np.full(codes.max() + 1 if n else 0, -1)
+    drones, at = np.unique(codes[starts], return_index=True)   # starts are sorted, so the earliest
+    first[drones] = starts[at]
+    return first
+
+
+def detect(values, codes, threshold, window, min_fraction, baseline=None):
+    """Robust z-scores, record scores, flagged records and onsets (see onsets) of one pass."""
+    z = robust_z(values, codes, baseline)
+    score = z.max(axis=1)
+    flagged = score > threshold
+    return z, score, flagged, onsets(flagged, codes, window, min_fraction)
+
+
+def score_fleet(df, threshold=4.0, window=20, min_fraction=0.5, compromised_fraction=0.5):
+    """
+    One row per drone, sorted by onset (drones without one last): Onset
+    timestamp, FlaggedAfter (share of flagged records from the onset on), Score
+    (median record score from the onset on), Channel (the channel with the
+    largest median |z| from the onset on) and Compromised.
+    """
+    df = df.sort_values(["DroneID", "Timestamp"], kind="stable")
+    codes, drones = pd.factorize(df["DroneID"], sort=True)
+    values = channels(df)
+    index, group_start = np.arange(len(df)), np.searchsorted(codes, codes)
+
+    def share_after(flagged, first):
+        after = first[codes]
+        after = (after >= 0) & (index >= after)
+        share = pd.Series(flagged[after]).groupby(codes[after]).mean()
+        return after, share.reindex(range(len(drones)), fill_value=0.0).to_numpy()
+
+    _, _, flagged, first = detect(values, codes, threshold, window, min_fraction)
+    _, flagged_after = share_after(flagged, first)
+    compromised = (first >= 0) & (flagged_after >= compromised_fraction)
+
+    # Second pass: a compromised drone's statistics come from before its onset
+    # (if that leaves a full window), the other drones keep all their records.
+    cut = np.where(compromised, first, -1)[codes]
+    baseline = (cut - group_start < window) | (index < cut)
+    z, score, flagged, refined = detect(values, codes, threshold, window, min_fraction, baseline)
+    first = np.where(compromised & (refined >= 0), refined, first)
+    after, flagged_after = share_after(flagged, first)
+
+    post = pd.DataFrame(z[after], columns=CHANNELS)
+    post["Score"] = score[after]
+    summary = post.groupby(codes[after]).median().reindex(range(len(drones)))
+
+    timestamps = df["Timestamp"].to_numpy()
+    report = pd.DataFrame({
+        "Onset": np.where(first >= 0, timestamps[np.maximum(first, 0)], np.datetime64("NaT")),
+        "FlaggedAfter": flagged_after,
+        "Score": summary["Score"].fillna(0.0).to_numpy(),
+        "Channel": summary[CHANNELS].dropna().idxmax(axis=1).reindex(summary.index).to_numpy(),
+        "Compromised": compromised,
+    }, index=pd.Index(drones, name="DroneID"))
+    return report.sort_values(["Onset", "Score"], ascending=[True, False], na_position="last")
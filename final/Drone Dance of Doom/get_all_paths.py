@@ -3,9 +3,14 @@ import matplotlib.pyplot as plt
 import os
 import sys
 
+from raster import render
+
 # --- Configuration ---
 CSV_FILE = 'drone_telemetry.csv'
 OUTPUT_DIRECTORY = 'drone_flight_paths'
+PLOT_MODE = "raster"      # "raster": density raster, cost independent of the point count; "points": every record
+RASTER_SHAPE = (700, 900)  # (rows, cols) of the density raster
+LINE_TOLERANCE = None     # degrees; overlay the Douglas-Peucker simplified path, None for none
 
 print(f"--- [START] Drone Path Plotter ---")
 print(f"This script will generate a separate flight path plot for *every* drone.")
@@ -53,12 +58,16 @@ for drone_id in drone_ids:
     plt.figure(figsize=(9, 7))
     
     # Plot Latitude vs. Longitude
-    plt.plot(drone_data['Longitude'], 
-             drone_data['Latitude'], 
-             marker='.',       # Use a small marker for each point
-             markersize=2,       # Make the marker size small
-             linestyle='-',    # Connect the points with a line
-             linewidth=0.5)     # Make the line thin
+    if PLOT_MODE == "raster":
+        render(plt.gca(), [(drone_data['Longitude'].to_numpy(), drone_data['Latitude'].to_numpy())],
+               ['tab:blue'], shape=RASTER_SHAPE, line_tolerance=LINE_TOLERANCE, aspect='equal')
+    else:
+        plt.plot(drone_data['Longitude'], 
+                 drone_data['Latitude'], 
+                 marker='.',       # Use a small marker for each point
+                 markersize=2,       # Make the marker size small
+                 linestyle='-',    # Connect the points with a line
+                 linewidth=0.5)     # Make the line thin
     
     # Add Start and End points for clarity
     # Start point
@@ -0,0 +1,115 @@
+"""
+Raster rendering for dense drone telemetry.
+
+plt.plot(..., marker='o') draws one marker per telemetry point, so the cost
+grows with the number of points, and millions of points merge into a blot.
+Here each drone's points are binned into a fixed longitude/latitude grid
+with np.bincount. Every grid is shaded by log density in the drone's own
+colour, and the layers are composited in order, so the drawing cost depends
+on the raster size, not on the point count.
+
+simplify() is a Douglas-Peucker pass. It thins a path to the vertices that
+matter at a given tolerance, for optional line overlays on the raster.
+"""
+
+import numpy as np
+
+MIN_ALPHA = 0.35   # opacity of a cell hit once, so sparse paths stay visible
+
+
+def extent_of(paths, pad=0.02):
+    """(lon_min, lon_max, lat_min, lat_max) around every (lon, lat) path, padded."""
+    lon = np.concatenate([np.asarray(x, dtype=float) for x, _ in paths])
+    lat = np.concatenate([np.asarray(y, dtype=float) for _, y in paths])
+    x0, x1, y0, y1 = lon.min(), lon.max(), lat.min(), lat.max()
+    dx, dy = (x1 - x0) * pad or 1e-6, (y1 - y0) * pad or 1e-6
+    return x0 - dx, x1 + dx, y0 - dy, y1 + dy
+
+
+def density(lon, lat, extent, shape):
+    """Point counts on a (rows, cols) grid over extent; row 0 is the northern edge."""
+    x0, x1, y0, y1 = extent
+    rows, cols = shape
+    lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+    inside = (lon >= x0) & (lon <= x1) & (lat >= y0) & (lat <= y1)
+    col = np.minimum(((lon[inside] - x0) / (x1 - x0) * cols).astype(np.intp), cols - 1)
+    row = np.minimum(((y1 - lat[inside]) / (y1 - y0) * rows).astype(np.intp), rows - 1)
+    return np.bincount(row * cols + col, minlength=rows * cols).reshape(rows, cols)
+
+
+def shade(counts, rgb):
+    """An RGBA layer of one colour whose opacity follows log density."""
+    rgba = np.zeros(counts.shape + (4,), dtype=np.float32)
+    rgba[..., :3] = rgb[:3]
+    top = counts.max()
+    if top:
+        alpha = MIN_ALPHA + (1 - MIN_ALPHA) * np.log1p(counts) / np.log1p(top)
+        rgba[..., 3] = np.where(counts > 0, alpha, 0)
+    return rgba
+
+
+def composite(layers, background=(1.0, 1.0, 1.0)):
+    """Stacks RGBA layers with the "over" operator, later layers on top, onto background."""
+    out = np.empty(layers[0].shape[:2] + (3,), dtype=np.float32)
+    out[:] = background
+    for layer in layers:
+        alpha = layer[..., 3:]
+        out *= 1 - alpha
+        out += layer[..., :3] * alpha
+    return out
+
+
+def simplify(lon, lat, tolerance):
+    """
+    Indices of the Douglas-Peucker simplification of a path: every dropped
+    point is within tolerance (in degrees) of the simplified line.
+    """
+    x, y = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+    n = len(x)
+    if n < 3:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        length = np.hypot(dx, dy)
+        if length:
+            dist = np.abs(px * dy - py * dx) / length
+        else:   # the path came back to where it started
+            dist = np.hypot(px, py)
+        i = int(dist.argmax())
+        if dist[i] > tolerance:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.flatnonzero(keep)
+
+
+def render(ax, paths, colors, labels=None, shape=(700, 1000), extent=None,
+           line_tolerance=None, aspect="auto"):
+    """
+    Draws (lon, lat) paths on ax as composited density layers, in the given
+    order and colours. With line_tolerance, each path is also drawn as a thin
+    line simplified to that tolerance. Returns the extent used.
+    """
+    from matplotlib.colors import to_rgba
+    from matplotlib.patches import Patch
+
+    colors = [to_rgba(c) for c in colors]
+    extent = extent or extent_of(paths)
+    layers = [shade(density(x, y, extent, shape), color) for (x, y), color in zip(paths, colors)]
+    ax.imshow(composite(layers), extent=extent, origin="upper", aspect=aspect,
+              interpolation="nearest")
+    if line_tolerance is not None:
+        for (x, y), color in zip(paths, colors):
+            idx = simplify(x, y, line_tolerance)
+            ax.plot(np.asarray(x)[idx], np.asarray(y)[idx], color=color, linewidth=0.6, alpha=0.8)
+    if labels:
+        ax.legend(handles=[Patch(color=c, label=l) for c, l in zip(colors, labels)])
+    return extent
@@ -1,22 +1,28 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-from scipy.stats import zscore
 import numpy as np
 import sys
 
+from anomaly import CHANNELS, score_fleet
+from sg_ai_ctf_25 import trace
+
 # --- Configuration ---
 CSV_FILE = 'drone_telemetry.csv'
-ZSCORE_THRESHOLD = 1.0  # A standard threshold for detecting outliers
+ZSCORE_THRESHOLD = 4.0  # Robust z-score (against the drone's own median/MAD) that flags a record
+ONSET_WINDOW = 20       # Records that must stay mostly flagged for an onset to count
+ONSET_FRACTION = 0.5    # Share of ONSET_WINDOW that must be flagged
+COMPROMISED_FRACTION = 0.5  # Share of records flagged from the onset on for a drone to count as hijacked
 FLAG_FORMAT = "AI2025{{{}}}"
-CANDIDATE_DRONES = ['DRN010', 'DRN032', 'DRN055', 'DRN069', 'DRN090'] # Filter to these drones only
+PLOT_MODE = "raster"      # "raster": density layers (cost set by RASTER_SHAPE); "points": one marker per record
+RASTER_SHAPE = (700, 1000)  # (rows, cols) of the density raster, about the figure's pixel size
+LINE_TOLERANCE = None     # degrees; draw Douglas-Peucker simplified paths over the raster, None for none
 
 print("--- [START] Drone Dance of Doom CTF Solver ---")
 
 # --- Step 1: Load Data ---
 print(f"\n[Step 1] Loading telemetry data from '{CSV_FILE}'...")
+trace.step("load")
 try:
     df = pd.read_csv(CSV_FILE)
-    df = df[df['DroneID'].isin(CANDIDATE_DRONES)]
 except FileNotFoundError:
     print(f"Error: File not found: '{CSV_FILE}'")
     print("Please make sure the script is in the same directory as the CSV file.")
@@ -25,43 +31,41 @@ except FileNotFoundError:
 # Convert Timestamp column to datetime objects for proper sorting and filtering
 df['Timestamp'] = pd.to_datetime(df['Timestamp'])
 print(f"Successfully loaded {len(df)} telemetry records.")
+trace.count(len(df))
 
 # --- Step 2: Detect Instability ---
 print(f"\n[Step 2] Detecting instability...")
-print(f"Calculating Z-score for RotorRPM for each drone.")
-print(f"Instability threshold set to: Z-score > {ZSCORE_THRESHOLD}")
-
-# Calculate the Z-score for 'RotorRPM' *within each drone's group*.
-# This is crucial so we compare a drone's RPM against its own normal behavior.
-# 'transform' applies the result back to the original DataFrame's shape.
-df['RPM_ZScore'] = df.groupby('DroneID')['RotorRPM'].transform(
-    lambda x: zscore(x, nan_policy='omit')
-)
-
-# If a drone had 0 variance (std=0), zscore returns NaN. We fill these with 0.
-df['RPM_ZScore'] = df['RPM_ZScore'].fillna(0)
-
-# Filter to find all data points that are "unstable"
-unstable_points = df[df['RPM_ZScore'].abs() > ZSCORE_THRESHOLD]
-
-if unstable_points.empty:
-    print("Error: No unstable points found with the current threshold.")
-    print("You may need to adjust the ZSCORE_THRESHOLD.")
+trace.step("score", items=len(df))
+print(f"Scoring every drone on {', '.join(CHANNELS)}.")
+print(f"Instability threshold set to: robust Z-score > {ZSCORE_THRESHOLD}, "
+      f"sustained over {ONSET_FRACTION:.0%} of {ONSET_WINDOW} records")
+
+# Each channel is compared against the drone's *own* median and MAD, so a
+# drone that always flies fast or high is not mistaken for an unstable one.
+fleet = score_fleet(df, threshold=ZSCORE_THRESHOLD, window=ONSET_WINDOW,
+                    min_fraction=ONSET_FRACTION, compromised_fraction=COMPROMISED_FRACTION)
+compromised = fleet[fleet['Compromised']]
+
+if compromised.empty:
+    print("Error: No drone shows sustained instability with the current threshold.")
+    print("You may need to adjust ZSCORE_THRESHOLD or ONSET_WINDOW.")
     sys.exit(1)
 
-print(f"Found {len(unstable_points)} total unstable data points across all drones.")
+print(f"Found {len(compromised)} compromised drones out of {len(fleet)}.")
+print(fleet.head(len(compromised) + 5).to_string())
 
 # --- Step 3: Find First Instability Timestamp ---
 print("\n[Step 3] Finding the first moment of instability for each drone...")
+trace.step("first_instability")
 
-# From the unstable points, group by drone and find the *minimum* (earliest) timestamp
-first_instability_times = unstable_points.groupby('DroneID')['Timestamp'].min()
+first_instability_times = compromised['Onset']
 
 print("Drones that show instability and their first hijack time:")
 print(first_instability_times)
 
 # --- Step 4: Sort the Chaos ---
 print("\n[Step 4] Sorting compromised drones by hijack time...")
+trace.step("sort")
 
 # Sort the drones by their first instability time (the values in the Series)
 sorted_drones = first_instability_times.sort_values()
@@ -71,6 +75,8 @@ print(sorted_drones)
 
 # --- Step 5: Decode the Skywriting (Plotting) ---
 print("\n[Step 5] Generating plot to decode the skywriting...")
+trace.step("plot")
+import matplotlib.pyplot as plt   # only the plot needs it; keeps the analysis start-up light
 print("The plot will show the combined path of the hijacked drones AFTER they became unstable.")
 
 # Set up the plot
@@ -80,24 +86,35 @@ plt.xlabel('Longitude')
 plt.ylabel('Latitude')
 plt.grid(True)
 
-# Iterate through the drones *in the sorted order*
+# Collect each drone's path *at or after* its unique instability time, in hijack order
+paths, labels = [], []
 for drone_id, start_time in sorted_drones.items():
     # Get all data for this specific drone
     drone_data = df[df['DroneID'] == drone_id]
     
     # Filter for data *at or after* its unique instability time
     path_data = drone_data[drone_data['Timestamp'] >= start_time].sort_values(by='Timestamp')
-    
-    # Plot this drone's path on the main graph
-    plt.plot(path_data['Longitude'], 
-             path_data['Latitude'], 
-             label=f"{drone_id} (from {start_time.time()})",
-             marker='o',  # Add markers to see points
-             markersize=2)
-
-plt.legend()
+    paths.append((path_data['Longitude'].to_numpy(), path_data['Latitude'].to_numpy()))
+    labels.append(f"{drone_id} (from {start_time.time()})")
+
+if PLOT_MODE == "raster":
+    from raster import render
+    # one colour per drone, running through the colour map in hijack order
+    colors = plt.cm.plasma(np.linspace(0, 0.85, max(len(paths), 1)))
+    render(plt.gca(), paths, colors, labels, shape=RASTER_SHAPE, line_tolerance=LINE_TOLERANCE)
+else:
+    for (lon, lat), label in zip(paths, labels):
+        # Plot this drone's path on the main graph
+        plt.plot(lon, 
+                 lat, 
+                 label=label,
+                 marker='o',  # Add markers to see points
+                 markersize=2)
+    plt.legend()
+
 plot_filename = 'drone_skywriting_plot.png'
 plt.savefig(plot_filename)
+trace.finish()
 
 print(f"\nPlot saved to '{plot_filename}'.")
 print(f"==> Please open '{plot_filename}' to see the secret word. <_==")
\ No newline at end of file
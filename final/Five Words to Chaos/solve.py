@@ -1,8 +1,11 @@
 import pandas as pd
 import requests
-import time
+import json
+import math
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from sg_ai_ctf_25.oracle import Oracle
 
 # --- Configuration ---
 # Use the environment variable for the API URL if it exists, otherwise use the default.
@@ -10,6 +13,13 @@ API_URL = os.environ.get("API_URL", "http://advertext-tdh9dv.aictf.sg:7000")
 TEAM_NAME = "toilet"
 DATASET_PATH = "dataset.csv"
 MAX_WORKERS = 10 # Number of parallel threads to run. Adjust based on your connection.
+TARGET_RATE = 0.90        # the flag needs this share of the dataset flipped
+JOURNAL_PATH = "journal.jsonl"  # every answer is appended here; a restarted run resumes from it
+MAX_QUERIES = None        # total /query budget across runs, None for unlimited
+DEMOTE_AFTER = 40         # queries after which a sentence only runs when no cheaper one is left
+LOGIT_COST = 4.0          # estimated queries per unit of log-odds still to overcome
+PER_SENTENCE_IN_FLIGHT = 1  # >1 speculates; queries after the flipping one are wasted
+MAX_ERRORS_IN_A_ROW = 50  # request errors without a single answer in between before giving up
 
 # A prioritized list of words to try for perturbations.
 # Negations and strong sentiment words are most likely to work.
@@ -21,22 +31,23 @@ ATTACK_WORDS = NEGATION_WORDS + POSITIVE_WORDS + NEGATIVE_WORDS
 
 # --- API Communication ---
 
-# Use a single session object for all threads for efficiency
-session = requests.Session()
+# One shared client for all threads: pooled connections, retries with backoff on
+# 429/5xx, and a disk cache so repeated sentiment queries are answered locally
+oracle = Oracle(max_concurrency=MAX_WORKERS, cache_dir=".oracle_cache")
 
 def query_sentiment(sentence):
-    """Queries the server to get the sentiment of a sentence."""
-    try:
-        response = session.post(f"{API_URL}/query", json={"sentence": sentence}, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        if data.get("valid"):
-            return data["scores"]["label"]
-    except requests.exceptions.RequestException as e:
-        # Suppress error printing for speed, but you can re-enable for debugging
-        # print(f"  [!] API query error: {e}")
-        pass
-    return None
+    """
+    Queries the server; returns (label, confidence in that label), or
+    (None, None) when the server says the sentence is invalid. Request errors
+    (after the client's own retries) raise requests.RequestException, so the
+    caller can try again instead of taking them for an answer.
+    """
+    response = oracle.post(f"{API_URL}/query", json={"sentence": sentence}, timeout=5, cache=True)
+    response.raise_for_status()
+    data = response.json()
+    if data.get("valid"):
+        return data["scores"]["label"], data["scores"]["score"]
+    return None, None
 
 def submit_adversarial(sentence_id, adversarial_sentence):
     """Submits the adversarial sentence to the server."""
@@ -46,7 +57,8 @@ def submit_adversarial(sentence_id, adversarial_sentence):
             "adv": adversarial_sentence,
             "user": TEAM_NAME
         }
-        response = session.post(f"{API_URL}/submit", json=payload, timeout=10)
+        # a submission is not resent after a timeout or 5xx: the server may have recorded it already
+        response = oracle.post(f"{API_URL}/submit", json=payload, timeout=10, idempotent=False)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException:
@@ -93,45 +105,264 @@ def generate_candidates_prioritized(words, original_label):
             yield " ".join(words[:i] + words[i+1:])
 
 
-def solve_sentence(sentence_id, original_sentence):
+# --- Scheduling ---
+
+class Sentence:
+    """Search state of one dataset row; only the scheduler thread touches it."""
+
+    def __init__(self, sentence_id, sentence):
+        self.id, self.sentence = sentence_id, sentence
+        self.words = sentence.split()
+        self.original_label = self.target_label = None
+        self.tried = {sentence}
+        self.queries = 0
+        self.best_p = None         # lowest probability of the original label seen so far
+        self.flipped = None        # a candidate the classifier flipped, waiting for /submit
+        self.in_flight = 0
+        self.solved = self.exhausted = False
+        self._candidates = None
+        self._retry = []           # candidates whose query failed, sent again before new ones
+
+    def record_label(self, label, score):
+        self.queries += 1
+        if label is None:
+            self.exhausted = True  # no label, nothing to attack
+            return
+        self.original_label = label
+        self.target_label = "POSITIVE" if label == "NEGATIVE" else "NEGATIVE"
+        self.best_p = score
+
+    def record_query(self, candidate, label, score):
+        self.tried.add(candidate)
+        self.queries += 1
+        if label is None:
+            return
+        p = score if label == self.original_label else 1 - score
+        self.best_p = min(self.best_p, p)
+        if label == self.target_label and not self.solved:
+            self.flipped = candidate
+
+    @property
+    def demoted(self):
+        return self.queries >= DEMOTE_AFTER
+
+    def estimated_cost(self):
+        """Queries spent plus the log-odds still between the best candidate and a flip."""
+        if self.original_label is None:
+            return 0.0  # the label query is cheap and tells us how hard the sentence is
+        p = min(max(self.best_p, 1e-6), 1 - 1e-6)
+        return self.queries + LOGIT_COST * max(math.log(p / (1 - p)), 0.0)
+
+    def retry(self, candidate):
+        """Puts back a candidate whose query failed, so it is not counted as tried."""
+        self.tried.discard(candidate)
+        self._retry.append(candidate)
+
+    def next_candidate(self):
+        while self._retry:
+            candidate = self._retry.pop()
+            if candidate not in self.tried:
+                self.tried.add(candidate)
+                return candidate
+        if self._candidates is None:
+            self._candidates = generate_candidates_prioritized(self.words, self.original_label)
+        for candidate in self._candidates:
+            if candidate not in self.tried:
+                self.tried.add(candidate)
+                return candidate
+        self.exhausted = True
+        return None
+
+
+class Journal:
+    """Append-only JSON lines of every label, query and submission."""
+
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "a") if path else None
+
+    def replay(self):
+        if not self.path or not os.path.exists(self.path):
+            return []
+        events = []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    pass  # a line cut short by a crash
+        return events
+
+    def write(self, **event):
+        if self.f:
+            self.f.write(json.dumps(event) + "\n")
+            self.f.flush()
+
+    def close(self):
+        if self.f:
+            self.f.close()
+
+
+def success_message(state, candidate, result):
+    msg = (
+        f"ID #{state.id}: SUCCESS!\n"
+        f"  Original ({state.original_label}): '{state.sentence}'\n"
+        f"  Adversary ({state.target_label}): '{candidate}'\n"
+        f"  Solved: {result.get('solved')}, Rate: {result.get('current_success_rate')}"
+    )
+    if result.get("flag"):
+        msg += f"\n\n[***] FLAG FOUND: {result['flag']} [***]"
+    return msg
+
+
+class Scheduler:
     """
-    Attempts to find a 1-edit adversarial example for a single sentence.
-    This is now a greedy function that returns the first success.
+    Interleaves queries across all sentences, cheapest estimated cost-to-flip
+    first. A sentence that has used DEMOTE_AFTER queries only gets more when
+    no undemoted sentence has work. Stops as soon as /submit reports the
+    target number of solved sentences, a flag, or the query budget is spent.
     """
-    original_label = query_sentiment(original_sentence)
-    if not original_label:
-        return f"ID #{sentence_id}: Could not get original label. Skipping."
 
-    target_label = "POSITIVE" if original_label == "NEGATIVE" else "NEGATIVE"
-    
-    words = original_sentence.split()
-    tried_sentences = {original_sentence}
+    def __init__(self, rows, target_solved, journal):
+        self.states = {str(sid): Sentence(sid, sentence) for sid, sentence in rows}
+        self.target_solved = target_solved
+        self.journal = journal
+        self.server_solved = 0
+        self.flag = None
+        self.queries = 0
+        self.errors_in_a_row = 0
+        self._resume(journal.replay())
 
-    # Greedily check all prioritized 1-edit candidates
-    for candidate in generate_candidates_prioritized(words, original_label):
-        if candidate in tried_sentences:
-            continue
-        
-        tried_sentences.add(candidate)
-        
-        candidate_label = query_sentiment(candidate)
-        
-        if candidate_label == target_label:
-            result = submit_adversarial(sentence_id, candidate)
-            if result and result.get('success'):
-                success_msg = (
-                    f"ID #{sentence_id}: SUCCESS!\n"
-                    f"  Original ({original_label}): '{original_sentence}'\n"
-                    f"  Adversary ({target_label}): '{candidate}'\n"
-                    f"  Solved: {result.get('solved')}, Rate: {result.get('current_success_rate')}"
-                )
-                if result.get("flag"):
-                    success_msg += f"\n\n[***] FLAG FOUND: {result['flag']} [***]"
-                return success_msg, result.get("flag")
-            # If submission failed but label was correct, it might be a server issue. Stop trying.
-            break 
-            
-    return f"ID #{sentence_id}: Failed to find a 1-edit solution.", None
+    def _resume(self, events):
+        for e in events:
+            state = self.states.get(e["id"])
+            if state is None:
+                continue
+            if e["event"] == "label":
+                state.record_label(e["label"], e["score"])
+            elif e["event"] == "query":
+                state.record_query(e["candidate"], e["label"], e["score"])
+            elif e["event"] == "submit":
+                state.flipped = None
+                if e.get("success"):
+                    state.solved = True
+                self.server_solved = max(self.server_solved, e.get("solved") or 0)
+                self.flag = self.flag or e.get("flag")
+        self.queries = sum(s.queries for s in self.states.values())
+        if events:
+            solved = sum(s.solved for s in self.states.values())
+            print(f"Resumed from {self.journal.path}: {len(events)} events, {self.queries} queries, "
+                  f"{solved} solved")
+
+    def done(self):
+        return self.flag is not None or self.server_solved >= self.target_solved
+
+    def _next_task(self):
+        """(state, kind, sentence) of the most promising work, or None."""
+        while True:
+            best = None
+            for state in self.states.values():
+                if state.solved or state.exhausted or state.in_flight >= PER_SENTENCE_IN_FLIGHT:
+                    continue
+                if state.flipped is not None:
+                    return state, "submit", state.flipped  # a confirmed flip outranks any query
+                key = (state.demoted, state.estimated_cost())
+                if best is None or key < best[0]:
+                    best = key, state
+            if best is None or (MAX_QUERIES is not None and self.queries >= MAX_QUERIES):
+                return None
+            state = best[1]
+            if state.original_label is None:
+                return state, "label", state.sentence
+            candidate = state.next_candidate()
+            if candidate is not None:
+                return state, "query", candidate
+            # that sentence just ran out (next_candidate marked it exhausted); pick another
+
+    def _fail(self, state, kind, sentence, exc):
+        """Puts the work of a failed request back in the queue; nothing is journaled."""
+        state.in_flight -= 1
+        self.errors_in_a_row += 1
+        if kind == "query":
+            state.retry(sentence)
+        # a failed label query leaves original_label unset, so it is simply scheduled again
+        if self.errors_in_a_row >= MAX_ERRORS_IN_A_ROW:
+            raise RuntimeError(f"{self.errors_in_a_row} request errors in a row, last: {exc}")
+        return None
+
+    def _finish(self, state, kind, sentence, result):
+        """Applies one answer; returns a message to print, if any."""
+        state.in_flight -= 1
+        if kind != "submit":
+            self.errors_in_a_row = 0
+        if kind == "label":
+            label, score = result
+            self.journal.write(event="label", id=str(state.id), label=label, score=score)
+            state.record_label(label, score)
+            if label is None:
+                return f"ID #{state.id}: Could not get original label. Skipping."
+        elif kind == "query":
+            label, score = result
+            self.journal.write(event="query", id=str(state.id), candidate=sentence, label=label, score=score)
+            state.record_query(sentence, label, score)
+        else:
+            state.flipped = None
+            if result is None:
+                return f"ID #{state.id}: submission failed, continuing the search."
+            self.journal.write(event="submit", id=str(state.id), adv=sentence,
+                               success=bool(result.get("success")), solved=result.get("solved"),
+                               rate=result.get("current_success_rate"), flag=result.get("flag"))
+            self.server_solved = max(self.server_solved, result.get("solved") or 0)
+            self.flag = self.flag or result.get("flag")
+            if result.get("success"):
+                state.solved = True
+                return success_message(state, sentence, result)
+            # rejected on similarity or fluency: keep searching this sentence
+            return f"ID #{state.id}: flip rejected ({result.get('error')}), continuing."
+        if state.exhausted and not state.solved:
+            return f"ID #{state.id}: Failed to find a 1-edit solution."
+        return None
+
+    def run(self):
+        pending = {}
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            while not self.done():
+                while len(pending) < MAX_WORKERS:
+                    task = self._next_task()
+                    if task is None:
+                        break
+                    state, kind, sentence = task
+                    state.in_flight += 1
+                    if kind == "submit":
+                        future = executor.submit(submit_adversarial, state.id, sentence)
+                    else:
+                        self.queries += 1
+                        future = executor.submit(query_sentiment, sentence)
+                    pending[future] = task
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    state, kind, sentence = pending.pop(future)
+                    try:
+                        message = self._finish(state, kind, sentence, future.result())
+                    except requests.exceptions.RequestException as exc:
+                        message = self._fail(state, kind, sentence, exc)
+                    except Exception as exc:
+                        state.in_flight -= 1
+                        message = f"A task generated an exception: {exc}"
+                    if message:
+                        print(message, flush=True)
+            # outstanding queries cannot be recalled, but their answers no longer matter
+            for future in pending:
+                future.cancel()
+
+    def summary(self):
+        states = self.states.values()
+        return (f"solved {sum(s.solved for s in states)}/{len(self.states)} "
+                f"(server: {self.server_solved}, target {self.target_solved}), "
+                f"{self.queries} queries, {sum(s.demoted for s in states)} demoted, "
+                f"{sum(s.exhausted and not s.solved for s in states)} out of candidates")
 
 # --- Main Execution ---
 
@@ -143,23 +374,17 @@ if __name__ == "__main__":
         print(f"[!] Error: The dataset file '{DATASET_PATH}' was not found.")
         exit(1)
 
-    tasks = []
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        # Submit all sentences to the executor
-        for _, row in df.iterrows():
-            tasks.append(executor.submit(solve_sentence, row['id'], row['sentence']))
-        
-        # Process results as they complete
-        for future in as_completed(tasks):
-            try:
-                result, flag = future.result()
-                print(result)
-                if flag:
-                    print("\nFlag found! Shutting down...")
-                    # This will cancel pending tasks and exit
-                    executor.shutdown(wait=False, cancel_futures=True)
-                    break
-            except Exception as exc:
-                print(f"A task generated an exception: {exc}")
+    journal = Journal(JOURNAL_PATH)
+    scheduler = Scheduler(zip(df["id"], df["sentence"]), math.ceil(TARGET_RATE * len(df)), journal)
+    try:
+        scheduler.run()
+    finally:
+        journal.close()
 
+    if scheduler.flag:
+        print(f"\n[***] FLAG FOUND: {scheduler.flag} [***]")
+    elif scheduler.done():
+        print("\nTarget success rate reached. Shutting down...")
+    print(scheduler.summary())
+    print(oracle.metrics.render())
     print("\n--- Script Finished ---")
@@ -1,10 +1,13 @@
 import os
 import sys
+from contextlib import ExitStack
 import numpy as np
-from PIL import Image, ImageDraw
-from skimage.metrics import structural_similarity as ssim
+from PIL import Image
 from scipy.optimize import linear_sum_assignment  # For optimal assignment
 
+from sg_ai_ctf_25 import trace
+from tile_writer import DeepZoomWriter, PngWriter
+
 # --- Configuration ---
 SLICES_DIR = 'sliced_images'
 REF_IMAGE_PATH = 'reference.jpg'
@@ -17,12 +20,286 @@ GRID_SIZE = 32
 HIGHLIGHT_THRESHOLD = 0.95
 # ---------------------
 
+# --- Output ---
+# Reconstructions larger than this are streamed to disk one row of pieces at
+# a time instead of being built in memory.
+STREAM_OUTPUT_ABOVE_BYTES = 512 * 2 ** 20
+# Also write a DeepZoom tile pyramid (solution_reconstructed.dzi plus
+# solution_reconstructed_files/) for zoomable viewers such as OpenSeadragon.
+OUTPUT_PYRAMID = False
+HIGHLIGHT_RGB = (255, 0, 0)
+HIGHLIGHT_WIDTH = 2
+
+# --- Orientation-invariant matching ---
+# With MATCH_ORIENTATIONS the slices may be rotated or mirrored: each piece is
+# scored in all eight dihedral orientations (four for non-square pieces) and
+# placed in the best one.
+MATCH_ORIENTATIONS = False
+# Orientations per piece/slot pair that get an exact SSIM after a cheap screen
+# on the shared local-mean maps; len(orientations) scores all of them exactly.
+ORIENTATION_CANDIDATES = 2
+SSIM_CHUNK_BYTES = 256 * 2 ** 20   # working set per batch of piece/slot pairs
+
+# skimage.metrics.structural_similarity defaults (uniform 7x7 window,
+# sample covariance) for 8-bit images
+SSIM_WIN = 7
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+SSIM_COV_NORM = SSIM_WIN ** 2 / (SSIM_WIN ** 2 - 1)
+
+
+def dihedral(images, k):
+    """Orientation k (0-7) of images on the last three axes (..., h, w, C):
+    mirrored left-right when k >= 4, then k % 4 quarter turns."""
+    if k >= 4:
+        images = images[..., :, ::-1, :]
+    return np.rot90(images, k % 4, axes=(-3, -2))
+
+
+def piece_orientations(piece_w, piece_h):
+    """Dihedral orientations that keep the piece shape."""
+    return tuple(range(8)) if piece_w == piece_h else (0, 2, 4, 6)
+
+
+def window_mean(a):
+    """Mean of every SSIM_WIN x SSIM_WIN window inside the image (axes -3, -2)."""
+    for axis in (-3, -2):
+        c = np.moveaxis(np.cumsum(a, axis=axis), axis, 0)
+        out = np.empty((c.shape[0] - SSIM_WIN + 1,) + c.shape[1:], dtype=c.dtype)
+        out[0] = c[SSIM_WIN - 1]
+        np.subtract(c[SSIM_WIN:], c[:-SSIM_WIN], out=out[1:])
+        a = np.moveaxis(out, 0, axis)
+    return a / SSIM_WIN ** 2
+
+
+def window_stats(images):
+    """Local means and (sample) variances of a (n, h, w, C) stack."""
+    images = images.astype(np.float64)
+    mu = window_mean(images)
+    var = SSIM_COV_NORM * (window_mean(images * images) - mu * mu)
+    return mu, var
+
+
+def pair_ssim(x, mu_x, var_x, y, mu_y, var_y):
+    """Mean SSIM over windows and channels for broadcastable image/statistic stacks."""
+    mu_xy = mu_x * mu_y
+    cov = SSIM_COV_NORM * (window_mean(x * y) - mu_xy)
+    s = ((2 * mu_xy + SSIM_C1) * (2 * cov + SSIM_C2)
+         / ((mu_x * mu_x + mu_y * mu_y + SSIM_C1) * (var_x + var_y + SSIM_C2)))
+    return s.mean(axis=(-3, -2, -1))
+
+
+def batched_ssim(pieces, slots, orientations=(0,), candidates=ORIENTATION_CANDIDATES):
+    """
+    SSIM of every piece against every slot, equal to
+    structural_similarity(piece, slot, channel_axis=-1, data_range=255) up to
+    float rounding, computed over batches of pairs instead of one call each.
+
+    Pieces are tried in each of `orientations`. Their window statistics are
+    computed once: the window is symmetric, so the statistics of an oriented
+    piece are the oriented statistics. The orientations are screened for
+    every pair with a single matrix product on the local-mean maps, and only
+    the best `candidates` per pair get the exact SSIM.
+
+    Returns (scores, orientation) arrays of shape (len(pieces), len(slots)).
+    """
+    n, m = len(pieces), len(slots)
+    x = pieces.astype(np.float64)
+    y = slots.astype(np.float64)
+    mu_x, var_x = window_stats(x)
+    mu_y, var_y = window_stats(y)
+
+    if len(orientations) == 1:
+        k = orientations[0]
+        x, mu_x, var_x = (dihedral(a, k)[:, None] for a in (x, mu_x, var_x))
+        order = np.zeros((n, m, 1), dtype=int)   # indices into orientations
+    else:
+        # (n, O, ...) views of every oriented piece and its statistics
+        x, mu_x, var_x = (np.stack([dihedral(a, k) for k in orientations], axis=1)
+                          for a in (x, mu_x, var_x))
+        flat_x = mu_x.reshape(n * len(orientations), -1)
+        flat_y = mu_y.reshape(m, -1)
+        dist = ((flat_x ** 2).sum(1)[:, None] + (flat_y ** 2).sum(1)[None, :]
+                - 2 * flat_x @ flat_y.T).reshape(n, len(orientations), m)
+        order = np.argsort(dist, axis=1)[:, :candidates].transpose(0, 2, 1)   # (n, m, K)
+
+    scores = np.full((n, m), -np.inf)
+    best = np.zeros((n, m), dtype=np.int8)
+    chunk = max(1, SSIM_CHUNK_BYTES // (m * pieces[0].size * 8 * 4))
+    for start in range(0, n, chunk):
+        rows = np.arange(start, min(start + chunk, n))
+        for c in range(order.shape[2]):
+            if len(orientations) == 1:
+                pick = (rows[:, None], [0])   # broadcast against all slots
+            else:
+                pick = (rows[:, None], order[rows, :, c])
+            score = pair_ssim(x[pick], mu_x[pick], var_x[pick], y, mu_y, var_y)
+            better = score > scores[rows]
+            scores[rows] = np.where(better, score, scores[rows])
+            best[rows] = np.where(better, np.asarray(orientations)[order[rows, :, c]], best[rows])
+        sys.stdout.write(f"\rComparing piece {rows[-1] + 1}/{n}...")
+        sys.stdout.flush()
+    return scores, best
+
+
+def placed_pieces(pieces, slot_piece, slot_orientation, highlight, slots):
+    """The pieces in `slots`, oriented and with highlighted ones outlined, as a stack."""
+    tiles = pieces[slot_piece[slots]]   # fancy indexing copies, so drawing is safe
+    for k in np.unique(slot_orientation[slots]):
+        if k:
+            turned = slot_orientation[slots] == k
+            tiles[turned] = dihedral(tiles[turned], k)
+    outlined = np.flatnonzero(highlight[slots])
+    if outlined.size:
+        w = HIGHLIGHT_WIDTH
+        boxed = tiles[outlined]
+        for edge in (np.s_[:, :w], np.s_[:, -w:], np.s_[:, :, :w], np.s_[:, :, -w:]):
+            boxed[edge] = HIGHLIGHT_RGB
+        tiles[outlined] = boxed
+    return tiles
+
+
+def assemble(pieces, slot_piece, slot_orientation, highlight, grid_size):
+    """The whole reconstruction as one array, via a single reshape/transpose."""
+    n, h, w, c = pieces.shape
+    tiles = placed_pieces(pieces, slot_piece, slot_orientation, highlight, np.arange(n))
+    return tiles.reshape(grid_size, grid_size, h, w, c).transpose(0, 2, 1, 3, 4).reshape(
+        grid_size * h, grid_size * w, c)
+
+
+def iter_bands(pieces, slot_piece, slot_orientation, highlight, grid_size):
+    """The reconstruction one row of pieces at a time, for the streaming writers."""
+    _, h, w, c = pieces.shape
+    for row in range(grid_size):
+        slots = np.arange(row * grid_size, (row + 1) * grid_size)
+        tiles = placed_pieces(pieces, slot_piece, slot_orientation, highlight, slots)
+        yield tiles.transpose(1, 0, 2, 3).reshape(h, grid_size * w, c)
+
+
+# --- Refinement of low-confidence placements ---
+# Pieces scoring below HIGHLIGHT_THRESHOLD are re-assigned among their own
+# slots, scored by SSIM plus how well their edges continue the confidently
+# placed neighbours. The rest of the assignment is left alone.
+REFINE_LOW_SCORES = True
+SEAM_WEIGHT = 0.5      # share of the seam term in the refined score
+SEAM_TOLERANCE = 64.0  # RMS edge difference (0-255) at which the seam score reaches 0
+# A low-SSIM piece whose seam score reaches this is no longer highlighted. On
+# the real puzzle, wrong piece/slot pairs stay below ~0.9 (99th percentile).
+SEAM_CONFIRM = 0.9
+
+# (dy, dx, edge of the piece, facing edge of the neighbour)
+NEIGHBOURS = ((-1, 0, 'top', 'bottom'), (1, 0, 'bottom', 'top'),
+              (0, -1, 'left', 'right'), (0, 1, 'right', 'left'))
+
+
+def edge_strips(pieces, edge):
+    """One border row/column of every piece in a (n, h, w, 3) stack, as (n, L) floats."""
+    strip = {'top': pieces[:, 0], 'bottom': pieces[:, -1],
+             'left': pieces[:, :, 0], 'right': pieces[:, :, -1]}[edge]
+    return strip.reshape(len(pieces), -1).astype(np.float64)
+
+
+def seam_scores(pieces, low_pieces, low_slots, occupant, confident, grid_size,
+                orientation=None):
+    """
+    Seam continuity of each low piece (rows) in each low slot (columns):
+    1 - RMS(edge difference) / SEAM_TOLERANCE, averaged over the slot's
+    confidently placed neighbours. NaN where a slot has no such neighbour.
+    orientation[piece, slot] is the dihedral orientation a piece takes in a
+    slot (None: as loaded).
+    """
+    total = np.zeros((len(low_pieces), len(low_slots)))
+    count = np.zeros(len(low_slots))
+    ys, xs = np.divmod(low_slots, grid_size)
+    for dy, dx, edge, facing in NEIGHBOURS:
+        ny, nx = ys + dy, xs + dx
+        inside = (ny >= 0) & (ny < grid_size) & (nx >= 0) & (nx < grid_size)
+        cols = np.flatnonzero(inside)
+        neighbour_slots = ny[cols] * grid_size + nx[cols]
+        cols = cols[confident[neighbour_slots]]
+        if cols.size == 0:
+            continue
+        neighbour_slots = ny[cols] * grid_size + nx[cols]
+        neighbours = occupant[neighbour_slots]
+        if orientation is None:
+            pair = np.zeros((len(low_pieces), cols.size), dtype=int)
+            b = edge_strips(pieces[neighbours], facing)
+        else:
+            pair = orientation[np.ix_(low_pieces, low_slots[cols])]
+            b = edge_strips(np.stack([dihedral(pieces[p], orientation[p, q])
+                                      for p, q in zip(neighbours, neighbour_slots)]), facing)
+        msd = np.zeros(pair.shape)
+        for k in np.unique(pair):
+            a = edge_strips(dihedral(pieces[low_pieces], k), edge)
+            # mean squared difference of every pair through one matrix product
+            d = ((a ** 2).sum(1)[:, None] + (b ** 2).sum(1)[None, :] - 2 * a @ b.T) / a.shape[1]
+            msd = np.where(pair == k, d, msd)
+        rms = np.sqrt(np.maximum(msd, 0))
+        total[:, cols] += np.clip(1 - rms / SEAM_TOLERANCE, 0, 1)
+        count[cols] += 1
+    with np.errstate(invalid='ignore'):
+        return total / count
+
+
+def refine_low_confidence(ssim_matrix, slot_of, pieces, grid_size, orientation=None,
+                          threshold=HIGHLIGHT_THRESHOLD, seam_weight=SEAM_WEIGHT):
+    """
+    Re-places the pieces whose SSIM is below threshold among the slots they
+    hold, leaving the confident placements alone. Each round:
+
+      1. pieces whose seams already confirm their current slot become
+         confident (and serve as neighbours from then on);
+      2. the rest are re-assigned among their slots on SSIM + seam score;
+      3. pieces confirmed by step 2 become confident too.
+
+    Rounds repeat while they confirm something, so clusters of doubtful pieces
+    are resolved from their confident border inwards. Every round is O(k^2)
+    in the number k of doubtful pieces.
+
+    Returns (new slot per piece, seam score per refined piece (NaN
+    elsewhere), number of low pieces, number moved, number resolved).
+    """
+    n = len(slot_of)
+    slot_of = slot_of.copy()
+    original = slot_of.copy()
+    low_pieces = np.flatnonzero(ssim_matrix[np.arange(n), slot_of] < threshold)
+    seam_of = np.full(n, np.nan)
+    pending = low_pieces
+    occupant = np.empty(n, dtype=int)
+    confident = np.ones(n, dtype=bool)
+    confident[slot_of[pending]] = False
+
+    while pending.size:
+        slots = slot_of[pending]
+        occupant[slot_of] = np.arange(n)
+        seam = seam_scores(pieces, pending, slots, occupant, confident, grid_size, orientation)
+        in_place = np.diag(seam) >= SEAM_CONFIRM
+        if not in_place.any():
+            sub_ssim = ssim_matrix[np.ix_(pending, slots)]
+            refined = np.where(np.isnan(seam), sub_ssim,
+                               (1 - seam_weight) * sub_ssim + seam_weight * seam)
+            rows, cols = linear_sum_assignment(1.0 - refined)
+            slot_of[pending[rows]] = slots[cols]
+            seam = seam[rows][:, cols]   # rows/cols now follow the new placement
+            pending, slots = pending[rows], slots[cols]
+            in_place = np.diag(seam) >= SEAM_CONFIRM
+        seam_of[pending] = np.diag(seam)
+        if not in_place.any():
+            break
+        confident[slots[in_place]] = True
+        pending = pending[~in_place]
+
+    moved = int((slot_of != original).sum())
+    resolved = int((seam_of[low_pieces] >= SEAM_CONFIRM).sum())
+    return slot_of, seam_of, low_pieces.size, moved, resolved
+
 
 def solve_and_reconstruct():
     print("Starting optimal reconstruction...")
 
     # --- PHASE 1: Load all 1024 puzzle pieces ---
     print(f"Phase 1: Loading {GRID_SIZE*GRID_SIZE} pieces...")
+    trace.step("load_pieces", items=GRID_SIZE * GRID_SIZE)
     all_pieces = []
     piece_w, piece_h = 0, 0
 
@@ -36,7 +313,6 @@ def solve_and_reconstruct():
 
             all_pieces.append({
                 'id': i,
-                'img': img,
                 'data': np.array(img),
             })
         except FileNotFoundError:
@@ -49,6 +325,7 @@ def solve_and_reconstruct():
 
     # --- PHASE 2: Load reference image and create 1024 reference slots ---
     print("Phase 2: Loading reference image and splitting into slots...")
+    trace.step("load_reference")
     all_slots = []
     try:
         ref_img = Image.open(REF_IMAGE_PATH).convert('RGB')
@@ -81,25 +358,20 @@ def solve_and_reconstruct():
     print("(This will take a few minutes as it's 1024x1024 = ~1 million comparisons)")
 
     num_items = GRID_SIZE * GRID_SIZE
-    ssim_matrix = np.zeros((num_items, num_items))
-
-    for i in range(num_items):  # Piece index
-        piece_data = all_pieces[i]['data']
-
-        for j in range(num_items):  # Slot index
-            slot_data = all_slots[j]['data']
-
-            score = ssim(piece_data, slot_data,
-                         channel_axis=-1, data_range=255)
-            ssim_matrix[i, j] = score
-
-        sys.stdout.write(f"\rComparing piece {i+1}/{num_items}...")
-        sys.stdout.flush()
+    orientations = piece_orientations(piece_w, piece_h) if MATCH_ORIENTATIONS else (0,)
+    if MATCH_ORIENTATIONS:
+        print(f"Matching {len(orientations)} orientations per piece "
+              f"(exact SSIM for the best {ORIENTATION_CANDIDATES}).")
+    trace.step("ssim_matrix", items=num_items * num_items)
+    pieces = np.stack([p['data'] for p in all_pieces])
+    slots = np.stack([s['data'] for s in all_slots])
+    ssim_matrix, orientation = batched_ssim(pieces, slots, orientations)
 
     print("\nSSIM matrix built.")
 
     # --- PHASE 4: Solve the Assignment Problem ---
     print("Phase 4: Running optimal assignment algorithm...")
+    trace.step("assignment")
 
     # The Hungarian algorithm finds the *minimum* cost.
     # We want to *maximize* the SSIM score.
@@ -111,14 +383,32 @@ def solve_and_reconstruct():
 
     print("Assignment complete.")
 
+    # --- PHASE 4b: Re-place the low-confidence pieces ---
+    seam_of = np.full(num_items, np.nan)
+    if REFINE_LOW_SCORES:
+        print("Phase 4b: Refining low-confidence placements with seam continuity...")
+        trace.step("refine")
+        slot_of = np.empty(num_items, dtype=int)
+        slot_of[piece_indices] = slot_indices
+        slot_of, seam_of, num_low, moved, resolved = refine_low_confidence(
+            ssim_matrix, slot_of, pieces, GRID_SIZE,
+            orientation if MATCH_ORIENTATIONS else None)
+        trace.count(num_low)
+        piece_indices, slot_indices = np.arange(num_items), slot_of
+        print(f"Refined {num_low} pieces below {HIGHLIGHT_THRESHOLD}: moved {moved}, "
+              f"{resolved} confirmed by their seams (>= {SEAM_CONFIRM}).")
+
     # --- PHASE 5: Process results and save text file ---
     print("Phase 5: Saving scores and preparing image...")
+    trace.step("save_scores")
 
     results = []
 
     with open(OUTPUT_SCORES_PATH, 'w') as f:
-        f.write("Piece_ID | Slot_Position (y, x) | SSIM_Score\n")
-        f.write("----------------------------------------------\n")
+        f.write("Piece_ID | Slot_Position (y, x) | SSIM_Score"
+                + (" | Orientation" if MATCH_ORIENTATIONS else "") + "\n")
+        f.write("----------------------------------------------"
+                + ("--------------" if MATCH_ORIENTATIONS else "") + "\n")
 
         for i in range(num_items):
             piece_idx = piece_indices[i]
@@ -130,9 +420,10 @@ def solve_and_reconstruct():
 
             results.append({
                 'piece_id': piece_id,
-                'piece_img': all_pieces[piece_idx]['img'],
                 'slot_pos_xy': slot_pos,
-                'score': final_score
+                'score': final_score,
+                'orientation': int(orientation[piece_idx, slot_idx]),
+                'seam_confirmed': seam_of[piece_idx] >= SEAM_CONFIRM
             })
 
         # Sort results by piece_id for a clean text file
@@ -140,50 +431,60 @@ def solve_and_reconstruct():
 
         for res in results_sorted_by_piece:
             y, x = res['slot_pos_xy'][1], res['slot_pos_xy'][0]
-            f.write(
-                f"{res['piece_id']:<8d} | ({y:02d}, {x:02d})             | {res['score']:.6f}\n")
+            line = f"{res['piece_id']:<8d} | ({y:02d}, {x:02d})             | {res['score']:.6f}"
+            if MATCH_ORIENTATIONS:
+                line += f"   | {res['orientation']}"
+            f.write(line + "\n")
 
     print(f"Scores saved to {OUTPUT_SCORES_PATH}")
 
     # --- PHASE 6: Create visualization image ---
     print("Phase 6: Assembling final image...")
+    trace.step("assemble")
 
-    final_img_w = piece_w * GRID_SIZE
-    final_img_h = piece_h * GRID_SIZE
-    solution_image = Image.new('RGB', (final_img_w, final_img_h))
-    draw = ImageDraw.Draw(solution_image)
-
-    low_score_count = 0
-
-    # Use the original (unsorted) results for pasting
+    slot_piece = np.empty(num_items, dtype=int)
+    slot_orientation = np.zeros(num_items, dtype=int)
+    highlight = np.zeros(num_items, dtype=bool)
     for res in results:
-        piece_img = res['piece_img']
         x, y = res['slot_pos_xy']
-        score = res['score']
-
-        # Calculate pixel coordinates for pasting
-        paste_x = x * piece_w
-        paste_y = y * piece_h
+        slot = y * GRID_SIZE + x
+        slot_piece[slot] = res['piece_id']
+        slot_orientation[slot] = res['orientation']
+        # Highlight if below threshold, unless the refinement confirmed it
+        highlight[slot] = res['score'] < HIGHLIGHT_THRESHOLD and not res['seam_confirmed']
+    low_score_count = int(highlight.sum())
 
-        solution_image.paste(piece_img, (paste_x, paste_y))
-
-        # Highlight if below threshold
-        if score < HIGHLIGHT_THRESHOLD:
-            low_score_count += 1
-            draw.rectangle(
-                [paste_x, paste_y, paste_x + piece_w - 1, paste_y + piece_h - 1],
-                outline='red',
-                width=2
-            )
-
-    solution_image.save(OUTPUT_IMAGE_PATH)
+    final_img_w = piece_w * GRID_SIZE
+    final_img_h = piece_h * GRID_SIZE
+    placement = (pieces, slot_piece, slot_orientation, highlight)
+    stream = final_img_w * final_img_h * 3 > STREAM_OUTPUT_ABOVE_BYTES
+    if stream or OUTPUT_PYRAMID:
+        with ExitStack() as stack:
+            writers = []
+            if stream:
+                print(f"Streaming a {final_img_w}x{final_img_h} image one row of pieces at a time...")
+                writers.append(stack.enter_context(
+                    PngWriter(OUTPUT_IMAGE_PATH, final_img_w, final_img_h)))
+            if OUTPUT_PYRAMID:
+                writers.append(stack.enter_context(
+                    DeepZoomWriter(OUTPUT_IMAGE_PATH, final_img_w, final_img_h)))
+            for band in iter_bands(*placement, GRID_SIZE):
+                for writer in writers:
+                    writer.write(band)
+        if OUTPUT_PYRAMID:
+            print(f"Tile pyramid saved as {os.path.splitext(OUTPUT_IMAGE_PATH)[0]}.dzi")
+    if not stream:
+        Image.fromarray(assemble(*placement, GRID_SIZE)).save(OUTPUT_IMAGE_PATH)
+    trace.end_step()
 
     print("--------------------------------------------------")
     print(f"✅ Success! Reconstructed image saved as: {OUTPUT_IMAGE_PATH}")
     print(
-        f"Highlighted {low_score_count} pieces with SSIM < {HIGHLIGHT_THRESHOLD}.")
+        f"Highlighted {low_score_count} pieces with SSIM < {HIGHLIGHT_THRESHOLD}"
+        " and no seam confirmation.")
     print("--------------------------------------------------")
 
 
 if __name__ == "__main__":
     solve_and_reconstruct()
+    trace.finish()
@@ -0,0 +1,185 @@
+"""
+Streaming writers for large Jigsaw reconstructions.
+
+The solution image is written one band of rows at a time, so the full canvas
+never has to exist in memory:
+
+  - PngWriter streams an RGB PNG: every band is filtered (per row, the PNG
+    filter with the smallest sum of absolute residuals, as libpng chooses) and
+    fed to a single zlib stream, so the file is finished without ever holding
+    the image.
+  - DeepZoomWriter cuts the same bands into a DeepZoom tile pyramid
+    (<name>.dzi and <name>_files/<level>/<col>_<row>.png) for zoomable viewers
+    such as OpenSeadragon. Each level buffers less than one row of tiles and
+    passes every finished tile row, downsampled 2x, to the level below.
+
+Both take bands as (rows, width, 3) uint8 arrays, top to bottom, and are
+context managers:
+
+    with PngWriter(path, width, height) as png, DeepZoomWriter(path, width, height) as dz:
+        for band in bands:
+            png.write(band)
+            dz.write(band)
+"""
+
+import math
+import os
+import struct
+import zlib
+
+import numpy as np
+from PIL import Image
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+BYTES_PER_PIXEL = 3
+FILTER_ROWS = 8   # rows filtered per pass; the candidates take ~20 bytes per input byte
+DEEPZOOM_TILE = 256
+
+
+class PngWriter:
+    """Writes an 8-bit RGB PNG band by band."""
+
+    def __init__(self, path, width, height, level=6):
+        self.path = path
+        self.width, self.height = width, height
+        self.rows = 0
+        self.previous = np.zeros(width * 3, dtype=np.uint8)
+        self.compressor = zlib.compressobj(level)
+        self.f = open(path, "wb")
+        self.f.write(PNG_SIGNATURE)
+        # width, height, bit depth 8, colour type 2 (RGB), default compression/filter, no interlace
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def _chunk(self, tag, data):
+        self.f.write(struct.pack(">I", len(data)) + tag + data
+                     + struct.pack(">I", zlib.crc32(tag + data)))
+
+    def write(self, band):
+        band = np.asarray(band, dtype=np.uint8).reshape(len(band), self.width * 3)
+        for start in range(0, len(band), FILTER_ROWS):
+            rows = band[start:start + FILTER_ROWS]
+            above = np.concatenate([self.previous[None], rows[:-1]])
+            candidates = filter_rows(rows, above)   # (5, rows, bytes), PNG filter types 0-4
+            residual = np.abs(candidates.view(np.int8).astype(np.int16)).sum(axis=2)
+            best = residual.argmin(axis=0)
+            filtered = np.empty((len(rows), self.width * 3 + 1), dtype=np.uint8)
+            filtered[:, 0] = best
+            filtered[:, 1:] = candidates[best, np.arange(len(rows))]
+            data = self.compressor.compress(filtered.tobytes())
+            if data:
+                self._chunk(b"IDAT", data)
+            self.previous = rows[-1].copy()
+            self.rows += len(rows)
+
+    def close(self):
+        if self.f.closed:
+            return
+        self._chunk(b"IDAT", self.compressor.flush())
+        self._chunk(b"IEND", b"")
+        self.f.close()
+        if self.rows != self.height:
+            os.remove(self.path)
+            raise ValueError(f"PNG header says {self.height} rows, {self.rows} were written")
+
+    def abort(self):
+        """Closes and deletes the unfinished file."""
+        if not self.f.closed:
+            self.f.close()
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # on an error, drop the partial file and let that error propagate
+        # instead of close() reporting the short row count
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+def filter_rows(rows, above):
+    """All five PNG filters (None, Sub, Up, Average, Paeth) of uint8 rows given the rows above."""
+    def shifted(a):   # the byte one pixel to the left, 0 before the first pixel
+        out = np.zeros_like(a)
+        out[:, BYTES_PER_PIXEL:] = a[:, :-BYTES_PER_PIXEL]
+        return out
+
+    left, upper_left = shifted(rows), shifted(above)
+    a, b, c = (x.astype(np.int16) for x in (left, above, upper_left))
+    p = a + b - c
+    pa, pb, pc = np.abs(p - a), np.abs(p - b), np.abs(p - c)
+    paeth = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c)).astype(np.uint8)
+    average = ((a + b) // 2).astype(np.uint8)
+    return np.stack([rows, rows - left, rows - above, rows - average, rows - paeth])
+
+
+def downsample(rows):
+    """2x2 box downsample of a (h, w, 3) uint8 block; odd edges are replicated."""
+    if len(rows) % 2:
+        rows = np.concatenate([rows, rows[-1:]])
+    if rows.shape[1] % 2:
+        rows = np.concatenate([rows, rows[:, -1:]], axis=1)
+    pairs = rows[0::2].astype(np.uint16)
+    pairs += rows[1::2]
+    sums = pairs[:, 0::2]
+    sums += pairs[:, 1::2]
+    sums += 2   # round to nearest
+    sums //= 4
+    return sums.astype(np.uint8)
+
+
+class DeepZoomWriter:
+    """Writes a DeepZoom pyramid (no tile overlap) band by band."""
+
+    def __init__(self, path, width, height, tile=DEEPZOOM_TILE, fmt="png"):
+        base = os.path.splitext(path)[0]
+        self.dzi_path, self.tiles_dir = base + ".dzi", base + "_files"
+        self.width, self.height, self.tile, self.fmt = width, height, tile, fmt
+        self.max_level = math.ceil(math.log2(max(width, height, 1)))
+        self.pending = {level: [] for level in range(self.max_level + 1)}
+        self.tile_rows = {level: 0 for level in range(self.max_level + 1)}
+        for level in range(self.max_level + 1):
+            os.makedirs(os.path.join(self.tiles_dir, str(level)), exist_ok=True)
+
+    def write(self, band):
+        self._feed(self.max_level, np.asarray(band, dtype=np.uint8))
+
+    def _feed(self, level, rows):
+        pending = self.pending[level]
+        pending.append(rows)
+        buffered = sum(len(p) for p in pending)
+        while buffered >= self.tile:
+            block = np.concatenate(pending)
+            self.pending[level] = pending = [block[self.tile:]]
+            buffered -= self.tile
+            self._emit(level, block[:self.tile])
+
+    def _emit(self, level, block):
+        row = self.tile_rows[level]
+        for col, x in enumerate(range(0, block.shape[1], self.tile)):
+            Image.fromarray(np.ascontiguousarray(block[:, x:x + self.tile])).save(
+                os.path.join(self.tiles_dir, str(level), f"{col}_{row}.{self.fmt}"))
+        self.tile_rows[level] += 1
+        if level > 0:
+            self._feed(level - 1, downsample(block))
+
+    def close(self):
+        # partial tile rows, top level first so each flush feeds the level below
+        for level in range(self.max_level, -1, -1):
+            rows = [p for p in self.pending[level] if len(p)]
+            self.pending[level] = []
+            if rows:
+                self._emit(level, np.concatenate(rows))
+        with open(self.dzi_path, "w") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+                    f'TileSize="{self.tile}" Overlap="0" Format="{self.fmt}">'
+                    f'<Size Width="{self.width}" Height="{self.height}"/></Image>\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,164 @@
+"""
+Automatic decoder for the Spiral challenge.
+
+display_np.py hard-codes the spiral order and the ASCII column, both read off
+a plotted PCA by hand. This script finds both from challenge_embeddings.npy.
+The array is memory-mapped and read in chunks, so dumps larger than RAM work.
+It is read POWER_ITERATIONS + 3 times (5 by default) with the randomized
+method, 3 times with --method incremental:
+
+  1. A column scan accumulates per-column statistics. Columns whose values
+     are large outliers and round to printable ASCII are flagged as message
+     columns.
+  2. The top-2 principal components of the remaining columns come from a
+     randomized PCA (Halko, Martinsson & Tropp): a small random subspace is
+     refined by subspace iteration, each iteration one more pass that
+     multiplies the mean-centred chunks by the current basis. Memory is
+     O(D * (k + oversampling)), never D x D, and centring every chunk on the
+     exact column means avoids the cancellation of gram - n * mean^2 when the
+     columns have large means. That is POWER_ITERATIONS passes plus one for
+     the Rayleigh-Ritz step. --method incremental uses sklearn's
+     IncrementalPCA instead, which fits in a single pass.
+  3. A final pass projects every row to 2-D; the rows are not kept in memory,
+     so the projection cannot be folded into the fitting passes. The n x 2
+     projection is the one thing held in full (spiral_order sorts all of
+     it), D/2 times smaller than the array. Rows are ordered from the
+     spiral's centre outwards: first by radius, then by unwrapped angle.
+  4. Each message column is read out in that order.
+
+Usage: python decode_spiral.py [challenge_embeddings.npy] [--method randomized|incremental]
+"""
+
+import argparse
+
+import numpy as np
+
+# --- Configuration ---
+EMBEDDINGS_PATH = "challenge_embeddings.npy"
+CHUNK_ROWS = 65536
+PCA_METHOD = "randomized"   # or "incremental" (sklearn IncrementalPCA, one pass)
+OVERSAMPLES = 8             # extra random directions beyond the k wanted
+POWER_ITERATIONS = 2        # subspace iterations; the fit takes POWER_ITERATIONS + 1 passes
+RANDOM_SEED = 0
+MIN_PRINTABLE_FRACTION = 0.9
+MAGNITUDE_Z_THRESHOLD = 6.0
+PREVIEW_CHARS = 200
+
+
+def iter_chunks(X, chunk_rows=CHUNK_ROWS):
+    for start in range(0, X.shape[0], chunk_rows):
+        yield start, np.asarray(X[start:start + chunk_rows], dtype=np.float64)
+
+
+def column_scan(X):
+    """One pass: per-column mean, mean |x| and printable-ASCII fraction, from running sums."""
+    n, d = X.shape
+    total = np.zeros(d)
+    abs_total = np.zeros(d)
+    printable = np.zeros(d)
+    for _, chunk in iter_chunks(X):
+        total += chunk.sum(axis=0)
+        abs_total += np.abs(chunk).sum(axis=0)
+        rounded = np.rint(chunk)
+        printable += ((rounded >= 32) & (rounded <= 126)).sum(axis=0)
+    return {"mean": total / n, "mean_abs": abs_total / n, "printable": printable / n}
+
+
+def message_columns(stats):
+    """Columns that both dwarf the others in magnitude and decode to printable ASCII."""
+    mag = stats["mean_abs"]
+    median = np.median(mag)
+    mad = np.median(np.abs(mag - median)) or 1e-12
+    z = (mag - median) / (1.4826 * mad)
+    return np.flatnonzero((z > MAGNITUDE_Z_THRESHOLD) & (stats["printable"] >= MIN_PRINTABLE_FRACTION))
+
+
+def covariance_times(X, columns, mean, basis):
+    """One pass: (X_c - mean)^T (X_c - mean) @ basis, with every chunk centred before the product."""
+    out = np.zeros_like(basis)
+    for _, chunk in iter_chunks(X):
+        centred = chunk[:, columns] - mean
+        out += centred.T @ (centred @ basis)
+    return out
+
+
+def top_components(X, stats, columns, k=2, method=PCA_METHOD):
+    """(mean, components (k, len(columns))) of the selected columns."""
+    mean = stats["mean"][columns]
+    if method == "randomized":
+        width = min(k + OVERSAMPLES, len(columns))
+        rng = np.random.default_rng(RANDOM_SEED)
+        basis, _ = np.linalg.qr(rng.standard_normal((len(columns), width)))
+        for _ in range(POWER_ITERATIONS):
+            basis, _ = np.linalg.qr(covariance_times(X, columns, mean, basis))
+        # Rayleigh-Ritz: the covariance restricted to the subspace is width x width
+        vals, vecs = np.linalg.eigh(basis.T @ covariance_times(X, columns, mean, basis))
+        return mean, (basis @ vecs[:, np.argsort(vals)[::-1][:k]]).T
+    if method != "incremental":
+        raise ValueError(f"unknown PCA method {method!r}")
+
+    from sklearn.decomposition import IncrementalPCA
+    ipca = IncrementalPCA(n_components=k)
+    for _, chunk in iter_chunks(X, max(CHUNK_ROWS, k)):
+        if chunk.shape[0] >= k:
+            ipca.partial_fit(chunk[:, columns])
+    return ipca.mean_, ipca.components_
+
+
+def project(X, columns, mean, components):
+    """Last pass: 2-D coordinates of every row, as an in-memory (n, k) array."""
+    out = np.empty((X.shape[0], components.shape[0]))
+    for start, chunk in iter_chunks(X):
+        out[start:start + chunk.shape[0]] = (chunk[:, columns] - mean) @ components.T
+    return out
+
+
+def spiral_order(points):
+    """
+    Orders points along a spiral from the centre outwards. Sorting by radius
+    gives a rough order; unwrapping the angle along that order and sorting by
+    the unwrapped angle fixes points whose radii are nearly equal.
+    """
+    centred = points - points.mean(axis=0)
+    radius = np.hypot(centred[:, 0], centred[:, 1])
+    by_radius = np.argsort(radius, kind="stable")
+    angle = np.unwrap(np.arctan2(centred[by_radius, 1], centred[by_radius, 0]))
+    # The spiral may turn either way; make the unwrapped angle increase outwards
+    if angle[-1] < angle[0]:
+        angle = -angle
+    order = by_radius[np.argsort(angle, kind="stable")]
+    # Only trust the angle order if it agrees with radius growing outwards
+    if np.corrcoef(np.arange(len(order)), radius[order])[0, 1] < 0.5:
+        return by_radius
+    return order
+
+
+def decode(path=EMBEDDINGS_PATH, method=PCA_METHOD):
+    X = np.load(path, mmap_mode="r")
+    n, d = X.shape
+    print(f"Loaded {path} (memory-mapped): {n} rows x {d} dims")
+
+    stats = column_scan(X)
+    msg_cols = message_columns(stats)
+    print(f"Message column candidates: {msg_cols.tolist()}")
+
+    pca_cols = np.setdiff1d(np.arange(d), msg_cols)
+    mean, components = top_components(X, stats, pca_cols, method=method)
+    points = project(X, pca_cols, mean, components)
+    order = spiral_order(points)
+    print(f"Spiral order (centre outwards): {order[:50].tolist()}{' ...' if n > 50 else ''}")
+
+    for col in msg_cols:
+        values = np.rint(np.asarray(X[order[:PREVIEW_CHARS], col])).astype(int)
+        text = "".join(chr(v) if 32 <= v <= 126 else "?" for v in values)
+        print(f"Column {col}: {text}{' ...' if n > PREVIEW_CHARS else ''}")
+    return order, msg_cols
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode the Spiral embeddings")
+    parser.add_argument("path", nargs="?", default=EMBEDDINGS_PATH)
+    parser.add_argument("--method", choices=["randomized", "incremental"], default=PCA_METHOD,
+                        help="how to find the principal components (default: %(default)s)")
+    args = parser.parse_args()
+    decode(args.path, args.method)
@@ -0,0 +1,67 @@
+# check_validators.py
+#
+# Regression check: the batched torch validators in utils.py must agree with
+# the per-sample NumPy/skimage versions they replace.
+#
+# Usage: python check_validators.py
+
+import sys
+import time
+
+import numpy as np
+import torch
+
+from utils import linf, linf_batch, ssim_01, ssim_01_batch
+
+# --- Configuration ---
+NUM_SAMPLES = 512
+SSIM_TOLERANCE = 1e-4
+LINF_TOLERANCE = 1e-6
+LINF_THRESHOLD = 0.08
+SEED = 0
+
+
+def make_pairs(n, seed=SEED):
+    """Random clean images plus perturbations of varying strength, clipped to [0,1]."""
+    g = torch.Generator().manual_seed(seed)
+    clean = torch.rand(n, 1, 28, 28, generator=g)
+    # mix of smooth and noisy images so SSIM covers a wide range
+    clean[: n // 2] = torch.nn.functional.avg_pool2d(clean[: n // 2], 5, 1, 2)
+    strength = torch.linspace(0.0, 0.2, n).view(n, 1, 1, 1)
+    noise = (torch.rand(n, 1, 28, 28, generator=g) * 2 - 1) * strength
+    adv = torch.clamp(clean + noise, 0, 1)
+    return clean, adv
+
+
+def check():
+    clean, adv = make_pairs(NUM_SAMPLES)
+    delta = adv - clean
+
+    start = time.perf_counter()
+    ref_ssim = np.array([ssim_01(c.squeeze().numpy(), a.squeeze().numpy())
+                         for c, a in zip(clean, adv)])
+    ref_linf = [linf(d.numpy(), eps=LINF_THRESHOLD) for d in delta]
+    t_numpy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ssim_t = ssim_01_batch(clean, adv)
+    linf_t, linf_ok_t = linf_batch(delta, eps=LINF_THRESHOLD)
+    t_torch = time.perf_counter() - start
+
+    ssim_err = np.abs(ssim_t.numpy() - ref_ssim).max()
+    linf_err = np.abs(linf_t.numpy() - np.array([v for v, _ in ref_linf])).max()
+    linf_flags_match = all(ok == bool(t) for (_, ok), t in zip(ref_linf, linf_ok_t))
+
+    print(f"Samples: {NUM_SAMPLES}, SSIM range [{ref_ssim.min():.4f}, {ref_ssim.max():.4f}]")
+    print(f"[SSIM] max |torch - skimage| = {ssim_err:.2e} (tol {SSIM_TOLERANCE}) -> "
+          f"{'✅ OK' if ssim_err <= SSIM_TOLERANCE else '❌ MISMATCH'}")
+    print(f"[L∞]   max |torch - numpy|   = {linf_err:.2e} (tol {LINF_TOLERANCE}) -> "
+          f"{'✅ OK' if linf_err <= LINF_TOLERANCE and linf_flags_match else '❌ MISMATCH'}")
+    print(f"NumPy/skimage: {t_numpy * 1000:.1f} ms, torch batched: {t_torch * 1000:.1f} ms "
+          f"({t_numpy / t_torch:.0f}x)")
+
+    return ssim_err <= SSIM_TOLERANCE and linf_err <= LINF_TOLERANCE and linf_flags_match
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check() else 1)
@@ -0,0 +1,131 @@
+# fast_inference.py
+#
+# Optional fast inference backends for SmallFashionCNN, for bulk verification
+# of large candidate sets:
+#   - "trace":   TorchScript-traced and frozen module, channels-last input
+#   - "compile": torch.compile'd module, channels-last input
+#   - "int8":    dynamically quantized int8 Linear layers (the two FC layers
+#                hold ~99% of the weights; dynamic quantization does not cover
+#                Conv2d, so those stay float32)
+#
+# Running this file benchmarks latency/throughput on CPU for batch sizes
+# 1..4096 and reports each backend's top-1 disagreement rate against the
+# eager float32 model.
+#
+# Usage: python fast_inference.py [--seeds seeds/] [--backends trace int8]
+
+import argparse
+import time
+
+import torch
+import torch.nn as nn
+
+from solve_batched import iter_seed_batches, list_seed_images, load_model
+
+# --- Configuration ---
+BACKENDS = ["eager", "trace", "compile", "int8"]
+BATCH_SIZES = [1, 4, 16, 64, 256, 1024, 4096]
+NUM_AGREEMENT_SAMPLES = 20000
+WARMUP_RUNS = 3
+TIMED_RUNS = 10
+INPUT_SHAPE = (1, 28, 28)
+
+
+def build_fast_model(model, backend="trace", channels_last=True, example_batch=64):
+    """
+    Wraps an eval-mode SmallFashionCNN in the requested inference backend.
+    Returns a callable taking a (B, 1, 28, 28) float tensor and returning logits.
+    """
+    model = model.eval()
+    if backend == "eager":
+        return model
+
+    if backend == "int8":
+        return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+    memory_format = torch.channels_last if channels_last else torch.contiguous_format
+    model = model.to(memory_format=memory_format)
+
+    if backend == "trace":
+        example = torch.rand(example_batch, *INPUT_SHAPE).to(memory_format=memory_format)
+        with torch.no_grad():
+            fast = torch.jit.freeze(torch.jit.trace(model, example))
+    elif backend == "compile":
+        # dynamic=True avoids a recompile for every new batch size
+        fast = torch.compile(model, dynamic=True)
+    else:
+        raise ValueError(f"Unknown backend: {backend}")
+
+    def forward(x):
+        return fast(x.contiguous(memory_format=memory_format))
+    return forward
+
+
+@torch.no_grad()
+def predict_labels(fast_model, images, batch_size=4096):
+    """Top-1 labels for an arbitrarily large (N, 1, 28, 28) tensor, in chunks."""
+    return torch.cat([fast_model(images[i:i + batch_size]).argmax(dim=1)
+                      for i in range(0, images.shape[0], batch_size)])
+
+
+@torch.no_grad()
+def benchmark(fast_model, batch_size):
+    """Returns (mean latency in ms, images per second) for one batch size."""
+    x = torch.rand(batch_size, *INPUT_SHAPE)
+    for _ in range(WARMUP_RUNS):
+        fast_model(x)
+    start = time.perf_counter()
+    for _ in range(TIMED_RUNS):
+        fast_model(x)
+    elapsed = (time.perf_counter() - start) / TIMED_RUNS
+    return elapsed * 1000, batch_size / elapsed
+
+
+def agreement_inputs(seed_dir=None, n=NUM_AGREEMENT_SAMPLES):
+    """
+    Seed images (if given) plus FGSM-like noisy copies, so the disagreement
+    rate is measured near decision boundaries and not only on clean inputs.
+    """
+    g = torch.Generator().manual_seed(0)
+    if seed_dir:
+        base = torch.cat([imgs for _, imgs in iter_seed_batches(list_seed_images(seed_dir))])
+    else:
+        base = torch.rand(256, *INPUT_SHAPE, generator=g)
+    idx = torch.randint(0, base.shape[0], (n,), generator=g)
+    noise = torch.randint(-1, 2, (n, *INPUT_SHAPE), generator=g).float() * 0.08
+    return torch.cat([base, (base[idx] + noise).clamp(0, 1)])
+
+
+def main(backends=BACKENDS, seed_dir=None):
+    torch.set_grad_enabled(False)
+    print("Loading model...")
+    model = load_model()
+    images = agreement_inputs(seed_dir)
+    reference = predict_labels(model, images)
+    print(f"Agreement set: {images.shape[0]} images. Threads: {torch.get_num_threads()}")
+
+    for backend in backends:
+        print("-" * 60)
+        try:
+            fast_model = build_fast_model(load_model(), backend)
+            labels = predict_labels(fast_model, images)
+        except Exception as e:
+            print(f"[{backend}] unavailable: {e}")
+            continue
+
+        disagreement = (labels != reference).float().mean().item()
+        print(f"[{backend}] top-1 disagreement vs float eager: {disagreement:.4%} "
+              f"({int((labels != reference).sum())}/{images.shape[0]})")
+        print(f"{'batch':>8} | {'latency (ms)':>12} | {'images/s':>12}")
+        for batch_size in BATCH_SIZES:
+            latency, throughput = benchmark(fast_model, batch_size)
+            print(f"{batch_size:>8} | {latency:>12.3f} | {throughput:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark SmallFashionCNN inference backends")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--seeds", default=None,
+                        help="seed images used for the disagreement check")
+    args = parser.parse_args()
+    main(args.backends, args.seeds)
@@ -0,0 +1,199 @@
+# solve_batched.py
+#
+# Batched FGSM search. The sign of the gradient does not depend on epsilon, so
+# it is computed once per batch of seeds, every epsilon candidate is formed as
+# one (B, K, 1, 28, 28) tensor and all label flips are checked with a single
+# forward pass of SmallFashionCNN.
+#
+# Usage: python solve_batched.py [--seeds seeds/] [--batch-size 256]
+
+import argparse
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torchvision.transforms as T
+from PIL import Image
+
+# Import utilities from the challenge package
+from model import SmallFashionCNN
+from utils import linf_batch, ssim_01_batch
+
+# --- Configuration ---
+MODEL_PATH = "model.pt"
+SEED_DIR = "seeds"
+OUTPUT_DIR = "deltas"
+BATCH_SIZE = 256
+SSIM_THRESHOLD = 0.85
+LINF_THRESHOLD = 0.08
+
+# Same sweep as solve.py, but evaluated all at once.
+EPSILON_CANDIDATES = np.arange(0.045, 0.055, 0.001)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+def load_model(model_path=MODEL_PATH):
+    """Loads SmallFashionCNN weights and puts the model in eval mode."""
+    model = SmallFashionCNN(num_classes=10)
+    model.load_state_dict(torch.load(model_path, map_location="cpu")['model_state'])
+    model.eval()
+    return model
+
+
+def list_seed_images(seed_dir):
+    """Returns the sorted image paths in seed_dir (or [seed_dir] if it is a file)."""
+    if os.path.isfile(seed_dir):
+        return [seed_dir]
+    return sorted(
+        os.path.join(seed_dir, f) for f in os.listdir(seed_dir)
+        if f.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def iter_seed_batches(paths, batch_size=BATCH_SIZE):
+    """Yields (paths, images) with images stacked as a (B, 1, 28, 28) tensor."""
+    transform = T.ToTensor()
+    for start in range(0, len(paths), batch_size):
+        batch_paths = paths[start:start + batch_size]
+        images = torch.stack(
+            [transform(Image.open(p).convert("L")) for p in batch_paths])
+        yield batch_paths, images
+
+
+def fgsm_sign(model, images):
+    """
+    Returns (labels, signed_gradient) for a batch of clean images.
+    labels are the model's own predictions, used as the attack target.
+    """
+    images = images.clone().detach().requires_grad_(True)
+    logits = model(images)
+    labels = logits.argmax(dim=1)
+    # reduction='sum' keeps each sample's gradient independent of batch size
+    loss = nn.CrossEntropyLoss(reduction='sum')(logits, labels)
+    grad, = torch.autograd.grad(loss, images)
+    return labels.detach(), grad.sign()
+
+
+def fgsm_sweep(model, images, epsilons, verify_model=None):
+    """
+    Applies every epsilon to every image with one backward and one forward pass.
+    verify_model (e.g. from fast_inference.build_fast_model) is used for the
+    label-flip forward if given; the gradient always comes from the eager model.
+
+    Returns a dict with:
+      labels      (B,)               original predictions
+      adv         (B, K, 1, 28, 28)  adversarial candidates
+      adv_labels  (B, K)             predictions on the candidates
+    """
+    labels, signed_gradient = fgsm_sign(model, images)
+    eps = torch.as_tensor(np.asarray(epsilons), dtype=images.dtype)
+    B, K = images.shape[0], eps.shape[0]
+
+    adv = torch.clamp(
+        images.unsqueeze(1) + eps.view(1, K, 1, 1, 1) * signed_gradient.unsqueeze(1),
+        0, 1)
+
+    with torch.no_grad():
+        adv_labels = (verify_model or model)(adv.view(B * K, *images.shape[1:])).argmax(dim=1).view(B, K)
+
+    return {'labels': labels, 'adv': adv, 'adv_labels': adv_labels}
+
+
+def smallest_passing(images, sweep, epsilons):
+    """
+    For each image, returns (k, ssim) of the smallest epsilon index that flips
+    the label and satisfies both constraints, or (None, None).
+    All B*K candidates are validated at once with the batched torch checks.
+    """
+    B, K = sweep['adv_labels'].shape
+    adv = sweep['adv'].reshape(B * K, *images.shape[1:])
+    clean = images.unsqueeze(1).expand(B, K, *images.shape[1:]).reshape(B * K, *images.shape[1:])
+
+    _, linf_ok = linf_batch(adv - clean, eps=LINF_THRESHOLD)
+    ssim_scores = ssim_01_batch(clean, adv).view(B, K)
+    flipped = sweep['adv_labels'] != sweep['labels'].unsqueeze(1)
+    valid = flipped & linf_ok.view(B, K) & (ssim_scores >= SSIM_THRESHOLD)
+
+    # Mask out invalid candidates and take the smallest remaining epsilon
+    eps = torch.as_tensor(np.asarray(epsilons), dtype=images.dtype)
+    masked_eps = torch.where(valid, eps.view(1, K), torch.full_like(ssim_scores, float('inf')))
+    best = masked_eps.argmin(dim=1)
+
+    results = []
+    for b in range(B):
+        k = best[b].item()
+        results.append((k, ssim_scores[b, k].item()) if valid[b, k] else (None, None))
+    return results
+
+
+def solve(seed_dir=SEED_DIR, batch_size=BATCH_SIZE, output_dir=OUTPUT_DIR, backend="eager"):
+    """
+    Runs the batched FGSM sweep over every seed image in seed_dir and saves a
+    delta for each image that has a valid solution.
+    """
+    print(f"Loading model from {MODEL_PATH}...")
+    model = load_model()
+    print("Model loaded successfully.")
+    verify_model = None
+    if backend != "eager":
+        from fast_inference import build_fast_model
+        verify_model = build_fast_model(load_model(), backend)
+        print(f"Verifying label flips with the '{backend}' backend.")
+
+    paths = list_seed_images(seed_dir)
+    if not paths:
+        print(f"❌ No seed images found in '{seed_dir}'.")
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Found {len(paths)} seed images. Trying {len(EPSILON_CANDIDATES)} epsilons per image.")
+    print("-" * 30)
+
+    solved = 0
+    start = time.perf_counter()
+    for batch_paths, images in iter_seed_batches(paths, batch_size):
+        sweep = fgsm_sweep(model, images, EPSILON_CANDIDATES, verify_model)
+        for b, (k, score) in enumerate(smallest_passing(images, sweep, EPSILON_CANDIDATES)):
+            name = os.path.basename(batch_paths[b])
+            original_label = sweep['labels'][b].item()
+            if k is None:
+                print(f"{name}: ❌ no valid epsilon (label {original_label})")
+                continue
+
+            adversarial_label = sweep['adv_labels'][b, k].item()
+            if verify_model is not None:
+                # Fast backends may disagree near the boundary; confirm in float32
+                with torch.no_grad():
+                    confirmed = model(sweep['adv'][b, k].unsqueeze(0)).argmax(dim=1).item()
+                if confirmed == original_label:
+                    print(f"{name}: ❌ '{backend}' flip not confirmed by float model")
+                    continue
+
+            solved += 1
+            delta = (sweep['adv'][b, k] - images[b]).detach().numpy()
+            delta_path = os.path.join(
+                output_dir, os.path.splitext(name)[0] + "_delta.npy")
+            np.save(delta_path, delta.reshape(1, 28, 28).astype(np.float32))
+            print(
+                f"{name}: ✅ EPSILON = {EPSILON_CANDIDATES[k]:.4f} "
+                f"{original_label} -> {adversarial_label}, SSIM {score:.4f}")
+    elapsed = time.perf_counter() - start
+
+    print("-" * 30)
+    print(f"Solved {solved}/{len(paths)} images in {elapsed:.2f}s "
+          f"({len(paths) / elapsed:.1f} images/s).")
+    print(f"Perturbations saved to '{output_dir}/'.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched FGSM epsilon sweep")
+    parser.add_argument("--seeds", default=SEED_DIR,
+                        help="directory of seed images (or a single image)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    parser.add_argument("--backend", default="eager",
+                        choices=["eager", "trace", "compile", "int8"],
+                        help="inference backend for the verification forward pass")
+    args = parser.parse_args()
+    solve(args.seeds, args.batch_size, args.output, args.backend)
@@ -0,0 +1,154 @@
+# solve_pgd.py
+#
+# Iterative, constraint-aware attack (PGD) for when the fixed FGSM epsilon
+# sweep finds nothing. Each step takes a signed-gradient step, projects back
+# onto the L∞ ball around the seed and only accepts the step if SSIM stays
+# above the threshold (otherwise that sample's step size is halved).
+# Samples leave the active batch as soon as their label flips, so the work per
+# step shrinks as the batch converges.
+#
+# Usage: python solve_pgd.py [--seeds seeds/] [--batch-size 256] [--steps 100]
+
+import argparse
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from solve_batched import (EPSILON_CANDIDATES, fgsm_sweep, iter_seed_batches,
+                           list_seed_images, load_model, smallest_passing)
+from utils import linf_batch, ssim_01_batch
+
+# --- Configuration ---
+SEED_DIR = "seeds"
+OUTPUT_DIR = "deltas_pgd"
+BATCH_SIZE = 256
+SSIM_THRESHOLD = 0.85
+LINF_THRESHOLD = 0.08
+
+STEP_SIZE = 0.01   # initial per-step change, halved when a step breaks SSIM
+MAX_STEPS = 100
+
+
+def pgd_attack(model, images, eps=LINF_THRESHOLD, step_size=STEP_SIZE, max_steps=MAX_STEPS):
+    """
+    Untargeted PGD on a (B, 1, 28, 28) batch against the model's own predictions.
+
+    Returns (labels, adv, steps): the original predictions, the final adversarial
+    images and, per sample, the number of steps it took to flip the label
+    (-1 if it never flipped).
+    """
+    with torch.no_grad():
+        labels = model(images).argmax(dim=1)
+
+    B = images.shape[0]
+    adv = images.clone()
+    steps = torch.full((B,), -1, dtype=torch.long)
+    alpha = torch.full((B,), step_size, dtype=images.dtype)
+    active = torch.arange(B)
+    loss_fn = nn.CrossEntropyLoss(reduction='sum')
+
+    for step in range(max_steps + 1):
+        if active.numel() == 0:
+            break
+
+        # One forward serves both the success check and the next gradient
+        x = adv[active].clone().requires_grad_(True)
+        logits = model(x)
+        done = logits.argmax(dim=1) != labels[active]
+        steps[active[done]] = step
+        if step == max_steps or done.all():
+            break
+
+        keep = ~done
+        loss = loss_fn(logits[keep], labels[active][keep])
+        grad, = torch.autograd.grad(loss, x)
+
+        # Drop finished samples from the active batch
+        idx = active[keep]
+        clean = images[idx]
+        candidate = adv[idx] + alpha[idx].view(-1, 1, 1, 1) * grad[keep].sign()
+        candidate = torch.min(torch.max(candidate, clean - eps), clean + eps).clamp(0, 1)
+
+        # Constraint-aware step: reject moves that break SSIM and shrink the step
+        ssim_ok = ssim_01_batch(clean, candidate) >= SSIM_THRESHOLD
+        adv[idx[ssim_ok]] = candidate[ssim_ok].detach()
+        alpha[idx[~ssim_ok]] *= 0.5
+        active = idx
+
+    return labels, adv, steps
+
+
+def solve(seed_dir=SEED_DIR, batch_size=BATCH_SIZE, max_steps=MAX_STEPS, output_dir=OUTPUT_DIR):
+    """
+    Runs PGD over every seed in seed_dir, saves the valid deltas and compares
+    success rate against the batched FGSM epsilon sweep on the same seeds.
+    """
+    print("Loading model...")
+    model = load_model()
+    print("Model loaded successfully.")
+
+    paths = list_seed_images(seed_dir)
+    if not paths:
+        print(f"❌ No seed images found in '{seed_dir}'.")
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Found {len(paths)} seed images. PGD: eps={LINF_THRESHOLD}, "
+          f"step={STEP_SIZE}, max {max_steps} steps.")
+    print("-" * 30)
+
+    pgd_steps = []
+    fgsm_solved = 0
+    pgd_time = fgsm_time = 0.0
+    for batch_paths, images in iter_seed_batches(paths, batch_size):
+        start = time.perf_counter()
+        labels, adv, steps = pgd_attack(model, images, max_steps=max_steps)
+        pgd_time += time.perf_counter() - start
+
+        # Final validation of every sample against all constraints
+        with torch.no_grad():
+            adv_labels = model(adv).argmax(dim=1)
+        _, linf_ok = linf_batch(adv - images, eps=LINF_THRESHOLD)
+        ssim_scores = ssim_01_batch(images, adv)
+        valid = (adv_labels != labels) & linf_ok & (ssim_scores >= SSIM_THRESHOLD)
+
+        for b, path in enumerate(batch_paths):
+            name = os.path.basename(path)
+            if not valid[b]:
+                print(f"{name}: ❌ PGD failed (label {labels[b].item()})")
+                pgd_steps.append(-1)
+                continue
+            pgd_steps.append(steps[b].item())
+            delta = (adv[b] - images[b]).numpy().reshape(1, 28, 28).astype(np.float32)
+            np.save(os.path.join(output_dir, os.path.splitext(name)[0] + "_delta.npy"), delta)
+            print(f"{name}: ✅ {labels[b].item()} -> {adv_labels[b].item()} "
+                  f"in {steps[b].item()} steps, SSIM {ssim_scores[b].item():.4f}")
+
+        start = time.perf_counter()
+        sweep = fgsm_sweep(model, images, EPSILON_CANDIDATES)
+        fgsm_solved += sum(k is not None for k, _ in smallest_passing(images, sweep, EPSILON_CANDIDATES))
+        fgsm_time += time.perf_counter() - start
+
+    pgd_steps = np.array(pgd_steps)
+    pgd_solved = int((pgd_steps >= 0).sum())
+    print("-" * 30)
+    print(f"PGD : {pgd_solved}/{len(paths)} solved ({pgd_solved / len(paths):.1%}), "
+          f"mean steps-to-success "
+          f"{pgd_steps[pgd_steps >= 0].mean() if pgd_solved else float('nan'):.1f}, "
+          f"{pgd_time:.2f}s")
+    print(f"FGSM: {fgsm_solved}/{len(paths)} solved ({fgsm_solved / len(paths):.1%}) "
+          f"with {len(EPSILON_CANDIDATES)}-epsilon sweep, {fgsm_time:.2f}s")
+    print(f"Perturbations saved to '{output_dir}/'.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Constraint-aware PGD attack")
+    parser.add_argument("--seeds", default=SEED_DIR,
+                        help="directory of seed images (or a single image)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--steps", type=int, default=MAX_STEPS)
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    args = parser.parse_args()
+    solve(args.seeds, args.batch_size, args.steps, args.output)
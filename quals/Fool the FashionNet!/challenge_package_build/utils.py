@@ -2,6 +2,7 @@
 from __future__ import annotations
 import numpy as np
 import torch
+import torch.nn.functional as F
 import torchvision.transforms as T
 from PIL import Image
 from skimage.metrics import structural_similarity as ssim
@@ -38,3 +39,46 @@ def ssim_01(a: np.ndarray, b: np.ndarray) -> float:
     else:
         return float(ssim(a, b, data_range=1.0))
 
+
+# --- Batched torch validators ---
+# Same checks as linf / ssim_01, but on whole (B,C,H,W) tensors so they can run
+# inside an attack loop without a .detach().cpu().numpy() round trip.
+
+def linf_batch(delta: torch.Tensor, eps: float | None = None) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Per-sample L∞(delta) for a (B,...) tensor. Returns (norms, passes), both of shape (B,).
+    If eps is None, passes is all True.
+    """
+    mx = delta.detach().abs().flatten(1).amax(dim=1)
+    if eps is None:
+        return mx, torch.ones_like(mx, dtype=torch.bool)
+    return mx, mx <= eps + 1e-8
+
+def ssim_01_batch(a: torch.Tensor, b: torch.Tensor, win_size: int = 7) -> torch.Tensor:
+    """
+    Per-sample SSIM for (B,C,H,W) or (B,H,W) tensors scaled to [0,1]. Returns shape (B,).
+    Matches skimage's structural_similarity defaults (uniform 7x7 window, K1=0.01,
+    K2=0.03, sample covariance, border of win_size//2 excluded from the mean),
+    with the windowed statistics computed by a depthwise conv2d.
+    """
+    if a.ndim == 3: a = a.unsqueeze(1)
+    if b.ndim == 3: b = b.unsqueeze(1)
+    a = a.detach().clamp(0.0, 1.0)
+    b = b.detach().clamp(0.0, 1.0)
+
+    C = a.shape[1]
+    NP = win_size * win_size
+    kernel = torch.full((C, 1, win_size, win_size), 1.0 / NP, dtype=a.dtype, device=a.device)
+    # 'valid' convolution == skimage's filtered map with the border cropped
+    mean = lambda x: F.conv2d(x, kernel, groups=C)
+
+    ux, uy = mean(a), mean(b)
+    cov_norm = NP / (NP - 1)
+    vx = cov_norm * (mean(a * a) - ux * ux)
+    vy = cov_norm * (mean(b * b) - uy * uy)
+    vxy = cov_norm * (mean(a * b) - ux * uy)
+
+    C1 = (0.01 * 1.0) ** 2
+    C2 = (0.03 * 1.0) ** 2
+    S = ((2 * ux * uy + C1) * (2 * vxy + C2)) / ((ux * ux + uy * uy + C1) * (vx + vy + C2))
+    return S.mean(dim=(1, 2, 3))
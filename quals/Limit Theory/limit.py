@@ -1,9 +1,15 @@
 import requests
 import pandas as pd
-import time
+
+from sg_ai_ctf_25.oracle import Oracle
 
 endpoint = "https://limittheory.aictf.sg:5000/experiment"
 
+# 2.5 requests/s replaces the old fixed 0.4s sleep; failed calls are retried
+# with backoff instead of sleeping 10s. Answers are cached, so a rerun
+# only queries what it has not seen.
+oracle = Oracle(rate=2.5, retries=5, backoff=2.0, cache_dir=".oracle_cache")
+
 result_csv_file = "results.csv"
 df = pd.read_csv(result_csv_file)
 
@@ -11,7 +17,6 @@ def find_limit(coconut_milk, eggs, sugar):
     lo = 1
     hi = 30000
     while lo < hi:
-        time.sleep(0.4)
         pandan_leaves = (lo + hi) // 2
         payload = {
             "coconut_milk": coconut_milk,
@@ -20,12 +25,14 @@ def find_limit(coconut_milk, eggs, sugar):
             "pandan_leaves": pandan_leaves
         }
         try:
-            response = requests.post(endpoint, json=payload).json()
-        except Exception as e:
-            print(e)
-            time.sleep(10)
+            # the client returns the last 429/5xx once its retries run out; raise it here
+            response = oracle.post(endpoint, json=payload, cache=True)
+            response.raise_for_status()
+            passed = response.json()['message'] == 'PASSED'
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"{type(e).__name__}: {e}")
             continue
-        if response['message'] == 'PASSED':
+        if passed:
             lo = pandan_leaves + 1
         else:
             hi = pandan_leaves
@@ -38,3 +45,4 @@ for coconut_milk in range(5, 100, 10):
         for sugar in range(5, 100, 10):
             find_limit(coconut_milk / 10, eggs / 10, sugar / 10)
 df.to_csv(result_csv_file, index=False)
+print(oracle.metrics.render())
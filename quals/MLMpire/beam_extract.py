@@ -0,0 +1,255 @@
+"""
+Batched multi-prompt beam extraction for memorized secrets.
+
+Instead of trying PROMPT_CANDIDATES one after another with greedy argmax,
+every live hypothesis of every prompt is scored in one left-padded batch per
+step. Each prompt keeps a beam of its BEAM_WIDTH best continuations, ranked by
+cumulative log-probability, and the output is a ranked report of candidate
+secrets across all prompts.
+
+Batching needs direct access to the model, so it is used when the cached
+forward reproduces fill_mask() (see extract.py). Like extract.py, the batch
+keeps the key/value cache of every hypothesis's prefix and feeds only
+[new_char, MASK] per step. After the beams are pruned, the cache rows are
+reordered to follow each surviving hypothesis's parent. Prompts are split
+into lanes of at most MAX_BATCH rows, each with its own cache. When a prefix
+reaches the model's position limit, the lane is rebuilt from the last
+`window` tokens, keeping [CLS] if the model wants one. Otherwise each
+hypothesis is scored with fill_mask() on its own (same search, no batching).
+
+Usage (from the directory with architecture.py, hf_gpt2_model/ and vocab.json):
+    python beam_extract.py --beam 4 --top 10
+"""
+
+import argparse
+import time
+
+import torch
+
+from architecture import load_hf_gpt2_model, fill_mask
+from extract import (CONTEXT_WINDOW, MODEL_PATH, STOP_TOKENS, VOCAB_PATH,
+                     IncrementalExtractor, crop_cache, encode)
+
+# --- Configuration ---
+PROMPT_CANDIDATES = [
+    "user_password",
+    "secret_key",
+    "admin_pass",
+    "password",
+    "secret",
+    "auth_token",
+    "credentials",
+    "path=/api/auth/create",
+    "timestamp=",
+    '"pw":"',
+    "password=",
+    "flag: ",
+    "flag=",
+    "log entry related to the flag: AI2025{",
+    "AI2025{",
+]
+FLAG_IDENTIFIER = "AI2025{"
+BEAM_WIDTH = 4
+MAX_LENGTH = 80
+MAX_BATCH = 256      # hypotheses per forward pass (and per cache lane)
+TOP_RESULTS = 10
+
+
+class Hypothesis:
+    __slots__ = ("prompt", "ids", "text", "logp", "done", "parent")
+
+    def __init__(self, prompt, ids, text="", logp=0.0, done=False, parent=None):
+        self.prompt, self.ids, self.text, self.logp, self.done = prompt, ids, text, logp, done
+        self.parent = parent
+
+    def extend(self, token_id, char, logp):
+        return Hypothesis(self.prompt, self.ids + [token_id], self.text + char,
+                          self.logp + logp, char in STOP_TOKENS, parent=self)
+
+
+def select_cache(past, index):
+    """Keeps cache rows `index`, in that order (DynamicCache or legacy tuples)."""
+    if hasattr(past, "reorder_cache"):
+        past.reorder_cache(index)
+        return past
+    return tuple((k[index], v[index]) for k, v in past)
+
+
+class Lane:
+    """
+    Cached prefixes of a fixed group of prompts. Row i holds hyps[i].ids
+    minus its last token, left-padded to a common width: attention marks the
+    real columns and lengths counts them, for the position ids.
+    """
+
+    def __init__(self):
+        self.past = None
+        self.hyps = []
+        self.attention = self.lengths = None
+
+
+class BatchedScorer:
+    """Next-token log-probs at the [MASK] position for many sequences at once."""
+
+    def __init__(self, wrapper, window=CONTEXT_WINDOW, beam_width=BEAM_WIDTH, max_batch=MAX_BATCH):
+        self.wrapper = wrapper
+        self.checker = IncrementalExtractor(wrapper, window=window)
+        self.model = self.checker.model
+        self.window = self.checker.window
+        self.mask_id = wrapper.stoi["[MASK]"]
+        self.pad_id = wrapper.stoi.get("[PAD]", 0)
+        self.prompts_per_lane = max(1, max_batch // beam_width)
+        self.lane_of = {}
+        self.lanes = {}
+        self.forwards = 0
+
+    def prepare(self, prompt):
+        """Picks batched or fill_mask scoring on the first prompt; returns its ids."""
+        if self.checker.mode is None:
+            self.checker.choose_mode(prompt)
+        self.lane_of.setdefault(prompt, len(self.lane_of) // self.prompts_per_lane)
+        return encode(self.wrapper, prompt, self.checker.add_cls)
+
+    def _truncate(self, ids):
+        """The last `window` ids, with a leading [CLS] kept in front."""
+        if len(ids) <= self.window:
+            return ids
+        if self.checker.add_cls:
+            return ids[:1] + ids[-(self.window - 1):]
+        return ids[-self.window:]
+
+    def _prime(self, lane, hyps):
+        """Rebuilds the lane's cache from scratch for hyps."""
+        prefixes = [self._truncate(h.ids)[:-1] for h in hyps]
+        width = max(len(ids) for ids in prefixes)
+        input_ids = torch.full((len(hyps), width), self.pad_id, dtype=torch.long)
+        attention = torch.zeros((len(hyps), width), dtype=torch.long)
+        for i, ids in enumerate(prefixes):
+            input_ids[i, width - len(ids):] = torch.tensor(ids, dtype=torch.long)
+            attention[i, width - len(ids):] = 1
+        lane.past = None
+        if width:
+            positions = (attention.cumsum(dim=1) - 1).clamp(min=0)
+            lane.past = self.model(input_ids=input_ids, attention_mask=attention,
+                                   position_ids=positions, use_cache=True,
+                                   return_dict=True).past_key_values
+            self.forwards += 1
+        lane.attention, lane.lengths = attention, attention.sum(dim=1)
+
+    def _step(self, lane, hyps):
+        """Log-probs after each of hyps, reusing the rows of their parents."""
+        rows = {id(h): i for i, h in enumerate(lane.hyps)}
+        if lane.lengths is not None and all(id(h.parent) in rows for h in hyps):
+            index = torch.tensor([rows[id(h.parent)] for h in hyps], dtype=torch.long)
+            lane.past = select_cache(lane.past, index) if lane.past is not None else None
+            lane.attention, lane.lengths = lane.attention[index], lane.lengths[index]
+            if lane.lengths.max().item() + 2 > self.checker.max_positions:
+                self._prime(lane, hyps)
+        else:
+            self._prime(lane, hyps)
+        lane.hyps = hyps
+
+        input_ids = torch.tensor([[h.ids[-1], self.mask_id] for h in hyps], dtype=torch.long)
+        attention = torch.cat([lane.attention, torch.ones((len(hyps), 2), dtype=torch.long)], dim=1)
+        positions = lane.lengths[:, None] + torch.arange(2)
+        out = self.model(input_ids=input_ids, past_key_values=lane.past, attention_mask=attention,
+                         position_ids=positions, use_cache=True, return_dict=True)
+        self.forwards += 1
+        # keep the new character, drop the [MASK]
+        lane.past = crop_cache(out.past_key_values, attention.shape[1] - 1)
+        lane.attention, lane.lengths = attention[:, :-1], lane.lengths + 1
+        return torch.log_softmax(out.logits[:, -1].float(), dim=-1)
+
+    @property
+    def batched(self):
+        return self.checker.mode == "kv"
+
+    @torch.no_grad()
+    def log_probs(self, hyps):
+        """(len(hyps), vocab) log-probabilities for the character after each hypothesis."""
+        if not self.batched:
+            self.forwards += len(hyps)
+            return torch.stack([
+                torch.log_softmax(fill_mask(self.wrapper, (h.prompt + h.text)[-self.window:] + "[MASK]")
+                                  .flatten().float(), dim=-1)
+                for h in hyps])
+
+        by_lane = {}
+        for i, h in enumerate(hyps):
+            by_lane.setdefault(self.lane_of[h.prompt], []).append(i)
+        out = [None] * len(hyps)
+        for key, members in by_lane.items():
+            lane = self.lanes.setdefault(key, Lane())
+            for i, row in zip(members, self._step(lane, [hyps[i] for i in members])):
+                out[i] = row
+        return torch.stack(out)
+
+
+def beam_search(scorer, prompts, beam_width=BEAM_WIDTH, max_length=MAX_LENGTH):
+    """Runs all prompts' beams together; returns every final hypothesis."""
+    beams = {p: [Hypothesis(p, scorer.prepare(p))] for p in prompts}
+    itos = scorer.wrapper.itos
+
+    for _ in range(max_length):
+        active = [h for hs in beams.values() for h in hs if not h.done]
+        if not active:
+            break
+        top_logp, top_ids = scorer.log_probs(active).topk(beam_width, dim=-1)
+
+        candidates = {p: [h for h in hs if h.done] for p, hs in beams.items()}
+        for h, lps, ids in zip(active, top_logp.tolist(), top_ids.tolist()):
+            for lp, token_id in zip(lps, ids):
+                candidates[h.prompt].append(h.extend(token_id, itos[token_id], lp))
+        beams = {p: sorted(hs, key=lambda h: h.logp, reverse=True)[:beam_width]
+                 for p, hs in candidates.items()}
+
+    return [h for hs in beams.values() for h in hs]
+
+
+def candidate_secret(h):
+    """The flag-shaped part of a hypothesis, if any, else the raw continuation."""
+    full = h.prompt + h.text
+    start = full.find(FLAG_IDENTIFIER)
+    if start < 0:
+        return None
+    end = full.find("}", start)
+    return full[start:end + 1] if end >= 0 else full[start:]
+
+
+def ranked_report(hyps, top=TOP_RESULTS):
+    """Unique candidate secrets ranked by cumulative log-probability."""
+    best = {}
+    for h in hyps:
+        secret = candidate_secret(h)
+        if secret is None:
+            continue
+        if secret not in best or h.logp > best[secret].logp:
+            best[secret] = h
+    return sorted(best.items(), key=lambda kv: kv[1].logp, reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched beam extraction over many prompts")
+    parser.add_argument("--beam", type=int, default=BEAM_WIDTH)
+    parser.add_argument("--max-length", type=int, default=MAX_LENGTH)
+    parser.add_argument("--top", type=int, default=TOP_RESULTS)
+    args = parser.parse_args()
+
+    print("Loading the MLMpire model...")
+    wrapper = load_hf_gpt2_model(model_path=MODEL_PATH, vocab_path=VOCAB_PATH)
+    scorer = BatchedScorer(wrapper, beam_width=args.beam)
+
+    start = time.perf_counter()
+    hyps = beam_search(scorer, PROMPT_CANDIDATES, args.beam, args.max_length)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(PROMPT_CANDIDATES)} prompts x beam {args.beam}: {scorer.forwards} "
+          f"{'batched ' if scorer.batched else ''}forward passes in {elapsed:.2f}s")
+    report = ranked_report(hyps, args.top)
+    if not report:
+        print(f"No hypothesis contains '{FLAG_IDENTIFIER}'. Best raw continuations:")
+        for h in sorted(hyps, key=lambda h: h.logp, reverse=True)[:args.top]:
+            print(f"  {h.logp:9.2f}  {h.prompt!r} -> {h.text!r}")
+    for rank, (secret, h) in enumerate(report, 1):
+        print(f"{rank:>3}. logp={h.logp:9.2f} ({h.logp / max(len(h.text), 1):6.3f}/char)  "
+              f"{secret}   [prompt: {h.prompt!r}]")
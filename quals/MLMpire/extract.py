@@ -0,0 +1,194 @@
+"""
+Incremental flag extraction for the MLMpire model.
+
+The notebook's solve() calls fill_mask(wrapper, prompt + "[MASK]") on the
+whole, ever-growing prompt for every character, so the total cost is
+quadratic in the output length. This engine keeps the model's key/value cache
+for the unchanged prefix and only feeds [new_char, MASK] per step:
+
+  - "kv" mode: the cache is reused across steps. The [MASK] entry is cropped
+    off after each step, so only the accepted characters stay cached. When
+    the prefix reaches the model's position limit, the cache is rebuilt from
+    the last `window` tokens.
+  - "window" mode: used when cached logits do not reproduce fill_mask() (e.g.
+    the masked position attends to the right, or the wrapper adds tokens we
+    cannot see). fill_mask() is called on only the last `window` characters,
+    so each step costs the same.
+
+The mode is picked by checking the first step against fill_mask() itself.
+
+Usage (from the directory with architecture.py, hf_gpt2_model/ and vocab.json):
+    python extract.py --prompt "log entry related to the flag: AI2025{"
+"""
+
+import argparse
+import re
+import time
+
+import torch
+
+from architecture import load_hf_gpt2_model, fill_mask
+
+# --- Configuration ---
+MODEL_PATH = "./hf_gpt2_model"
+VOCAB_PATH = "vocab.json"
+DEFAULT_PROMPT = "log entry related to the flag: AI2025{"
+MAX_LENGTH = 500
+CONTEXT_WINDOW = 256     # characters kept when the prefix has to be truncated
+STOP_TOKENS = ["[PAD]", "[SEP]", "[CLS]", "}"]
+MATCH_TOLERANCE = 1e-3   # max |logit difference| for the cache to count as exact
+
+SPECIAL_TOKEN = re.compile(r"\[[A-Z]+\]")
+
+
+def encode(wrapper, text, add_cls=False):
+    """
+    Character-level ids for text, keeping [SPECIAL] tokens whole. Uses the
+    wrapper's own encoder if it has one.
+    """
+    if hasattr(wrapper, "encode"):
+        ids = list(wrapper.encode(text))
+    else:
+        stoi = wrapper.stoi
+        ids, pos = [], 0
+        for m in SPECIAL_TOKEN.finditer(text):
+            ids.extend(stoi[c] for c in text[pos:m.start()])
+            ids.append(stoi[m.group()])
+            pos = m.end()
+        ids.extend(stoi[c] for c in text[pos:])
+    if add_cls and "[CLS]" in wrapper.stoi:
+        ids = [wrapper.stoi["[CLS]"]] + ids
+    return ids
+
+
+def crop_cache(past, length):
+    """Drops cached positions >= length (DynamicCache or legacy tuples)."""
+    if hasattr(past, "crop"):
+        # negative = "remove this many"; accepted by both old and new transformers
+        extra = past.get_seq_length() - length
+        if extra > 0:
+            past.crop(-extra)
+        return past
+    return tuple((k[:, :, :length], v[:, :, :length]) for k, v in past)
+
+
+class IncrementalExtractor:
+    """Greedy next-character extraction with a cached prefix."""
+
+    def __init__(self, wrapper, window=CONTEXT_WINDOW):
+        self.wrapper = wrapper
+        self.model = wrapper.model.eval()
+        self.mask_id = wrapper.stoi["[MASK]"]
+        self.max_positions = getattr(self.model.config, "n_positions", None) or 10 ** 9
+        self.window = min(window, self.max_positions - 2)
+        self.mode = None
+        self.add_cls = False
+        self.latencies = []   # (prompt length, seconds) per generated character
+
+    @torch.no_grad()
+    def _forward(self, ids, past=None):
+        out = self.model(input_ids=torch.tensor([ids]), past_key_values=past,
+                         use_cache=True, return_dict=True)
+        return out.logits[0, -1], out.past_key_values
+
+    @torch.no_grad()
+    def choose_mode(self, prompt):
+        """Uses the KV cache only if it reproduces fill_mask() on this prompt."""
+        reference = fill_mask(self.wrapper, prompt + "[MASK]").flatten()
+        for add_cls in (False, True):
+            try:
+                ids = encode(self.wrapper, prompt, add_cls)
+                logits, _ = self._forward(ids + [self.mask_id])
+            except (KeyError, TypeError, ValueError, RuntimeError):
+                continue
+            if logits.shape == reference.shape and \
+                    (logits - reference).abs().max().item() <= MATCH_TOLERANCE:
+                self.mode, self.add_cls = "kv", add_cls
+                return self.mode
+        self.mode = "window"
+        return self.mode
+
+    def _prime(self, ids):
+        """Caches ids (minus the last) and returns (past, cached length)."""
+        ids = ids[-self.window:]
+        _, past = self._forward(ids[:-1]) if len(ids) > 1 else (None, None)
+        return past, len(ids) - 1, ids[-1]
+
+    @torch.no_grad()
+    def extract(self, prompt, max_length=MAX_LENGTH, echo=True):
+        """Yields predicted characters until a stop token or max_length."""
+        if self.mode is None:
+            self.choose_mode(prompt)
+        text = prompt
+
+        if self.mode == "kv":
+            # Cache everything except the last prompt token, which is fed with the mask
+            past, cached, pending = self._prime(encode(self.wrapper, prompt, self.add_cls))
+
+        for _ in range(max_length):
+            start = time.perf_counter()
+            if self.mode == "kv":
+                if cached + 2 > self.max_positions:
+                    past, cached, pending = self._prime(
+                        encode(self.wrapper, text[-self.window:], self.add_cls))
+                logits, past = self._forward([pending, self.mask_id], past)
+                cached += 1
+                past = crop_cache(past, cached)
+            else:
+                logits = fill_mask(self.wrapper, text[-self.window:] + "[MASK]").flatten()
+
+            predicted_char = self.wrapper.itos[torch.argmax(logits).item()]
+            self.latencies.append((len(text), time.perf_counter() - start))
+            if echo:
+                print(predicted_char, end="", flush=True)
+            yield predicted_char
+            if predicted_char in STOP_TOKENS:
+                break
+            text += predicted_char
+            if self.mode == "kv":
+                pending = self.wrapper.stoi[predicted_char]
+
+    def latency_report(self, buckets=5):
+        """Mean per-character latency for equal slices of the run, by prompt length."""
+        if not self.latencies:
+            return "no characters generated"
+        size = max(1, len(self.latencies) // buckets)
+        lines = [f"mode={self.mode}  {'prompt len':>12} | {'ms/char':>8}"]
+        for i in range(0, len(self.latencies), size):
+            chunk = self.latencies[i:i + size]
+            lo, hi = chunk[0][0], chunk[-1][0]
+            ms = sum(s for _, s in chunk) / len(chunk) * 1000
+            lines.append(f"{'':>10}{lo:>6}-{hi:<6} | {ms:>8.2f}")
+        return "\n".join(lines)
+
+
+def baseline_latency(wrapper, prompt, lengths=(50, 200, 400)):
+    """Per-character cost of the notebook's full-prompt fill_mask at a few prompt lengths."""
+    pad = (prompt * (max(lengths) // max(len(prompt), 1) + 1))
+    rows = []
+    for n in lengths:
+        start = time.perf_counter()
+        fill_mask(wrapper, pad[:n] + "[MASK]")
+        rows.append((n, (time.perf_counter() - start) * 1000))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="KV-cached MLMpire flag extraction")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT)
+    parser.add_argument("--max-length", type=int, default=MAX_LENGTH)
+    parser.add_argument("--window", type=int, default=CONTEXT_WINDOW)
+    args = parser.parse_args()
+
+    print("Loading the MLMpire model...")
+    wrapper = load_hf_gpt2_model(model_path=MODEL_PATH, vocab_path=VOCAB_PATH)
+    extractor = IncrementalExtractor(wrapper, window=args.window)
+    print(f"Decoding mode: {extractor.choose_mode(args.prompt)}")
+
+    print("Extracted String: ", end="", flush=True)
+    secret = "".join(extractor.extract(args.prompt, args.max_length))
+    print(f"\n\nFull extracted string: {args.prompt + secret}")
+    print(extractor.latency_report())
+    print("Baseline fill_mask on the full prompt:")
+    for n, ms in baseline_latency(wrapper, args.prompt):
+        print(f"  prompt len {n:>4}: {ms:.2f} ms/char")
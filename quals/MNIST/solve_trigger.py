@@ -0,0 +1,191 @@
+"""
+Vectorized solver for the MNIST backdoor signature.
+
+The Verifier accepts a trigger (m, s) when (m . A_i . s^T) mod q == y_i for
+every i. With m known, each check reduces to a linear form in the bits of s:
+
+    w_i = m . A_i   (length l),   w_i . s == y_i  (mod q)
+
+so the whole system is W s == y (mod q) with W of shape (n, l).
+
+  - brute force: every candidate s, decoded from the integers 0..2^l - 1, is
+    checked in chunks with one matrix product per chunk. This is fine up to
+    about 24 bits.
+  - meet-in-the-middle: s is split into a low and a high half, and
+    W s = W_lo s_lo + W_hi s_hi. The residue vectors of all high halves are
+    packed into integer keys and sorted. Each low half then looks up the key
+    y - W_lo s_lo with np.searchsorted. This costs 2 * 2^(l/2) work instead
+    of 2^l.
+
+Both modes return every solution (wider triggers can have several).
+
+Usage:
+    python solve_trigger.py --buffers dist/buffers.npz --output trigger.png
+    python solve_trigger.py --benchmark
+"""
+
+import argparse
+import time
+
+import numpy as np
+from PIL import Image
+
+# --- Configuration ---
+BUFFERS_PATH = "dist/buffers.npz"
+TRIGGER_PATH = "trigger.png"
+Q = 256
+MESSAGE_BITS = 8
+CHUNK_SIZE = 1 << 20          # candidates per matrix product
+MAX_BRUTE_FORCE_BITS = 24     # "auto" switches to meet-in-the-middle above this
+BENCHMARK_WIDTHS = (8, 16, 24, 32)
+IMAGE_SIZE = 28
+
+
+def load_buffers(path=BUFFERS_PATH):
+    data = np.load(path)
+    return np.rint(data["B"]).astype(np.int64), np.rint(data["y"]).astype(np.int64)
+
+
+def reduce_system(B, y, m, q=Q):
+    """Folds the known message into the checks: returns W (n, l) with W s == y (mod q)."""
+    k = len(m)
+    A = B.reshape(B.shape[0], k, -1)
+    return np.einsum("k,nkl->nl", m, A) % q, y % q
+
+
+def unpack_bits(values, width):
+    """(len(values), width) uint8 0/1 matrix; bit j of each value goes to column j."""
+    as_bytes = values.astype("<u8").view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(as_bytes, axis=1, bitorder="little")[:, :width]
+
+
+def products(W, bits):
+    # float32 products are exact here (|W . s| < 2^24) and go through BLAS
+    return (bits.astype(np.float32) @ W.T.astype(np.float32)).astype(np.int64)
+
+
+def residues(W, bits, q=Q):
+    return products(W, bits) % q
+
+
+def brute_force(W, y, q=Q, chunk_size=CHUNK_SIZE):
+    """All s in {0,1}^l with W s == y (mod q), checking chunk_size candidates per product."""
+    width = W.shape[1]
+    solutions = []
+    for start in range(0, 1 << width, chunk_size):
+        values = np.arange(start, min(start + chunk_size, 1 << width), dtype=np.int64)
+        bits = unpack_bits(values, width)
+        r = products(W, bits)
+        # The first check alone rejects all but ~1/q of the chunk; test the rest on survivors
+        survivors = np.flatnonzero((r[:, 0] - y[0]) % q == 0)
+        hits = survivors[np.all((r[survivors] - y) % q == 0, axis=1)]
+        solutions.extend(bits[hits])
+    return np.array(solutions, dtype=np.int64).reshape(-1, width)
+
+
+def pack_keys(a, b, q=Q):
+    """
+    One integer per residue vector of a and of b, equal exactly when the
+    vectors are. The base-q number fits in int64 only while q ** n < 2 ** 63
+    (n <= 7 for q = 256); above that the rows are numbered by np.unique.
+    """
+    n = a.shape[1]
+    if int(q) ** n < 2 ** 63:
+        powers = q ** np.arange(n, dtype=np.int64)
+        return a @ powers, b @ powers
+    _, ids = np.unique(np.concatenate([a, b]), axis=0, return_inverse=True)
+    ids = ids.reshape(-1)
+    return ids[:len(a)], ids[len(a):]
+
+
+def meet_in_the_middle(W, y, q=Q):
+    """Same result as brute_force, in O(2^(l/2)) time and memory."""
+    width = W.shape[1]
+    lo_width = width // 2
+    hi_width = width - lo_width
+    W_lo, W_hi = W[:, :lo_width], W[:, lo_width:]
+
+    hi_bits = unpack_bits(np.arange(1 << hi_width, dtype=np.int64), hi_width)
+    lo_bits = unpack_bits(np.arange(1 << lo_width, dtype=np.int64), lo_width)
+    hi_keys, targets = pack_keys(residues(W_hi, hi_bits, q),
+                                 (y - residues(W_lo, lo_bits, q)) % q, q)
+    order = np.argsort(hi_keys, kind="stable")
+    hi_keys = hi_keys[order]
+
+    left = np.searchsorted(hi_keys, targets, side="left")
+    right = np.searchsorted(hi_keys, targets, side="right")
+
+    # Every (lo, hi) pair inside a matching key range is a solution
+    counts = right - left
+    lo_idx = np.repeat(np.arange(len(targets)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    hi_idx = order[np.repeat(left, counts) + offsets]
+    solutions = np.concatenate([lo_bits[lo_idx], hi_bits[hi_idx]], axis=1)
+    return solutions[np.lexsort(solutions.T[::-1])].astype(np.int64)
+
+
+def solve(W, y, mode="auto", q=Q):
+    if mode == "auto":
+        mode = "brute" if W.shape[1] <= MAX_BRUTE_FORCE_BITS else "mitm"
+    return (brute_force if mode == "brute" else meet_in_the_middle)(W, y, q)
+
+
+def trigger_image(m, s, size=IMAGE_SIZE):
+    """Black image with the m || s bits in the first pixels (1 = white)."""
+    flat = np.zeros(size * size, dtype=np.uint8)
+    bits = np.concatenate([m, s])
+    flat[:len(bits)] = np.where(bits > 0, 255, 0)
+    return Image.fromarray(flat.reshape(size, size), mode="L")
+
+
+def synthetic_system(width, k=MESSAGE_BITS, n=3, q=Q, seed=0):
+    """Random instance shaped like gen.ipynb's Builder, with a planted signature."""
+    rng = np.random.default_rng(seed)
+    A = rng.integers(1, q // 2, size=(n, k, width), dtype=np.int64)
+    sigma = rng.integers(0, 2, size=width, dtype=np.int64)
+    m = np.ones(k, dtype=np.int64)
+    y = np.einsum("k,nkl,l->n", m, A, sigma) % q
+    return A.reshape(n, -1), y, m, sigma
+
+
+def benchmark(widths=BENCHMARK_WIDTHS, max_brute_bits=MAX_BRUTE_FORCE_BITS):
+    print(f"{'bits':>4} | {'mode':>5} | {'seconds':>9} | {'candidates/s':>13} | solutions | planted found")
+    for width in widths:
+        B, y, m, sigma = synthetic_system(width)
+        W, y = reduce_system(B, y, m)
+        for mode in ("brute", "mitm"):
+            if mode == "brute" and width > max_brute_bits:
+                print(f"{width:>4} | {mode:>5} | {'skipped':>9} |")
+                continue
+            start = time.perf_counter()
+            solutions = solve(W, y, mode)
+            elapsed = time.perf_counter() - start
+            found = bool((solutions == sigma).all(axis=1).any())
+            rate = (1 << width) / elapsed
+            print(f"{width:>4} | {mode:>5} | {elapsed:>9.4f} | {rate:>13.3g} | "
+                  f"{len(solutions):>9} | {found}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recover the MNIST backdoor signature")
+    parser.add_argument("--buffers", default=BUFFERS_PATH)
+    parser.add_argument("--mode", choices=["auto", "brute", "mitm"], default="auto")
+    parser.add_argument("--output", default=TRIGGER_PATH)
+    parser.add_argument("--benchmark", action="store_true",
+                        help="time both modes on synthetic triggers of 8-32 bits")
+    parser.add_argument("--max-brute-bits", type=int, default=MAX_BRUTE_FORCE_BITS)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(max_brute_bits=args.max_brute_bits)
+    else:
+        B, y = load_buffers(args.buffers)
+        m = np.ones(MESSAGE_BITS, dtype=np.int64)
+        W, y = reduce_system(B, y, m)
+        solutions = solve(W, y, args.mode)
+        print(f"{len(solutions)} signature(s) satisfy all {len(y)} checks:")
+        for s in solutions:
+            print(f"  s = {s.tolist()}")
+        if len(solutions):
+            trigger_image(m, solutions[0]).save(args.output)
+            print(f"Trigger image written to {args.output}; submit it with dist/submit.py --image {args.output}")
@@ -0,0 +1,236 @@
+"""
+Local CPU real-vs-synthetic detector, used as a fast path in front of the
+remote vision API.
+
+Two cheap views of each image feed small logistic-regression heads:
+  - frequency features: the radially averaged log power spectrum (generated
+    images tend to have too little or oddly structured high-frequency energy)
+    plus per-channel colour statistics
+  - CNN features: pooled embeddings from an ImageNet MobileNetV3-Small,
+    computed in batches on CPU (skipped if the weights cannot be loaded)
+The ensemble probability is the mean of the available heads. Only confident answers
+are used directly; everything else is escalated to the remote API.
+
+The heads are fitted on images the remote API already labelled (the pipelined
+runner saves them under labelled/real and labelled/fake):
+
+    python local_detector.py fit --real labelled/real --fake labelled/fake
+    python local_detector.py predict some_image.jpg
+
+torch and sklearn are imported only when a model is loaded or fitted, so
+importing this module (for MicroBatcher, say) stays cheap.
+"""
+
+import argparse
+import io
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from PIL import Image
+
+# --- Configuration ---
+DETECTOR_PATH = "detector.joblib"
+CONFIDENT_LOW = 0.1     # p(fake) at or below this answers "real" locally
+CONFIDENT_HIGH = 0.9    # p(fake) at or above this answers "fake" locally
+SPECTRUM_SIZE = 256
+SPECTRUM_BANDS = 32
+CNN_INPUT_SIZE = 224
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def spectral_features(img):
+    """
+    Radially averaged log power spectrum of the grayscale image, in
+    SPECTRUM_BANDS bands, plus the log-log slope of the spectrum, the share
+    of energy in the top quarter of frequencies and per-channel mean/std.
+    """
+    rgb = np.asarray(img.convert("RGB").resize((SPECTRUM_SIZE, SPECTRUM_SIZE), Image.BILINEAR),
+                     dtype=np.float32) / 255.0
+    colour = np.concatenate([rgb.mean(axis=(0, 1)), rgb.std(axis=(0, 1))])
+
+    gray = np.asarray(img.convert("L").resize((SPECTRUM_SIZE, SPECTRUM_SIZE), Image.BILINEAR),
+                      dtype=np.float32)
+    gray -= gray.mean()
+    power = np.abs(np.fft.fftshift(np.fft.fft2(gray))) ** 2
+
+    yy, xx = np.indices(power.shape)
+    c = SPECTRUM_SIZE // 2
+    radius = np.hypot(yy - c, xx - c) / c
+    band = np.minimum((radius * SPECTRUM_BANDS).astype(int), SPECTRUM_BANDS - 1)
+    # np.bincount does the radial average for all bands in one pass
+    totals = np.bincount(band.ravel(), weights=power.ravel(), minlength=SPECTRUM_BANDS)
+    counts = np.bincount(band.ravel(), minlength=SPECTRUM_BANDS)
+    profile = np.log1p(totals / np.maximum(counts, 1))
+
+    freqs = np.log((np.arange(SPECTRUM_BANDS) + 0.5) / SPECTRUM_BANDS)
+    slope = np.polyfit(freqs[1:], profile[1:], 1)[0]
+    high_share = totals[3 * SPECTRUM_BANDS // 4:].sum() / max(totals.sum(), 1e-12)
+    return np.concatenate([profile - profile.mean(), [slope, high_share], colour]).astype(np.float32)
+
+
+class LocalDetector:
+    """Batched CPU ensemble of a frequency head and a MobileNet-feature head."""
+
+    def __init__(self, path=DETECTOR_PATH, low=CONFIDENT_LOW, high=CONFIDENT_HIGH):
+        self.low, self.high = low, high
+        self.heads = {}
+        if path and os.path.exists(path):
+            import joblib
+            self.heads = joblib.load(path)
+        self._backbone = None
+        self._transform = None
+        self._backbone_failed = False
+
+    @property
+    def ready(self):
+        return bool(self.heads)
+
+    def _load_backbone(self):
+        if self._backbone is None:
+            import torch
+            from torchvision import models, transforms
+            weights = models.MobileNet_V3_Small_Weights.DEFAULT
+            backbone = models.mobilenet_v3_small(weights=weights)
+            backbone.classifier = torch.nn.Identity()
+            self._backbone = backbone.eval()
+            self._transform = transforms.Compose([
+                transforms.Resize(CNN_INPUT_SIZE),
+                transforms.CenterCrop(CNN_INPUT_SIZE),
+                transforms.ToTensor(),
+                transforms.Normalize(weights.transforms().mean, weights.transforms().std),
+            ])
+        return self._backbone
+
+    def cnn_features(self, images):
+        import torch
+        backbone = self._load_backbone()
+        with torch.no_grad():
+            batch = torch.stack([self._transform(img.convert("RGB")) for img in images])
+            return backbone(batch).numpy()
+
+    def features(self, images):
+        """
+        Returns {"freq": (N, F), "cnn": (N, 576)} for a list of PIL images;
+        "cnn" is left out if the backbone weights are unavailable.
+        """
+        feats = {"freq": np.stack([spectral_features(img) for img in images])}
+        if not self._backbone_failed and (not self.heads or "cnn" in self.heads):
+            try:
+                feats["cnn"] = self.cnn_features(images)
+            except OSError as e:
+                print(f"[!] CNN backbone unavailable ({e}); using frequency features only.")
+                self._backbone_failed = True
+        return feats
+
+    def predict_proba(self, images_bytes):
+        """p(fake) for a batch of encoded images, averaged over the fitted heads."""
+        images = [Image.open(io.BytesIO(b)) for b in images_bytes]
+        feats = self.features(images)
+        probs = [head.predict_proba(feats[name])[:, 1]
+                 for name, head in self.heads.items() if name in feats]
+        return np.mean(probs, axis=0)
+
+    def decide(self, p_fake):
+        """'fake'/'real' when confident, else None (escalate)."""
+        if p_fake >= self.high:
+            return "fake"
+        if p_fake <= self.low:
+            return "real"
+        return None
+
+    def fit(self, real_paths, fake_paths, path=DETECTOR_PATH):
+        import joblib
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.model_selection import cross_val_score
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import StandardScaler
+
+        images = [Image.open(p) for p in real_paths + fake_paths]
+        labels = np.array([0] * len(real_paths) + [1] * len(fake_paths))
+        feats = self.features(images)
+        self.heads = {}
+        for name, X in feats.items():
+            head = make_pipeline(StandardScaler(), LogisticRegression(C=0.5, max_iter=2000))
+            folds = min(5, np.bincount(labels).min())
+            if folds >= 2:
+                acc = cross_val_score(head, X, labels, cv=folds).mean()
+                print(f"[{name}] {folds}-fold accuracy: {acc:.3f}")
+            self.heads[name] = head.fit(X, labels)
+        joblib.dump(self.heads, path)
+        print(f"Saved detector heads to {path}")
+
+
+class MicroBatcher:
+    """
+    Groups single-item requests from many threads into batches for fn(items)
+    -> results. A batch is run when max_batch items are waiting or max_wait
+    seconds have passed since the first one arrived. If a batch raises, its
+    items are retried one by one, so a bad item fails only its own future.
+    """
+
+    def __init__(self, fn, max_batch=16, max_wait=0.01):
+        self.fn, self.max_batch, self.max_wait = fn, max_batch, max_wait
+        self.queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, item):
+        future = Future()
+        self.queue.put((item, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while len(batch) < self.max_batch:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+            items, futures = zip(*batch)
+            try:
+                for future, result in zip(futures, self.fn(list(items))):
+                    future.set_result(result)
+            except Exception as e:
+                if len(items) == 1:
+                    futures[0].set_exception(e)
+                    continue
+                # one bad item (a corrupt image, say) fails the batch; rerun them
+                # one at a time so only that item's future gets the error
+                for item, future in zip(items, futures):
+                    try:
+                        future.set_result(self.fn([item])[0])
+                    except Exception as item_error:
+                        future.set_exception(item_error)
+
+
+def list_images(directory):
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory)
+                  if f.lower().endswith(IMAGE_EXTENSIONS))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local real-vs-synthetic detector")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fit_parser = sub.add_parser("fit", help="fit the heads on labelled folders")
+    fit_parser.add_argument("--real", default=os.path.join("labelled", "real"))
+    fit_parser.add_argument("--fake", default=os.path.join("labelled", "fake"))
+    predict_parser = sub.add_parser("predict", help="score images")
+    predict_parser.add_argument("images", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "fit":
+        real, fake = list_images(args.real), list_images(args.fake)
+        print(f"Fitting on {len(real)} real and {len(fake)} fake images...")
+        LocalDetector(path=None).fit(real, fake)
+    else:
+        detector = LocalDetector()
+        if not detector.ready:
+            raise SystemExit(f"No fitted detector at {DETECTOR_PATH}; run 'fit' first.")
+        blobs = [open(p, "rb").read() for p in args.images]
+        for p, prob in zip(args.images, detector.predict_proba(blobs)):
+            print(f"{p}: p(fake)={prob:.3f} -> {detector.decide(prob) or 'uncertain'}")
@@ -0,0 +1,163 @@
+"""
+Local stand-in for the Real or Fake challenge, for offline benchmarking.
+
+Serves the saved index.html with a small script.js that walks through the same
+screens and element IDs as the real site, synthetic JPEGs, and a mock of the
+Gemini generateContent endpoint with configurable latency.
+
+Each synthetic image is tinted red ("fake") or green ("real"); the mock
+classifier decodes the upload and answers from the tint, so the expected
+accuracy is 100% and any wrong click is a runner bug.
+
+Usage:
+    python mock_server.py --images 50 --classifier-latency 0.8
+    BASE_URL=http://127.0.0.1:8000 \\
+    GEMINI_API_URL="http://127.0.0.1:8000/v1beta/models/mock:generateContent?key=" \\
+    python solve_pipelined.py
+"""
+
+import argparse
+import base64
+import io
+import os
+import time
+from functools import lru_cache
+
+import numpy as np
+from flask import Flask, Response, jsonify, request, send_from_directory
+from PIL import Image
+
+# --- Configuration ---
+HOST = "127.0.0.1"
+PORT = 8000
+NUM_IMAGES = 50
+NUM_UNIQUE_IMAGES = 50    # < NUM_IMAGES makes later rounds reuse earlier images
+IMAGE_SIZE = 512
+IMAGE_LATENCY = 0.1       # seconds per image download
+CLASSIFIER_LATENCY = 0.8  # seconds per generateContent call
+RENDER_DELAY_MS = 300     # delay before the page shows the next image
+
+STATIC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+app = Flask(__name__)
+config = {
+    "images": NUM_IMAGES,
+    "unique": NUM_UNIQUE_IMAGES,
+    "image_latency": IMAGE_LATENCY,
+    "classifier_latency": CLASSIFIER_LATENCY,
+    "render_delay_ms": RENDER_DELAY_MS,
+}
+stats = {"image_requests": 0, "classifier_requests": 0, "classifier_bytes": 0}
+
+SCRIPT_JS = """
+const TOTAL = %(images)d, UNIQUE = %(unique)d, DELAY = %(render_delay_ms)d;
+const show = id => {
+  document.querySelectorAll('.screen').forEach(s => s.classList.remove('active'));
+  document.getElementById(id).classList.add('active');
+};
+let current = 1, correct = 0;
+const truth = i => (((i - 1) %% UNIQUE) %% 2 === 0) ? 'fake' : 'real';
+function render() {
+  document.getElementById('current-image').textContent = current;
+  document.getElementById('current-image-display').src = '/images/' + current + '.jpg';
+}
+function answer(choice) {
+  if (current > TOTAL) return;
+  if (choice === truth(current)) correct++;
+  current++;
+  if (current > TOTAL) {
+    show('results-screen');
+    document.getElementById('results-content').textContent =
+      'Score: ' + correct + '/' + TOTAL +
+      (correct === TOTAL ? '  AICTF{m0ck_fl4g}' : '');
+    return;
+  }
+  setTimeout(render, DELAY);
+}
+document.getElementById('total-images').textContent = TOTAL;
+document.getElementById('deepfake-btn').onclick = () => answer('fake');
+document.getElementById('legitimate-btn').onclick = () => answer('real');
+document.getElementById('start-challenge').onclick = () => { render(); show('challenge-screen'); };
+setTimeout(() => show('instructions-screen'), 200);
+"""
+
+STYLE_CSS = ".screen { display: none; } .screen.active { display: block; }"
+
+
+@lru_cache(maxsize=None)
+def make_image(index):
+    """
+    Deterministic photo-like JPEG (smooth random blobs plus grain), red-tinted
+    for fake and green-tinted for real.
+    """
+    unique = (index - 1) % config["unique"]
+    rng = np.random.default_rng(unique)
+    coarse = Image.fromarray(rng.integers(0, 180, (8, 8, 3), dtype=np.uint8))
+    pixels = np.asarray(coarse.resize((IMAGE_SIZE, IMAGE_SIZE), Image.BICUBIC), dtype=np.int16)
+    pixels = pixels + rng.integers(-10, 10, pixels.shape)
+    pixels[..., 0 if unique % 2 == 0 else 1] += 60
+    pixels = np.clip(pixels, 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+@app.route("/")
+def index():
+    return send_from_directory(STATIC_DIR, "index.html")
+
+
+@app.route("/static/script.js")
+def script():
+    return Response(SCRIPT_JS % config, mimetype="application/javascript")
+
+
+@app.route("/static/style.css")
+def style():
+    return Response(STYLE_CSS, mimetype="text/css")
+
+
+@app.route("/images/<int:index>.jpg")
+def image(index):
+    stats["image_requests"] += 1
+    time.sleep(config["image_latency"])
+    return Response(make_image(index), mimetype="image/jpeg")
+
+
+@app.route("/v1beta/models/<path:model>", methods=["POST"])
+def generate_content(model):
+    """Answers 'real'/'fake' from the dominant colour channel of the upload."""
+    stats["classifier_requests"] += 1
+    time.sleep(config["classifier_latency"])
+    try:
+        data = request.get_json()["contents"][0]["parts"][1]["inlineData"]["data"]
+        raw = base64.b64decode(data)
+        stats["classifier_bytes"] += len(raw)
+        pixels = np.asarray(Image.open(io.BytesIO(raw)).convert("RGB"), dtype=np.float32)
+    except (KeyError, IndexError, TypeError, OSError):
+        return jsonify({"error": {"message": "bad request"}}), 400
+    r, g = pixels[..., 0].mean(), pixels[..., 1].mean()
+    verdict = "fake" if r > g else "real"
+    return jsonify({"candidates": [{"content": {"parts": [{"text": verdict}]}}]})
+
+
+@app.route("/stats")
+def get_stats():
+    return jsonify(stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline Real or Fake stand-in")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--images", type=int, default=NUM_IMAGES)
+    parser.add_argument("--unique", type=int, default=None,
+                        help="number of distinct images (default: same as --images)")
+    parser.add_argument("--image-latency", type=float, default=IMAGE_LATENCY)
+    parser.add_argument("--classifier-latency", type=float, default=CLASSIFIER_LATENCY)
+    parser.add_argument("--render-delay-ms", type=int, default=RENDER_DELAY_MS)
+    args = parser.parse_args()
+    config.update(images=args.images, unique=args.unique or args.images,
+                  image_latency=args.image_latency,
+                  classifier_latency=args.classifier_latency,
+                  render_delay_ms=args.render_delay_ms)
+    app.run(host=HOST, port=args.port, threaded=True)
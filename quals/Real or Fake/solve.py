@@ -1,22 +1,32 @@
 import requests
 import json
 import base64
+import os
 import time
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from sg_ai_ctf_25.oracle import Oracle
+
 # The base URL of the challenge website from the README file.
-BASE_URL = "https://real-or-fake.aictf.sg"
+# Both URLs can be overridden from the environment, e.g. to point at mock_server.py.
+BASE_URL = os.environ.get("BASE_URL", "https://real-or-fake.aictf.sg")
 # The API endpoint for the Gemini model used for image analysis.
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:generateContent?key="
+GEMINI_API_URL = os.environ.get("GEMINI_API_URL", "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:generateContent?key=")
+
+# Shared client for the image host and the API: pooled connections, and
+# 429/5xx answers are retried with backoff (honouring Retry-After).
+oracle = Oracle(max_concurrency=4, retries=4, timeout=30)
 
-def analyze_image_with_gemini(image_bytes):
+def analyze_image_with_gemini(image_bytes, http=None):
     """
     Analyzes the provided image bytes using the Gemini API to determine
-    if it is real or fake.
+    if it is real or fake. `http` defaults to the shared oracle client; any
+    requests-like object with post() works.
     """
+    http = http or oracle
     print("    > Analyzing image with AI...")
     base64_image = base64.b64encode(image_bytes).decode('utf-8')
 
@@ -39,7 +49,7 @@ def analyze_image_with_gemini(image_bytes):
     }
 
     try:
-        response = requests.post(GEMINI_API_URL, json=payload)
+        response = http.post(GEMINI_API_URL, json=payload)
         response.raise_for_status()
         result = response.json()
         
@@ -118,7 +128,7 @@ def solve_challenge():
 
             # Download the image
             print("  > Downloading image...")
-            response = requests.get(image_url)
+            response = oracle.get(image_url)
             response.raise_for_status()
             image_bytes = response.content
 
@@ -163,6 +173,7 @@ def solve_challenge():
         # --- Step 4: Cleanup ---
         print("[*] Closing the browser.")
         driver.quit()
+        print(oracle.metrics.render())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+import hashlib
+import io
+import json
+import os
+import threading
+
+from PIL import Image
+
+# --- Configuration ---
+CACHE_PATH = "verdicts.json"
+# Max differing dHash bits (of 64) to reuse another image's verdict. None: exact
+# SHA-256 hits only. A near match can be a deepfake edit of a cached real photo,
+# so reusing its verdict is only safe where the challenge re-serves re-encoded copies.
+PHASH_MAX_DISTANCE = None
+MAX_UPLOAD_SIDE = 1024     # longest side sent to the classifier, None to disable
+MAX_UPLOAD_BYTES = 256 * 1024
+JPEG_QUALITY = 85
+
+
+def content_hash(image_bytes):
+    """SHA-256 of the raw bytes; catches byte-identical repeats."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(image_bytes):
+    """
+    64-bit difference hash (dHash): shrink to 9x8 grayscale and compare each
+    pixel with its right neighbour. Survives re-encoding and resizing, so
+    re-served copies of the same picture land within a few bits.
+    """
+    img = Image.open(io.BytesIO(image_bytes)).convert("L").resize((9, 8), Image.LANCZOS)
+    pixels = list(img.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def shrink_image(image_bytes, max_side=MAX_UPLOAD_SIDE, max_bytes=MAX_UPLOAD_BYTES,
+                 quality=JPEG_QUALITY):
+    """
+    Downscales and re-encodes as JPEG if the image is over either cap.
+    Returns the original bytes when it is already small enough.
+    """
+    if max_side is None:
+        return image_bytes
+    img = Image.open(io.BytesIO(image_bytes))
+    if max(img.size) <= max_side and len(image_bytes) <= max_bytes:
+        return image_bytes
+
+    img = img.convert("RGB")
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True)
+    shrunk = buf.getvalue()
+    return shrunk if len(shrunk) < len(image_bytes) else image_bytes
+
+
+class VerdictCache:
+    """
+    Persistent real/fake verdicts keyed by content hash, with an opt-in
+    perceptual-hash fallback for re-encoded copies (max_distance, off by
+    default). Safe to share between worker threads.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_distance=PHASH_MAX_DISTANCE):
+        self.path = path
+        self.max_distance = max_distance
+        self.by_sha = {}
+        self.by_phash = {}
+        self.lock = threading.Lock()
+        self.stats = {"lookups": 0, "exact_hits": 0, "phash_hits": 0, "misses": 0,
+                      "bytes_uploaded": 0, "bytes_saved": 0}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.by_sha = data.get("sha256", {})
+            self.by_phash = {int(k, 16): v for k, v in data.get("phash", {}).items()}
+
+    def lookup(self, image_bytes):
+        """Returns (verdict or None, sha, phash); phash is None when the fallback is off."""
+        sha = content_hash(image_bytes)
+        phash = perceptual_hash(image_bytes) if self.max_distance is not None else None
+        with self.lock:
+            self.stats["lookups"] += 1
+            if sha in self.by_sha:
+                self.stats["exact_hits"] += 1
+                self.stats["bytes_saved"] += len(image_bytes)
+                return self.by_sha[sha], sha, phash
+            for known, verdict in (self.by_phash.items() if phash is not None else ()):
+                if (known ^ phash).bit_count() <= self.max_distance:
+                    self.stats["phash_hits"] += 1
+                    self.stats["bytes_saved"] += len(image_bytes)
+                    self.by_sha[sha] = verdict
+                    return verdict, sha, phash
+            self.stats["misses"] += 1
+        return None, sha, phash
+
+    def store(self, sha, phash, verdict):
+        with self.lock:
+            self.by_sha[sha] = verdict
+            if phash is not None:
+                self.by_phash[phash] = verdict
+
+    def record_upload(self, original, upload):
+        """Counts an upload of `upload` in place of the `original` bytes."""
+        with self.lock:
+            self.stats["bytes_uploaded"] += len(upload)
+            self.stats["bytes_saved"] += len(original) - len(upload)
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            data = {"sha256": self.by_sha,
+                    "phash": {f"{k:016x}": v for k, v in self.by_phash.items()}}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def report(self):
+        s = self.stats
+        hits = s["exact_hits"] + s["phash_hits"]
+        rate = hits / s["lookups"] if s["lookups"] else 0.0
+        return (f"cache hits {hits}/{s['lookups']} ({rate:.0%}: {s['exact_hits']} exact, "
+                f"{s['phash_hits']} perceptual), misses {s['misses']}, "
+                f"uploaded {s['bytes_uploaded'] / 1024:.0f} KiB, saved {s['bytes_saved'] / 1024:.0f} KiB")
@@ -1,5 +1,7 @@
+import atexit
 import os
 import hashlib
+import time
 import numpy as np
 import matplotlib.pyplot as plt
 from PIL import Image
@@ -7,6 +9,8 @@ from PIL import Image
 # --- Configuration ---
 data_folder = 'data'
 progress_file = 'labeled_hashes.txt'  # Progress is now saved based on hashes
+index_file = 'scan_index.tsv'  # filename, size, mtime -> hash, so rescans only stat the files
+label_flush_seconds = 10  # buffered labels reach the progress file at least this often
 
 # --- Helper function to compute file hash ---
 def get_file_hash(filepath):
@@ -18,36 +22,125 @@ def get_file_hash(filepath):
     return hasher.hexdigest()
 
 
+def load_scan_index(path):
+    """filename -> (size, mtime_ns, hash) from a previous scan."""
+    index = {}
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) == 4:  # skip anything torn or foreign
+                    filename, size, mtime_ns, file_hash = parts
+                    index[filename] = (int(size), int(mtime_ns), file_hash)
+    return index
+
+
+def save_scan_index(path, index):
+    """Writes the index to a temporary file and renames it, so a crash leaves the old one."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        for filename, (size, mtime_ns, file_hash) in index.items():
+            f.write(f"{filename}\t{size}\t{mtime_ns}\t{file_hash}\n")
+    os.replace(tmp_path, path)
+
+
+def scan_images(folder, index_path):
+    """
+    Hashes of every .jpg in folder. A file whose size and mtime match the
+    index keeps its recorded hash; only new or changed files are read.
+    Returns (file_to_hash, number of files hashed).
+    """
+    old_index = load_scan_index(index_path)
+    new_index = {}
+    hashed = 0
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.jpg'):
+                continue
+            st = entry.stat()
+            known = old_index.get(entry.name)
+            if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+                new_index[entry.name] = known
+            else:
+                new_index[entry.name] = (st.st_size, st.st_mtime_ns, get_file_hash(entry.path))
+                hashed += 1
+    if hashed or len(new_index) != len(old_index):
+        save_scan_index(index_path, new_index)
+    return {name: file_hash for name, (_, _, file_hash) in new_index.items()}, hashed
+
+
+class LabelWriter:
+    """
+    Buffers labels and appends them to the progress file every
+    flush_seconds, on close and at exit. Each flush is one write of whole
+    lines followed by fsync, so a crash can lose at most the last interval.
+    A line torn by a crash mid-write is skipped on load, and the next flush
+    ends it first so the following label starts on a line of its own.
+    """
+
+    def __init__(self, path, flush_seconds=label_flush_seconds):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.pending = []
+        self.last_flush = time.monotonic()
+        atexit.register(self.flush)
+
+    def add(self, file_hash, label):
+        self.pending.append(f"{file_hash},{label}\n")
+        if time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    @staticmethod
+    def ends_mid_line(f):
+        """True if the file is non-empty and its last byte is not a newline."""
+        if f.seek(0, os.SEEK_END) == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b'\n'
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.pending:
+            return
+        with open(self.path, 'ab+') as f:
+            lines = ''.join(self.pending)
+            if self.ends_mid_line(f):
+                lines = '\n' + lines
+            f.write(lines.encode())
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending = []
+
+
 # --- 1. Get sorted list of files and group them by hash ---
 print("Scanning for duplicate images...")
+started = time.perf_counter()
 try:
-    image_files = sorted(
-        [f for f in os.listdir(data_folder) if f.endswith('.jpg')])
+    file_to_hash, hashed = scan_images(data_folder, index_file)
 except FileNotFoundError:
     print(f"Error: The directory '{data_folder}' was not found.")
     exit()
+image_files = sorted(file_to_hash)
 
 hashes_to_files = {}
-file_to_hash = {}
 for filename in image_files:
-    path = os.path.join(data_folder, filename)
-    file_hash = get_file_hash(path)
-    file_to_hash[filename] = file_hash
-    if file_hash not in hashes_to_files:
-        hashes_to_files[file_hash] = []
-    hashes_to_files[file_hash].append(filename)
+    hashes_to_files.setdefault(file_to_hash[filename], []).append(filename)
 
 unique_hashes = list(hashes_to_files.keys())
 print(
-    f"Found {len(image_files)} total images, with {len(unique_hashes)} unique images.")
+    f"Found {len(image_files)} total images, with {len(unique_hashes)} unique images "
+    f"({hashed} hashed, {len(image_files) - hashed} from {index_file}, "
+    f"{time.perf_counter() - started:.2f}s).")
 
 # --- 2. Load progress from previously labeled hashes ---
 labels = {}
 if os.path.exists(progress_file):
     with open(progress_file, 'r') as f:
         for line in f:
-            file_hash, label = line.strip().split(',')
-            labels[file_hash] = int(label)
+            parts = line.strip().split(',')
+            if len(parts) != 2 or parts[1] not in ('0', '1'):
+                continue  # a line torn by a crash
+            labels[parts[0]] = int(parts[1])
     print(
         f"Resuming session. Loaded {len(labels)} previously labeled unique images.")
 
@@ -57,6 +150,7 @@ if unlabeled_hashes:
     print(
         f"\nStarting labeling for {len(unlabeled_hashes)} remaining unique images...")
 
+writer = LabelWriter(progress_file)
 for i, current_hash in enumerate(unlabeled_hashes):
     # Get the list of all files that are identical
     duplicate_files = hashes_to_files[current_hash]
@@ -78,14 +172,14 @@ for i, current_hash in enumerate(unlabeled_hashes):
     plt.close()
 
     if classification.lower() == 'q':
+        writer.flush()
         print("Progress saved. Run the script again to continue.")
         exit()
 
     label_val = 0 if classification.lower() == 'p' else 1
     labels[current_hash] = label_val
-
-    with open(progress_file, 'a') as f:
-        f.write(f"{current_hash},{label_val}\n")
+    writer.add(current_hash, label_val)
+writer.flush()
 
 # --- 4. Generate the final image if all unique images are labeled ---
 if len(labels) == len(unique_hashes):
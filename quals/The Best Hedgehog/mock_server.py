@@ -0,0 +1,95 @@
+"""
+Local Flask + SQLite stand-in for the Best Hedgehog /add_hedgehog endpoint.
+
+Like the challenge, it pastes the form fields straight into one INSERT
+statement, so the username injection from the README works unchanged. It is
+meant for measuring bulk insertion (rows/s) and for finding the request size
+limits before touching the real server:
+
+  - --max-body sets MAX_CONTENT_LENGTH; larger bodies get 413. Flask's own
+    500 kB MAX_FORM_MEMORY_SIZE only applies to multipart forms, not to
+    the urlencoded form the exploit sends.
+  - SQLite's own statement limits surface as 400 with the sqlite error
+
+Usage:
+    python mock_server.py --port 5000 --max-body 1000000
+    python bulk_inject.py --url http://127.0.0.1:5000/add_hedgehog --probe
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+from flask import Flask, jsonify, request
+
+# --- Configuration ---
+HOST = "127.0.0.1"
+PORT = 5000
+DB_PATH = "hedgehogs.db"
+MAX_BODY_BYTES = 16 * 1024 * 1024
+FIELDS = ["furriness", "cuteness", "friendliness", "curiosity", "agility", "sleepiness",
+          "evaluation_score"]
+
+app = Flask(__name__)
+db_lock = threading.Lock()   # SQLite allows one writer at a time
+stats = {"requests": 0, "rejected": 0, "rows": 0, "bytes": 0, "started": time.time()}
+
+
+def connect():
+    return sqlite3.connect(app.config["DB_PATH"], timeout=30)
+
+
+def init_db(path):
+    if os.path.exists(path):
+        os.remove(path)
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"CREATE TABLE hedgehogs (username TEXT, {', '.join(f + ' INTEGER' for f in FIELDS)})")
+        conn.execute("INSERT INTO hedgehogs VALUES ('Jaga', 10, 10, 10, 10, 10, 10, 20)")
+
+
+@app.route("/add_hedgehog", methods=["POST"])
+def add_hedgehog():
+    stats["requests"] += 1
+    stats["bytes"] += request.content_length or 0
+    form = request.form
+    # Deliberately vulnerable, like the challenge
+    values = ", ".join(form.get(f, "0") for f in FIELDS)
+    query = f"INSERT INTO hedgehogs VALUES ('{form.get('username', '')}', {values})"
+    try:
+        with db_lock, connect() as conn:
+            inserted = conn.execute(query).rowcount
+    except sqlite3.Error as e:
+        stats["rejected"] += 1
+        return jsonify({"message": f"Database error: {e}"}), 400
+    stats["rows"] += inserted
+    return jsonify({"message": f"Added {inserted} hedgehog(s). The model will be retrained.",
+                    "inserted": inserted})
+
+
+@app.errorhandler(413)
+def too_large(_):
+    stats["rejected"] += 1
+    return jsonify({"message": "Request entity too large"}), 413
+
+
+@app.route("/stats")
+def get_stats():
+    with connect() as conn:
+        total = conn.execute("SELECT COUNT(*) FROM hedgehogs").fetchone()[0]
+    elapsed = time.time() - stats["started"]
+    return jsonify({**stats, "table_rows": total, "rows_per_second": stats["rows"] / max(elapsed, 1e-9)})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Best Hedgehog stand-in")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--max-body", type=int, default=MAX_BODY_BYTES)
+    args = parser.parse_args()
+
+    init_db(args.db)
+    app.config.update(DB_PATH=args.db, MAX_CONTENT_LENGTH=args.max_body)
+    app.run(host=HOST, port=args.port, threaded=True)
@@ -0,0 +1,156 @@
+"""
+Layer-0 keys of a StableLM checkpoint without loading the model.
+
+Nothing runs before layer 0's attention except the embedding and the input
+layernorm, so a layer-0 key depends only on the token and its position:
+
+    k(t, p) = RoPE_p(W_k @ LayerNorm(E[t]) + b_k)
+
+Layer0Keys memory-maps the checkpoint's safetensors shards and reads only the
+tensors that formula needs: the embedding rows of the requested tokens, the
+layer-0 input layernorm, the k projection and its bias (if the checkpoint has
+one). For stablelm-3b-4e1t that is 6.5M projection parameters plus one
+embedding row per candidate instead of 2.8B parameters, and no transformers
+import.
+
+The projection, the one real matmul, can run in bfloat16 or int8
+(per-channel weights, per-token activations) to halve or quarter the weight
+memory; the cosine ranking it feeds is robust to that rounding.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import torch
+from safetensors import safe_open
+
+EMBED = "model.embed_tokens.weight"
+NORM = "model.layers.0.input_layernorm"
+K_PROJ = "model.layers.0.self_attn.k_proj"
+DTYPES = ("float32", "bfloat16", "int8")
+
+
+def resolve_checkpoint(ckpt, revision=None):
+    """A local checkpoint directory, or a hub snapshot with only the files Layer0Keys reads."""
+    if os.path.isdir(ckpt):
+        return Path(ckpt)
+    from huggingface_hub import hf_hub_download, snapshot_download
+
+    # configs, tokenizer and the shard index first, then only the shards holding layer-0 tensors
+    root = Path(snapshot_download(ckpt, revision=revision, allow_patterns=["*.json"]))
+    for shard in sorted(set(shard_map(root).values())):
+        hf_hub_download(ckpt, shard, revision=revision)
+    return root
+
+
+def shard_map(root):
+    """tensor name -> shard file for the tensors Layer0Keys reads."""
+    index = Path(root) / "model.safetensors.index.json"
+    names = [EMBED, f"{NORM}.weight", f"{NORM}.bias", f"{K_PROJ}.weight", f"{K_PROJ}.bias"]
+    if index.exists():
+        weight_map = json.loads(index.read_text())["weight_map"]
+        return {name: weight_map[name] for name in names if name in weight_map}
+    return {name: "model.safetensors" for name in names}
+
+
+def rotate_half(x):
+    half = x.shape[-1] // 2
+    return torch.cat([-x[..., half:], x[..., :half]], dim=-1)
+
+
+def quantize_rows(x):
+    """Symmetric int8 quantization with one scale per row."""
+    scale = x.abs().amax(dim=1, keepdim=True).clamp(min=1e-8) / 127
+    return torch.round(x / scale).to(torch.int8), scale
+
+
+class Layer0Keys:
+    """Computes layer-0 keys of a StableLM checkpoint from its safetensors shards."""
+
+    def __init__(self, root, dtype="float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}, got {dtype!r}")
+        self.root, self.dtype = Path(root), dtype
+        config = json.loads((self.root / "config.json").read_text())
+        if config.get("qk_layernorm"):
+            raise ValueError("checkpoints with qk_layernorm are not supported")
+        # transformers 5 nests the rotary settings in rope_parameters; older configs keep them at the top
+        rope = {**config, **(config.get("rope_parameters") or {})}
+        if rope.get("rope_scaling") or rope.get("rope_type", "default") != "default":
+            raise ValueError("only the default (unscaled) rotary embedding is supported")
+
+        self.hidden = config["hidden_size"]
+        self.head_dim = self.hidden // config["num_attention_heads"]
+        self.kv_heads = config.get("num_key_value_heads") or config["num_attention_heads"]
+        self.eps = config.get("layer_norm_eps", 1e-5)
+        self.rotary_ndims = int(self.head_dim * rope.get("partial_rotary_factor", 1.0))
+        self.inv_freq = 1.0 / (rope.get("rope_theta", 10000.0) ** (
+            torch.arange(0, self.rotary_ndims, 2, dtype=torch.float64) / self.rotary_ndims))
+
+        self.shards = shard_map(self.root)
+        missing = [name for name in self.shards if not (self.root / self.shards[name]).exists()]
+        if f"{K_PROJ}.weight" in missing or EMBED in missing:
+            raise FileNotFoundError(f"{self.root} has no safetensors weights for layer 0 "
+                                    "(use --full-model for .bin checkpoints)")
+        self._handles = {}
+        self.norm_weight = self.tensor(f"{NORM}.weight")
+        self.norm_bias = self.tensor(f"{NORM}.bias")
+        self.k_bias = self.tensor(f"{K_PROJ}.bias")
+        k_weight = self.tensor(f"{K_PROJ}.weight")   # [kv_heads * head_dim, hidden]
+        if dtype == "int8":
+            self.k_weight, self.k_scale = quantize_rows(k_weight)
+        else:
+            self.k_weight = k_weight.to(getattr(torch, dtype))
+
+    def _open(self, name):
+        shard = self.shards[name]
+        if shard not in self._handles:
+            self._handles[shard] = safe_open(str(self.root / shard), framework="pt")
+        return self._handles[shard]
+
+    def tensor(self, name):
+        """One float32 tensor from the checkpoint, or None if the checkpoint lacks it."""
+        if name not in self.shards or name not in self._open(name).keys():
+            return None
+        return self._open(name).get_tensor(name).float()
+
+    def embeddings(self, ids):
+        """Embedding rows of ids as float32 [len(ids), hidden], read run by run from the mmap."""
+        unique, inverse = np.unique(np.asarray(ids), return_inverse=True)
+        table = self._open(EMBED).get_slice(EMBED)
+        runs = np.split(unique, np.flatnonzero(np.diff(unique) != 1) + 1)
+        rows = torch.cat([table[int(run[0]):int(run[-1]) + 1] for run in runs]).float()
+        return rows[torch.from_numpy(inverse.reshape(-1))]
+
+    def project(self, x):
+        if self.dtype == "int8":
+            xq, x_scale = quantize_rows(x)
+            try:
+                acc = torch._int_mm(xq, self.k_weight.t())   # int8 x int8 -> int32
+            except RuntimeError:   # shapes the int8 kernel rejects (fewer than 17 rows, ...)
+                acc = xq.float() @ self.k_weight.float().t()
+            return acc.float() * x_scale * self.k_scale.t()
+        return (x.to(self.k_weight.dtype) @ self.k_weight.t()).float()
+
+    def keys(self, ids):
+        """Unrotated layer-0 keys of the tokens ids, [len(ids), kv_heads * head_dim]."""
+        x = torch.nn.functional.layer_norm(self.embeddings(ids), (self.hidden,),
+                                           self.norm_weight, self.norm_bias, self.eps)
+        k = self.project(x)
+        return k if self.k_bias is None else k + self.k_bias
+
+    def rotate(self, keys, positions, inverse=False):
+        """
+        Applies (or with inverse=True undoes) the rotary embedding of positions
+        to keys [len(positions), kv_heads, head_dim], on the first rotary_ndims
+        of every head as StableLM does.
+        """
+        freqs = torch.as_tensor(positions, dtype=torch.float64)[:, None] * self.inv_freq
+        angles = torch.cat([freqs, freqs], dim=-1)[:, None, :]
+        cos, sin = angles.cos().float(), angles.sin().float()
+        if inverse:
+            sin = -sin
+        rot, rest = keys[..., :self.rotary_ndims], keys[..., self.rotary_ndims:]
+        return torch.cat([rot * cos + rotate_half(rot) * sin, rest], dim=-1)
@@ -1,34 +1,44 @@
 #!/usr/bin/env python3
 """
 solve.py
-Usage: python solve.py
+Usage: python solve.py [--dtype float32|bfloat16|int8] [--full-model]
 
 This will:
  - load kv_cache.pt produced by gen.py
- - load the same model/tokenizer used by gen.py:
+ - read the layer-0 weights of the model used by gen.py:
      "stabilityai/stablelm-3b-4e1t" with revision "fa4a6a9"
- - for each token position 0..T-1, try candidate tokens,
-   compute the model's layer-0 'k' for that token, and compare
-   cosine similarity to the saved K_rot for that position.
+   (only the embedding, the layer-0 layernorm and k projection, memory-mapped
+   from the safetensors shards; see layer0.py)
+ - compute the layer-0 'k' of every candidate token and compare its cosine
+   similarity to the saved K_rot of each position 0..T-1
  - prints the best match and top-k options.
 
+A layer-0 key depends only on the token and its position, never on the
+tokens before it, so every candidate is projected once and RoPE is undone on
+the T saved keys instead of applied to every candidate: one matmul scores all
+positions. --full-model keeps the original method, a forward pass of the whole
+model over prefix + candidate for every position.
+
 Notes:
- - Requires network to download the model (~several GB) unless cached locally.
- - GPU highly recommended. On CPU this will be slow.
+ - Requires network to download the model unless cached locally; the default
+   mode fetches only the config, tokenizer and the shards holding layer 0.
+ - The default mode runs in seconds on a laptop CPU; --full-model wants a GPU.
 """
 
+import argparse
+import os
 import torch
 import math
 from pathlib import Path
-from transformers import AutoTokenizer, AutoModelForCausalLM, DynamicCache
-from tqdm import tqdm
 import numpy as np
 
 KV_PATH = Path("kv_cache.pt")
-CKPT = "stabilityai/stablelm-3b-4e1t"
+# CKPT can point at a local model directory (e.g. the benchmark fixtures)
+CKPT = os.environ.get("CKPT", "stabilityai/stablelm-3b-4e1t")
 REV = "fa4a6a9"
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 PRINT_TOPK = 5
+LAYER0_CHUNK = 4096  # candidate tokens projected at a time in the default mode
 
 # candidate characters to filter irrelevant tokens from the vocabulary
 import string
@@ -49,12 +59,18 @@ def get_layer0_k_for_input(model, ids):
         out = model(input_ids=ids.to(DEVICE), use_cache=True, return_dict=True)
     # out.past_key_values is a tuple of length num_layers, each is (k, v)
     # k shape: (batch, heads, seq_len, head_dim)
-    k0, v0 = out.past_key_values[0]
+    k0 = layer0_keys(out.past_key_values)
     # k0 shape (batch, heads, seq_len, head_dim)
     # take the last token's k (seq_len-1)
     k_last = k0[:, :, -1, :].squeeze(0).detach().cpu()  # shape [H, Dh]
     return k_last  # rotated keys as in gen.py
 
+def layer0_keys(past_key_values):
+    # DynamicCache (newer transformers) or the legacy tuple of (k, v) per layer
+    if hasattr(past_key_values, "layers"):
+        return past_key_values.layers[0].keys
+    return past_key_values[0][0]
+
 def cosine_sim(a, b):
     # a,b numpy arrays vectors
     a = a.ravel()
@@ -65,83 +81,142 @@ def cosine_sim(a, b):
         return -1.0
     return float(np.dot(a, b) / (na*nb))
 
-K_rot, T, H, Dh = load_cache()
-# flatten token vectors for distance computations
-K_rot_np = K_rot.numpy()  # shape [H, T, Dh]
-K_rot_flat = K_rot_np.transpose(1,0,2).reshape(T, H*Dh)  # [T, H*Dh]
-
-print("Loading tokenizer and model (this will download weights if not cached)...", flush=True)
-tok = AutoTokenizer.from_pretrained(CKPT, revision=REV, use_fast=True)
-model = AutoModelForCausalLM.from_pretrained(CKPT, revision=REV).to(DEVICE).eval()
-
-discovered_tokens = []
-discovered_token_strs = []
-
-prefix_ids = []
-prefix_tokens = []
-
-current_prefix_ids = list(prefix_ids)
-current_prefix_token_strs = list(prefix_tokens)
-
-start_pos = len(current_prefix_ids)
-print(f"Starting from position {start_pos} (0-based). Will recover positions {start_pos}..{T-1}", flush=True)
-
-# We'll reconstruct the prompt greedily.
-for pos in range(start_pos, T):
-    print(f"\nRecovering token position {pos} (token #{pos+1}/{T})", flush=True)
-
-    # ====== 1. Prepare the vocab list ======
-    # vocab_items = list(tok.get_vocab().items()) # filter out irrelevant tokens
-    vocab_items = [(t,i) for t,i in tok.get_vocab().items() if all(c in candidates for c in t)]
-    vocab_ids = torch.tensor([vid for _, vid in vocab_items], dtype=torch.long, device=DEVICE)
-    batch_size = 512  # adjust depending on your GPU memory
-    sims_all = []
-
-    # ====== 2. Run batches ======
-    with torch.no_grad():
-        for i in tqdm(range(0, len(vocab_ids), batch_size), desc="batching vocab", leave=False):
-            batch_ids = vocab_ids[i:i+batch_size]
-
-            # prefix + each candidate token
-            prefix = torch.tensor(current_prefix_ids, dtype=torch.long, device=DEVICE)
-            input_batch = torch.cat([
-                prefix.repeat(batch_ids.shape[0], 1),
-                batch_ids.unsqueeze(1)
-            ], dim=1)  # shape [batch, len(prefix)+1]
-
-            out = model(input_ids=input_batch, use_cache=True, return_dict=True)
-            k0, v0 = out.past_key_values[0]  # k0 shape [batch, heads, seq_len, head_dim]
-            k_last = k0[:, :, -1, :]  # [batch, H, Dh]
-
-            # flatten to [batch, H*Dh]
-            k_flat = k_last.reshape(batch_ids.shape[0], -1)
-
-            # normalize for cosine
-            k_norm = torch.nn.functional.normalize(k_flat, p=2, dim=1)
-            target = torch.tensor(K_rot_flat[pos], device=DEVICE, dtype=k_norm.dtype)
-            target_norm = torch.nn.functional.normalize(target, p=2, dim=0)
+def candidate_vocab(vocab):
+    """(token string, id) pairs of the vocabulary made only of candidate characters."""
+    return [(t, i) for t, i in vocab.items() if all(c in candidates for c in t)]
 
-            sims = (k_norm @ target_norm).detach().cpu()  # [batch]
-            sims_all.append(sims)
-
-    sims_all = torch.cat(sims_all)
-    sims_np = sims_all.numpy()
+def report(pos, sims_np, vocab_items):
+    """Prints the top candidates of one position and returns the best (token string, id)."""
     topk_idx = sims_np.argsort()[::-1][:PRINT_TOPK]
-
     print(f"Top {PRINT_TOPK} candidates for position {pos}:", flush=True)
     for rank, idx in enumerate(topk_idx):
         token_str, token_id = vocab_items[idx]
         print(f"  {rank+1:>2}. {repr(token_str):<15} id={token_id:<6} cos={sims_np[idx]:.4f}")
-
-    best_idx = topk_idx[0]
-    best_token_str, best_token_id = vocab_items[best_idx]
+    best_token_str, best_token_id = vocab_items[topk_idx[0]]
     print(f"Best match: {best_token_str!r}  (id={best_token_id})", flush=True)
+    return best_token_str, best_token_id
+
+def solve_layer0(K_rot, T, H, Dh, dtype="float32"):
+    """Scores every candidate at every position from the layer-0 weights alone."""
+    from tokenizers import Tokenizer
+    from layer0 import Layer0Keys, resolve_checkpoint
+
+    print("Reading the layer-0 weights (downloads only what layer 0 needs if not cached)...", flush=True)
+    root = resolve_checkpoint(CKPT, REV)
+    tok = Tokenizer.from_file(str(root / "tokenizer.json"))
+    weights = Layer0Keys(root, dtype=dtype)
+    if (weights.kv_heads, weights.head_dim) != (H, Dh):
+        raise ValueError(f"kv_cache has {H} heads of {Dh}, the checkpoint "
+                         f"{weights.kv_heads} of {weights.head_dim}")
+
+    vocab_items = candidate_vocab(tok.get_vocab(with_added_tokens=True))
+    vocab_ids = [vid for _, vid in vocab_items]
+    # RoPE is a rotation, so undoing it on the targets keeps every cosine
+    targets = weights.rotate(K_rot.permute(1, 0, 2).float(), torch.arange(T), inverse=True)
+    target_norm = torch.nn.functional.normalize(targets.reshape(T, H * Dh), p=2, dim=1)
+
+    print(f"Projecting {len(vocab_items)} candidate tokens ({dtype})", flush=True)
+    sims_np = np.empty((len(vocab_ids), T), dtype=np.float32)
+    for i in range(0, len(vocab_ids), LAYER0_CHUNK):
+        keys = weights.keys(vocab_ids[i:i+LAYER0_CHUNK])  # [chunk, H*Dh], position-free
+        sims_np[i:i+LAYER0_CHUNK] = (torch.nn.functional.normalize(keys, p=2, dim=1) @ target_norm.T).numpy()
+
+    ids, token_strs = [], []
+    for pos in range(T):
+        print(f"\nRecovering token position {pos} (token #{pos+1}/{T})", flush=True)
+        token_str, token_id = report(pos, sims_np[:, pos], vocab_items)
+        ids.append(token_id)
+        token_strs.append(token_str)
+    return ids, token_strs, lambda ids: tok.decode(ids, skip_special_tokens=False)
+
+def solve_full_model(K_rot_flat, T):
+    """The original method: a forward pass of the full model for every position."""
+    # imported here so the helpers above can be imported without transformers
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+    from tqdm import tqdm
+
+    print("Loading tokenizer and model (this will download weights if not cached)...", flush=True)
+    tok = AutoTokenizer.from_pretrained(CKPT, revision=REV, use_fast=True)
+    model = AutoModelForCausalLM.from_pretrained(CKPT, revision=REV).to(DEVICE).eval()
+
+    prefix_ids = []
+    prefix_tokens = []
+
+    current_prefix_ids = list(prefix_ids)
+    current_prefix_token_strs = list(prefix_tokens)
+
+    start_pos = len(current_prefix_ids)
+    print(f"Starting from position {start_pos} (0-based). Will recover positions {start_pos}..{T-1}", flush=True)
 
-    # Update prefix
-    current_prefix_ids.append(best_token_id)
-    current_prefix_token_strs.append(best_token_str)
+    # ====== 1. Prepare the vocab list ======
+    # vocab_items = list(tok.get_vocab().items()) # filter out irrelevant tokens
+    vocab_items = candidate_vocab(tok.get_vocab())
+    vocab_ids = torch.tensor([vid for _, vid in vocab_items], dtype=torch.long, device=DEVICE)
 
-recovered = tok.decode(current_prefix_ids, clean_up_tokenization_spaces=False)
-print("\nRecovered token strings (by tokenizer decode):", flush=True)
-print(recovered, flush=True)
-print("Recovered token-by-token:", current_prefix_token_strs, flush=True)
\ No newline at end of file
+    # We'll reconstruct the prompt greedily.
+    for pos in range(start_pos, T):
+        print(f"\nRecovering token position {pos} (token #{pos+1}/{T})", flush=True)
+        batch_size = 512  # adjust depending on your GPU memory
+        sims_all = []
+
+        # ====== 2. Run batches ======
+        with torch.no_grad():
+            for i in tqdm(range(0, len(vocab_ids), batch_size), desc="batching vocab", leave=False):
+                batch_ids = vocab_ids[i:i+batch_size]
+
+                # prefix + each candidate token
+                prefix = torch.tensor(current_prefix_ids, dtype=torch.long, device=DEVICE)
+                input_batch = torch.cat([
+                    prefix.repeat(batch_ids.shape[0], 1),
+                    batch_ids.unsqueeze(1)
+                ], dim=1)  # shape [batch, len(prefix)+1]
+
+                out = model(input_ids=input_batch, use_cache=True, return_dict=True)
+                k0 = layer0_keys(out.past_key_values)  # k0 shape [batch, heads, seq_len, head_dim]
+                k_last = k0[:, :, -1, :]  # [batch, H, Dh]
+
+                # flatten to [batch, H*Dh]
+                k_flat = k_last.reshape(batch_ids.shape[0], -1)
+
+                # normalize for cosine
+                k_norm = torch.nn.functional.normalize(k_flat, p=2, dim=1)
+                target = torch.tensor(K_rot_flat[pos], device=DEVICE, dtype=k_norm.dtype)
+                target_norm = torch.nn.functional.normalize(target, p=2, dim=0)
+
+                sims = (k_norm @ target_norm).detach().cpu()  # [batch]
+                sims_all.append(sims)
+
+        best_token_str, best_token_id = report(pos, torch.cat(sims_all).numpy(), vocab_items)
+
+        # Update prefix
+        current_prefix_ids.append(best_token_id)
+        current_prefix_token_strs.append(best_token_str)
+
+    return (current_prefix_ids, current_prefix_token_strs,
+            lambda ids: tok.decode(ids, clean_up_tokenization_spaces=False))
+
+def main(argv=None):
+    """Recovers the prompt token by token; returns the recovered token strings."""
+    parser = argparse.ArgumentParser(description="Recover the prompt from its layer-0 keys")
+    parser.add_argument("--dtype", choices=("float32", "bfloat16", "int8"), default="float32",
+                        help="precision of the candidate key projection (default: float32)")
+    parser.add_argument("--full-model", action="store_true",
+                        help="run the whole model over prefix + candidate (slow, for cross-checks)")
+    args = parser.parse_args(argv)
+
+    K_rot, T, H, Dh = load_cache()
+    if args.full_model:
+        # flatten token vectors for distance computations
+        K_rot_np = K_rot.numpy()  # shape [H, T, Dh]
+        K_rot_flat = K_rot_np.transpose(1,0,2).reshape(T, H*Dh)  # [T, H*Dh]
+        ids, token_strs, decode = solve_full_model(K_rot_flat, T)
+    else:
+        ids, token_strs, decode = solve_layer0(K_rot, T, H, Dh, args.dtype)
+
+    print("\nRecovered token strings (by tokenizer decode):", flush=True)
+    print(decode(ids), flush=True)
+    print("Recovered token-by-token:", token_strs, flush=True)
+    return token_strs
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Shared helpers for the SG-AI CTF 2025 solvers."""
@@ -0,0 +1 @@
+"""Offline benchmarks for the solvers; see python -m sg_ai_ctf_25.bench --help."""
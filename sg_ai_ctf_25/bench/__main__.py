@@ -0,0 +1,51 @@
+"""
+Benchmark runner.
+
+    python -m sg_ai_ctf_25.bench run --cases jigsaw,drone --grid 8 --rows 100000 -o bench.json
+    python -m sg_ai_ctf_25.bench compare baseline.json bench.json --threshold 0.10
+
+`run` builds (or reuses) the fixtures under --workdir. It then runs each case
+--repeat times, each time in a fresh process, so the peak RSS belongs to that
+case alone. For every case it records:
+
+  - the best wall and CPU time
+  - peak RSS, plus the RSS after preloading the case's libraries
+  - throughput
+  - correctness checks against the fixture's ground truth
+
+`compare` reports the change per case. It exits with status 1 if any case got
+slower or used more memory than --threshold allows.
+"""
+
+import argparse
+
+from .cases import CASES
+from .runner import DEFAULT_OUTPUT, DEFAULT_THRESHOLD, DEFAULT_WORKDIR, compare, run
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sg_ai_ctf_25.bench",
+                                     description="Benchmarks on synthetic fixtures")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="run benchmark cases")
+    run_parser.add_argument("--cases", help=f"comma-separated subset of {','.join(CASES)}")
+    run_parser.add_argument("--grid", type=int, default=8, help="jigsaw grid size")
+    run_parser.add_argument("--rows", type=int, default=100_000, help="drone telemetry rows")
+    run_parser.add_argument("--seeds", type=int, default=256, help="FashionNet seed images")
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--workdir", default=DEFAULT_WORKDIR)
+    run_parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+
+    cmp_parser = sub.add_parser("compare", help="flag regressions between two result files")
+    cmp_parser.add_argument("baseline")
+    cmp_parser.add_argument("candidate")
+    cmp_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="allowed relative increase before a metric counts as a regression")
+
+    opts = parser.parse_args(argv)
+    run(opts) if opts.command == "run" else compare(opts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark cases: each one runs the repo's current code path on a fixture.
+
+A case is a fixture builder, a function mapping the CLI options to fixture
+parameters, the libraries to import before the clock starts (so import time
+is not counted against the code under test), and run(fixture_dir, info).
+run() returns (items, unit, extra), and throughput is reported as items per
+second.
+"""
+
+import importlib.util
+import os
+import runpy
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from . import fixtures
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+JIGSAW_SCRIPT = REPO_ROOT / "final" / "Jigsaw" / "solve.py"
+DRONE_SCRIPT = REPO_ROOT / "final" / "Drone Dance of Doom" / "solve.py"
+WELL_SCRIPT = REPO_ROOT / "quals" / "Well Well Well" / "solve.py"
+FASHION_DIR = REPO_ROOT / "quals" / "Fool the FashionNet!" / "challenge_package_build"
+
+
+def load_script(path, name):
+    """Imports a script that lives outside the package (the folders have spaces)."""
+    # and whose neighbouring modules it imports
+    sys.path.insert(0, str(Path(path).parent))
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_jigsaw(fixture_dir, info):
+    solve = load_script(JIGSAW_SCRIPT, "jigsaw_solve")
+    grid = info["params"]["grid"]
+    solve.GRID_SIZE = grid
+    solve.MATCH_ORIENTATIONS = info["params"].get("dihedral_pieces", False)
+    solve.solve_and_reconstruct()
+
+    # match_scores.txt rows: "piece | (y, x) | score [| orientation]"
+    placed, turned = {}, {}
+    with open(solve.OUTPUT_SCORES_PATH) as f:
+        for line in f.readlines()[2:]:
+            piece, pos, _, *orientation = line.split("|")
+            y, x = (int(v) for v in pos.strip(" ()\n").split(","))
+            placed[int(piece)] = y * grid + x
+            turned[int(piece)] = int(orientation[0]) if orientation else 0
+    correct = sum(placed.get(i) == slot for i, slot in enumerate(info["slots"]))
+    extra = {"comparisons": grid ** 4, "accuracy": correct / grid ** 2}
+    if solve.MATCH_ORIENTATIONS:
+        # the solver's orientation must undo the fixture's
+        probe = np.arange(16).reshape(4, 4, 1)
+        upright = sum(np.array_equal(solve.dihedral(fixtures.dihedral(probe, k), turned[i]), probe)
+                      for i, k in enumerate(info["orientations"]))
+        extra["orientation_accuracy"] = upright / grid ** 2
+    return grid * grid, "pieces", extra
+
+
+def run_drone(fixture_dir, info):
+    sys.path.insert(0, str(DRONE_SCRIPT.parent))   # solve.py imports raster.py
+    result = runpy.run_path(str(DRONE_SCRIPT), run_name="__main__")
+    found = list(result["sorted_drones"].index)
+    expected = sorted(info["hijack_times"], key=info["hijack_times"].get)
+    return info["rows"], "rows", {"order_correct": found == expected}
+
+
+def run_well(fixture_dir, info, argv=()):
+    os.environ["CKPT"] = info["model_dir"]   # read when the script is imported
+    recovered = load_script(WELL_SCRIPT, "well_solve").main(list(argv))
+    correct = sum(a == b for a, b in zip(recovered, info["tokens"]))
+    return len(info["tokens"]), "positions", {"accuracy": correct / len(info["tokens"]),
+                                              "vocab_size": info["vocab_size"]}
+
+
+def run_fgsm(fixture_dir, info):
+    # solve_batched loads model.pt from the working directory
+    model_path = os.path.join(fixture_dir, "model.pt")
+    if not os.path.exists(model_path):
+        shutil.copy(FASHION_DIR / "model.pt", model_path)
+    sys.path.insert(0, str(FASHION_DIR))
+    import solve_batched
+    output_dir = os.path.join(fixture_dir, "deltas")
+    shutil.rmtree(output_dir, ignore_errors=True)
+    solve_batched.solve("seeds", output_dir=output_dir)
+    solved = len(os.listdir(output_dir))
+    return info["count"], "images", {"solved": solved}
+
+
+CASES = {
+    "jigsaw": {
+        "fixture": fixtures.jigsaw,
+        "params": lambda opts: {"grid": opts.grid},
+        "preload": ["numpy", "PIL.Image", "scipy.optimize"],
+        "run": run_jigsaw,
+    },
+    "jigsaw_dihedral": {
+        "fixture": fixtures.jigsaw,
+        "params": lambda opts: {"grid": opts.grid, "dihedral_pieces": True},
+        "preload": ["numpy", "PIL.Image", "scipy.optimize"],
+        "run": run_jigsaw,
+    },
+    "drone": {
+        "fixture": fixtures.drone_csv,
+        "params": lambda opts: {"rows": opts.rows},
+        "preload": ["pandas", "matplotlib.pyplot", "scipy.stats"],
+        "run": run_drone,
+    },
+    "well": {
+        "fixture": fixtures.kv_cache,
+        "params": lambda opts: {},
+        "preload": ["torch", "safetensors", "tokenizers"],
+        "run": run_well,
+    },
+    "well_int8": {
+        "fixture": fixtures.kv_cache,
+        "params": lambda opts: {},
+        "preload": ["torch", "safetensors", "tokenizers"],
+        "run": lambda fixture_dir, info: run_well(fixture_dir, info, ["--dtype", "int8"]),
+    },
+    "well_full": {
+        "fixture": fixtures.kv_cache,
+        "params": lambda opts: {},
+        "preload": ["torch", "transformers", "tqdm"],
+        "run": lambda fixture_dir, info: run_well(fixture_dir, info, ["--full-model"]),
+    },
+    "fgsm": {
+        "fixture": fixtures.fashion_seeds,
+        "params": lambda opts: {"count": opts.seeds},
+        "preload": ["torch", "torchvision", "PIL.Image", "skimage.metrics"],
+        "run": run_fgsm,
+    },
+}
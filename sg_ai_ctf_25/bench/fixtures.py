@@ -0,0 +1,174 @@
+"""
+Synthetic, offline fixtures for the benchmarks.
+
+Each builder writes into its own directory and returns a dict describing what
+it wrote. Builders are deterministic for a given seed, and build() skips a
+fixture whose directory already has a complete marker file, so repeated
+benchmark runs reuse them.
+"""
+
+import json
+import os
+import string
+
+import numpy as np
+
+MARKER = "fixture.json"
+
+# The Well Well Well flag split the way the README shows it
+WELL_TOKENS = ["AI", "20", "25", "{", "t", "oss", "_", "me", "_", "a", "_", "Ro", "PE", "_",
+               "please", "}"]
+
+
+def build(directory, builder, **params):
+    """Runs builder(directory, **params) unless the same fixture already exists."""
+    marker = os.path.join(directory, MARKER)
+    if os.path.exists(marker):
+        with open(marker) as f:
+            info = json.load(f)
+        if info.get("params") == params:
+            return info
+    os.makedirs(directory, exist_ok=True)
+    info = {"params": params, **builder(directory, **params)}
+    with open(marker, "w") as f:
+        json.dump(info, f, indent=2)
+    return info
+
+
+def smooth_image(rng, height, width, blobs=24):
+    """RGB uint8 image made of soft coloured blobs, so pieces have real structure."""
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    img = np.zeros((height, width, 3), dtype=np.float32)
+    for _ in range(blobs):
+        cy, cx = rng.uniform(0, height), rng.uniform(0, width)
+        radius = rng.uniform(0.05, 0.25) * max(height, width)
+        weight = np.exp(-((yy - cy) ** 2 + (xx - cx) ** 2) / (2 * radius ** 2))
+        img += weight[..., None] * rng.uniform(0, 255, size=3)
+    img += rng.normal(0, 6, size=img.shape)
+    return np.clip(img / max(img.max() / 255.0, 1.0), 0, 255).astype(np.uint8)
+
+
+def dihedral(image, k):
+    """Orientation k (0-7) of an (h, w, C) image: mirrored when k >= 4, then k % 4 quarter turns."""
+    if k >= 4:
+        image = image[:, ::-1]
+    return np.rot90(image, k % 4)
+
+
+def jigsaw(directory, grid=8, piece=32, noise=4.0, seed=0, dihedral_pieces=False):
+    """
+    reference.jpg plus grid*grid shuffled pieces in sliced_images/, as in
+    final/Jigsaw. With dihedral_pieces, every piece is also rotated or
+    mirrored at random.
+    """
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    ref = smooth_image(rng, grid * piece, grid * piece)
+    Image.fromarray(ref).save(os.path.join(directory, "reference.jpg"), quality=95)
+
+    slices = os.path.join(directory, "sliced_images")
+    os.makedirs(slices, exist_ok=True)
+    order = rng.permutation(grid * grid)   # order[i] = slot of piece i
+    turns = rng.integers(0, 8, grid * grid) if dihedral_pieces else np.zeros(grid * grid, int)
+    for i, slot in enumerate(order):
+        y, x = divmod(int(slot), grid)
+        tile = ref[y * piece:(y + 1) * piece, x * piece:(x + 1) * piece].astype(np.float32)
+        tile = np.clip(tile + rng.normal(0, noise, size=tile.shape), 0, 255).astype(np.uint8)
+        tile = np.ascontiguousarray(dihedral(tile, int(turns[i])))
+        Image.fromarray(tile).save(os.path.join(slices, f"piece_{i:04d}.png"))
+    return {"slots": order.tolist(), "orientations": turns.tolist()}
+
+
+def drone_csv(directory, rows=100_000, drones=100, hijacked=("DRN010", "DRN032", "DRN055",
+                                                               "DRN069", "DRN090"), seed=0):
+    """
+    drone_telemetry.csv with `rows` records spread over `drones` drones. The
+    hijacked drones get erratic RotorRPM from a staggered time after 01:00.
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    per_drone = max(rows // max(drones, len(hijacked)), 2)
+    start = pd.Timestamp("2025-10-01 00:30:00")
+    times = start + pd.to_timedelta(np.arange(per_drone), unit="s")
+    frames = []
+    hijack_times = {}
+    drone_ids = sorted({f"DRN{d:03d}" for d in range(1, drones + 1)} | set(hijacked))
+    for d, drone_id in enumerate(drone_ids, 1):
+        t = np.linspace(0, 2 * np.pi, per_drone)
+        lat = 1.29 + 0.001 * d + 0.0005 * np.sin(t)
+        lon = 103.85 + 0.0005 * np.cos(t)
+        rpm = rng.normal(5000, 20, per_drone)
+        if drone_id in hijacked:
+            k = hijacked.index(drone_id)
+            first = per_drone // 2 + k * max(per_drone // 50, 1)
+            rpm[first:] += rng.normal(0, 600, per_drone - first)
+            lat[first:] += np.cumsum(rng.normal(0, 2e-5, per_drone - first))
+            hijack_times[drone_id] = str(times[first])
+        frames.append(pd.DataFrame({"Timestamp": times, "DroneID": drone_id,
+                                    "Latitude": lat, "Longitude": lon,
+                                    "Altitude": rng.normal(120, 1, per_drone), "RotorRPM": rpm}))
+    df = pd.concat(frames, ignore_index=True)
+    df["Timestamp"] = df["Timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    df.to_csv(os.path.join(directory, "drone_telemetry.csv"), index=False)
+    return {"rows": len(df), "hijack_times": hijack_times}
+
+
+def kv_cache(directory, hidden=64, layers=2, heads=4, vocab_extra=400, seed=0):
+    """
+    A tiny random StableLM (model/ with its tokenizer) and a kv_cache.pt
+    holding its layer-0 rotated keys for WELL_TOKENS, in the format gen.py
+    writes: {"K_rot": [H, T, Dh], "T", "H", "Dh"}.
+    """
+    import torch
+    from tokenizers import Tokenizer, models
+    from transformers import PreTrainedTokenizerFast, StableLmConfig, StableLmForCausalLM
+
+    rng = np.random.default_rng(seed)
+    alphabet = string.ascii_letters + string.digits + "_@!{}"
+    vocab = ["<unk>"] + list(alphabet) + sorted(set(WELL_TOKENS) - set(alphabet))
+    while len(vocab) < len(alphabet) + vocab_extra:
+        word = "".join(rng.choice(list(string.ascii_letters), size=rng.integers(2, 5)))
+        if word not in vocab:
+            vocab.append(word)
+    stoi = {tok: i for i, tok in enumerate(vocab)}
+
+    model_dir = os.path.join(directory, "model")
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=Tokenizer(models.WordLevel(stoi, unk_token="<unk>")), unk_token="<unk>")
+    tokenizer.save_pretrained(model_dir)
+
+    torch.manual_seed(seed)
+    config = StableLmConfig(vocab_size=len(vocab), hidden_size=hidden, num_hidden_layers=layers,
+                            num_attention_heads=heads, num_key_value_heads=heads,
+                            intermediate_size=hidden * 2, max_position_embeddings=256)
+    model = StableLmForCausalLM(config).eval()
+    model.save_pretrained(model_dir)
+
+    ids = torch.tensor([[stoi[t] for t in WELL_TOKENS]])
+    with torch.no_grad():
+        past = model(input_ids=ids, use_cache=True, return_dict=True).past_key_values
+    k0 = past.layers[0].keys if hasattr(past, "layers") else past[0][0]
+    K_rot = k0[0].detach().clone()   # [H, T, Dh]
+    H, T, Dh = K_rot.shape
+    torch.save({"K_rot": K_rot, "T": T, "H": H, "Dh": Dh}, os.path.join(directory, "kv_cache.pt"))
+    return {"model_dir": model_dir, "tokens": WELL_TOKENS, "vocab_size": len(vocab)}
+
+
+def fashion_seeds(directory, count=256, seed=0):
+    """count 28x28 grayscale seed PNGs in seeds/ with garment-like blobs."""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    seeds = os.path.join(directory, "seeds")
+    os.makedirs(seeds, exist_ok=True)
+    yy, xx = np.mgrid[0:28, 0:28]
+    for i in range(count):
+        cy, cx = rng.uniform(10, 18, size=2)
+        ry, rx = rng.uniform(5, 12, size=2)
+        mask = ((yy - cy) / ry) ** 2 + ((xx - cx) / rx) ** 2 <= 1
+        img = np.where(mask, rng.uniform(120, 230), 0) + rng.normal(0, 12, size=(28, 28))
+        Image.fromarray(np.clip(img, 0, 255).astype(np.uint8), mode="L").save(
+            os.path.join(seeds, f"seed_{i:05d}.png"))
+    return {"count": count}
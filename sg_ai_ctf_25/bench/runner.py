@@ -0,0 +1,151 @@
+"""
+Measurement and reporting for the benchmark CLI (see __main__.py).
+
+Each case runs in a spawned child process, so its peak RSS is its own. The
+child loads the case's libraries first, then times run() with
+time.perf_counter / time.process_time.
+"""
+
+import contextlib
+import queue as queue_module
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from . import fixtures
+from .cases import CASES, REPO_ROOT
+
+DEFAULT_WORKDIR = ".bench_fixtures"
+DEFAULT_OUTPUT = "bench.json"
+DEFAULT_THRESHOLD = 0.10
+
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case_in_child(name, fixture_dir, info, queue):
+    import importlib
+    case = CASES[name]
+    try:
+        with open(os.devnull, "w") as devnull, \
+                contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            os.environ.setdefault("MPLBACKEND", "Agg")
+            for module in case["preload"]:
+                importlib.import_module(module)
+            baseline = peak_rss_mb()
+            os.chdir(fixture_dir)
+            wall, cpu = time.perf_counter(), time.process_time()
+            items, unit, extra = case["run"](fixture_dir, info)
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        queue.put({"wall_s": wall, "cpu_s": cpu, "peak_rss_mb": peak_rss_mb(),
+                   "baseline_rss_mb": baseline, "items": items, "unit": unit, **extra})
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_case(name, fixture_dir, info, repeat):
+    """Best-of-repeat measurement, each repeat in its own spawned process."""
+    ctx = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run_case_in_child, args=(name, fixture_dir, info, queue))
+        proc.start()
+        result = None
+        while result is None:
+            try:
+                result = queue.get(timeout=1)
+            except queue_module.Empty:
+                if not proc.is_alive():
+                    result = {"error": f"worker exited with code {proc.exitcode}"}
+        proc.join()
+        if "error" in result:
+            return result
+        runs.append(result)
+    best = min(runs, key=lambda r: r["wall_s"])
+    best["peak_rss_mb"] = max(r["peak_rss_mb"] for r in runs)
+    best["throughput"] = best["items"] / best["wall_s"] if best["wall_s"] else None
+    best["repeats"] = len(runs)
+    return best
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(opts):
+    names = opts.cases.split(",") if opts.cases else list(CASES)
+    unknown = set(names) - set(CASES)
+    if unknown:
+        raise SystemExit(f"Unknown case(s): {', '.join(sorted(unknown))}; choose from {', '.join(CASES)}")
+
+    results = {"meta": {"commit": git_commit(), "python": platform.python_version(),
+                        "platform": platform.platform(), "cpus": os.cpu_count(),
+                        "date": datetime.now(timezone.utc).isoformat(timespec="seconds")},
+               "cases": {}}
+    for name in names:
+        case = CASES[name]
+        params = case["params"](opts)
+        fixture_dir = os.path.abspath(os.path.join(
+            opts.workdir, name + "".join(f"-{k}{v}" for k, v in sorted(params.items()))))
+        print(f"[{name}] fixture {fixture_dir}", flush=True)
+        info = fixtures.build(fixture_dir, case["fixture"], **params)
+        result = run_case(name, fixture_dir, info, opts.repeat)
+        results["cases"][name] = {"params": params, **result}
+        if "error" in result:
+            print(f"[{name}] failed: {result['error']}")
+            continue
+        checks = {k: v for k, v in result.items() if k in ("accuracy", "orientation_accuracy", "order_correct", "solved")}
+        print(f"[{name}] {result['wall_s']:.3f}s wall, {result['cpu_s']:.3f}s cpu, "
+              f"peak RSS {result['peak_rss_mb']:.0f} MB, "
+              f"{result['throughput']:.1f} {result['unit']}/s  {checks}")
+
+    with open(opts.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {opts.output}")
+
+
+def compare(opts):
+    with open(opts.baseline) as f:
+        base = json.load(f)["cases"]
+    with open(opts.candidate) as f:
+        new = json.load(f)["cases"]
+
+    regressions = []
+    print(f"{'case':<8} | {'metric':<12} | {'baseline':>10} | {'candidate':>10} | change")
+    for name in sorted(set(base) & set(new)):
+        if "error" in base[name] or "error" in new[name]:
+            print(f"{name:<8} | error in {'baseline' if 'error' in base[name] else 'candidate'}")
+            continue
+        if base[name]["params"] != new[name]["params"]:
+            print(f"{name:<8} | skipped: different fixture params")
+            continue
+        for metric in ("wall_s", "cpu_s", "peak_rss_mb"):
+            old, cur = base[name][metric], new[name][metric]
+            change = (cur - old) / old if old else 0.0
+            flag = change > opts.threshold
+            if flag:
+                regressions.append(f"{name}.{metric}")
+            print(f"{name:<8} | {metric:<12} | {old:>10.3f} | {cur:>10.3f} | "
+                  f"{change:+.1%}{'  REGRESSION' if flag else ''}")
+    for name in sorted(set(base) ^ set(new)):
+        print(f"{name:<8} | only in {'baseline' if name in base else 'candidate'}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {opts.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nNo regressions.")
+
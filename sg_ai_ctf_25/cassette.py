@@ -0,0 +1,341 @@
+"""
+Record and replay oracle traffic, for repeatable offline benchmarks.
+
+Record once against the live endpoint. Every request the shared Oracle
+client sends is appended to the cassette with its response and latency:
+
+    SG_ORACLE_RECORD=limit.cassette.gz python limit.py
+
+Replay without the network, in process (the client answers from the
+cassette instead of sending):
+
+    SG_ORACLE_REPLAY=limit.cassette.gz python limit.py
+    SG_ORACLE_REPLAY=limit.cassette.gz SG_ORACLE_FAULTS="latency=80,jitter=20,error_rate=0.02,rate=5" \
+        python limit.py
+
+or from a local Flask server, for scripts that take their URL from the
+environment or for clients other than Oracle:
+
+    python -m sg_ai_ctf_25.cassette serve five_words.cassette.gz --port 7000 --latency 120
+    API_URL=http://127.0.0.1:7000 python solve.py
+
+    python -m sg_ai_ctf_25.cassette info five_words.cassette.gz   # endpoints and recorded latency
+
+A cassette is JSON lines, gzip-compressed when the name ends in .gz, one
+exchange per line. Requests are matched on method, path, query and body
+(JSON and form bodies are compared by content, not key order), so a
+recording replays behind any host. A request recorded n times replays its
+responses in recorded order, then repeats the last one. Unrecorded
+requests get 404.
+
+Faults (SG_ORACLE_FAULTS, comma-separated, or the serve options):
+    latency=MS      fixed latency per request (default: the recorded latency)
+    scale=X         multiply the recorded latency
+    jitter=MS       add a uniform delay in [0, MS]
+    error_rate=P    answer with error_status (default 503) with probability P
+    rate=R          allow R requests/s (burst=B at once); excess gets 429 with Retry-After
+    seed=N          seed for jitter and errors
+
+Jitter and errors are drawn from (seed, request, occurrence), so a replay
+injects the same faults into the same requests whatever the thread
+interleaving.
+"""
+
+import argparse
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import numpy as np
+
+# only these response headers are kept; the rest is noise in a cassette
+KEPT_HEADERS = ("content-type", "retry-after", "location")
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def canonical_body(body, content_type):
+    """Request body bytes with JSON and form fields in a fixed order."""
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        body = body.encode()
+    content_type = (content_type or "").lower()
+    try:
+        if "json" in content_type:
+            return json.dumps(json.loads(body), sort_keys=True).encode()
+        if "x-www-form-urlencoded" in content_type:
+            return urlencode(sorted(parse_qsl(body.decode(), keep_blank_values=True))).encode()
+    except (ValueError, UnicodeDecodeError):
+        pass
+    return body
+
+
+def exchange_key(method, url, body, content_type):
+    """Identity of a request, independent of the host it was sent to."""
+    parts = urlsplit(url)
+    target = parts.path + (f"?{parts.query}" if parts.query else "")
+    digest = hashlib.sha256(b"\0".join([method.upper().encode(), target.encode(),
+                                        canonical_body(body, content_type)]))
+    return digest.hexdigest()[:32], target
+
+
+def encode_content(content):
+    try:
+        return {"text": content.decode()}
+    except UnicodeDecodeError:
+        return {"b64": base64.b64encode(content).decode()}
+
+
+def decode_content(entry):
+    if "b64" in entry:
+        return base64.b64decode(entry["b64"])
+    return entry.get("text", "").encode()
+
+
+class Recorder:
+    """Appends exchanges to a cassette. Thread-safe."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.f = _open(path, "a")
+
+    def record(self, prepared, response, elapsed):
+        content_type = prepared.headers.get("Content-Type")
+        key, target = exchange_key(prepared.method, prepared.url, prepared.body, content_type)
+        headers = {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS}
+        entry = {"key": key, "method": prepared.method, "target": target,
+                 "status": response.status_code, "headers": headers,
+                 "elapsed_ms": round(elapsed * 1000, 1), **encode_content(response.content)}
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self.lock:
+            if self.f.closed:   # a straggler after the process started exiting
+                return
+            self.f.write(line)
+            self.f.flush()
+
+    def close(self):
+        with self.lock:
+            if not self.f.closed:
+                self.f.close()
+
+
+def load(path):
+    """key -> recorded exchanges, in recorded order."""
+    exchanges = defaultdict(list)
+    with _open(path, "r") as f:
+        try:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:   # a line cut short when recording stopped
+                    continue
+                exchanges[entry["key"]].append(entry)
+        except EOFError:   # a gzip cassette whose recorder never closed it
+            pass
+    return exchanges
+
+
+class Faults:
+    """Injected latency, errors and rate limits; see the module docstring."""
+
+    def __init__(self, latency=None, scale=1.0, jitter=0.0, error_rate=0.0, error_status=503,
+                 rate=None, burst=1, seed=0):
+        self.latency, self.scale, self.jitter = latency, scale, jitter
+        self.error_rate, self.error_status = error_rate, error_status
+        self.rate, self.burst, self.seed = rate, burst, seed
+
+    @classmethod
+    def parse(cls, spec):
+        """Faults from "latency=80,jitter=20,error_rate=0.01"."""
+        options = {}
+        for item in filter(None, (spec or "").split(",")):
+            name, _, value = item.partition("=")
+            name = name.strip()
+            if name in ("error_status", "burst", "seed"):
+                options[name] = int(value)
+            elif name in ("latency", "scale", "jitter", "error_rate", "rate"):
+                options[name] = float(value)
+            else:
+                raise ValueError(f"unknown fault {name!r} in {spec!r}")
+        return cls(**options)
+
+
+class RateLimiter:
+    """Non-blocking token bucket: take() says whether a request may pass."""
+
+    def __init__(self, rate, burst=1):
+        self.rate, self.burst = rate, burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class Replayer:
+    """Answers requests from a cassette, with faults injected. Thread-safe."""
+
+    def __init__(self, path, faults=None):
+        self.path = path
+        self.exchanges = load(path)
+        self.faults = faults or Faults()
+        self.limiter = RateLimiter(self.faults.rate, self.faults.burst) if self.faults.rate else None
+        self.draws = Counter()
+        self.served = Counter()
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def respond(self, method, url, body, content_type):
+        """Returns (status, headers, content, delay in seconds); the caller waits out the delay."""
+        key, target = exchange_key(method, url, body, content_type)
+        with self.lock:
+            draw = self.draws[key]   # attempts so far, so a retry draws a fresh fault
+            self.draws[key] += 1
+            self.stats["requests"] += 1
+        rng = random.Random(f"{self.faults.seed}:{key}:{draw}")
+        faults = self.faults
+
+        if self.limiter and not self.limiter.take():
+            self._count("rate_limited")
+            return 429, {"Retry-After": f"{1 / faults.rate:.3f}"}, b'{"error": "rate limited"}', 0.0
+        recorded = self.exchanges.get(key)
+        if not recorded:
+            self._count("misses")
+            return 404, {"Content-Type": "application/json"}, \
+                json.dumps({"error": f"{method} {target} is not in the cassette"}).encode(), 0.0
+
+        latency_ms = faults.latency
+        if latency_ms is None:
+            with self.lock:
+                latency_ms = recorded[min(self.served[key], len(recorded) - 1)]["elapsed_ms"] * faults.scale
+        delay = (latency_ms + rng.uniform(0, faults.jitter)) / 1000
+        if faults.error_rate and rng.random() < faults.error_rate:
+            self._count("injected_errors")
+            return faults.error_status, {"Content-Type": "application/json"}, \
+                b'{"error": "injected"}', delay
+        # only answers that reach the recording advance it
+        with self.lock:
+            entry = recorded[min(self.served[key], len(recorded) - 1)]
+            self.served[key] += 1
+            self.stats["hits"] += 1
+        return entry["status"], entry["headers"], decode_content(entry), delay
+
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_recorder(path):
+    """One Recorder per path, however many clients the process makes."""
+    with _shared_lock:
+        if ("record", path) not in _shared:
+            _shared["record", path] = Recorder(path)
+            atexit.register(_shared["record", path].close)   # finishes the gzip stream
+        return _shared["record", path]
+
+
+def shared_replayer(path, faults_spec=None):
+    """One Replayer per path, so repeated requests advance through the recording together."""
+    with _shared_lock:
+        if ("replay", path) not in _shared:
+            _shared["replay", path] = Replayer(path, Faults.parse(faults_spec))
+        return _shared["replay", path]
+
+
+def summary(path):
+    """Endpoints, statuses and latency percentiles of a cassette."""
+    exchanges = load(path)
+    entries = [e for recorded in exchanges.values() for e in recorded]
+    by_endpoint = defaultdict(list)
+    for e in entries:
+        by_endpoint[f"{e['method']} {e['target'].split('?')[0]}"].append(e)
+    lines = [f"{path}: {len(entries)} exchanges, {len(exchanges)} distinct requests",
+             f"{'endpoint':<40} {'n':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}  statuses"]
+    for endpoint, group in sorted(by_endpoint.items()):
+        p50, p90, p99 = np.percentile([e["elapsed_ms"] for e in group], [50, 90, 99])
+        statuses = " ".join(f"{s}:{n}" for s, n in sorted(Counter(e["status"] for e in group).items()))
+        lines.append(f"{endpoint:<40} {len(group):>7} {p50:>8.1f} {p90:>8.1f} {p99:>8.1f}  {statuses}")
+    return "\n".join(lines)
+
+
+def create_app(replayer):
+    """A Flask app that answers every path from the replayer."""
+    from flask import Flask, Response, jsonify, request
+
+    app = Flask(__name__)
+
+    @app.route("/_cassette/stats")
+    def stats():
+        with replayer.lock:
+            return jsonify(dict(replayer.stats))
+
+    @app.route("/", defaults={"path": ""}, methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    @app.route("/<path:path>", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    def replay(path):
+        status, headers, content, delay = replayer.respond(
+            request.method, request.full_path if request.query_string else request.path,
+            request.get_data(), request.content_type)
+        time.sleep(delay)
+        return Response(content, status=status, headers=headers)
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="sg_ai_ctf_25.cassette",
+                                     description="Inspect or serve recorded oracle traffic")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("info", help="endpoints and latency profile of a cassette")
+    info.add_argument("cassette")
+    serve = sub.add_parser("serve", help="serve a cassette over HTTP with injected faults")
+    serve.add_argument("cassette")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=7000)
+    serve.add_argument("--latency", type=float, help="fixed latency in ms (default: as recorded)")
+    serve.add_argument("--scale", type=float, default=1.0, help="multiply the recorded latency")
+    serve.add_argument("--jitter", type=float, default=0.0, help="extra uniform delay up to this many ms")
+    serve.add_argument("--error-rate", type=float, default=0.0)
+    serve.add_argument("--error-status", type=int, default=503)
+    serve.add_argument("--rate", type=float, help="requests/s before answering 429")
+    serve.add_argument("--burst", type=int, default=1)
+    serve.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        print(summary(args.cassette))
+        return
+    faults = Faults(args.latency, args.scale, args.jitter, args.error_rate, args.error_status,
+                    args.rate, args.burst, args.seed)
+    replayer = Replayer(args.cassette, faults)
+    print(f"Replaying {sum(map(len, replayer.exchanges.values()))} exchanges from {args.cassette} "
+          f"on http://{args.host}:{args.port} (stats at /_cassette/stats)")
+    create_app(replayer).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+One entry point for the solvers:
+
+    sg-ai-ctf-25 --help
+    sg-ai-ctf-25 jigsaw                        # runs final/Jigsaw/solve.py
+    sg-ai-ctf-25 mnist --mode mitm             # options are passed to the script
+    sg-ai-ctf-25 -C ~/dl/jigsaw jigsaw         # run in another data directory
+    sg-ai-ctf-25 bench run --cases drone
+
+Each subcommand runs an existing script from the challenge folders. This
+module imports only the standard library, so torch, transformers, selenium,
+matplotlib and skimage load only when the script that needs them starts.
+Check the startup cost with:
+
+    python -X importtime -m sg_ai_ctf_25 --help 2> importtime.log
+
+The scripts use paths relative to their challenge folder (sliced_images/,
+kv_cache.pt, ...), so a script runs in that folder unless -C gives another
+directory. The challenge folders are not shipped in the wheel, so the
+subcommands need a checkout installed with `pip install -e .` or `uv sync`.
+"""
+
+import argparse
+import importlib
+import os
+import runpy
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# name: (script relative to the repo root, or a module with main(argv),
+#        whether the target parses its own arguments, help)
+COMMANDS = {
+    "drone": ("final/Drone Dance of Doom/solve.py", False,
+              "order the hijacked drones and plot their skywriting"),
+    "drone-paths": ("final/Drone Dance of Doom/get_all_paths.py", False,
+                    "plot the flight path of every drone"),
+    "five-words": ("final/Five Words to Chaos/solve.py", False,
+                   "flip each review's sentiment with edits of at most five words"),
+    "jigsaw": ("final/Jigsaw/solve.py", False, "reassemble the jigsaw from the reference image"),
+    "spiral": ("final/Spiral/decode_spiral.py", True, "decode the Spiral embeddings"),
+    "fashion": ("quals/Fool the FashionNet!/challenge_package_build/solve_batched.py", True,
+                "batched FGSM epsilon sweep"),
+    "fashion-pgd": ("quals/Fool the FashionNet!/challenge_package_build/solve_pgd.py", True,
+                    "constraint-aware PGD attack"),
+    "fashion-inference": ("quals/Fool the FashionNet!/challenge_package_build/fast_inference.py",
+                          True, "benchmark the FashionNet inference backends"),
+    "limit": ("quals/Limit Theory/limit.py", False, "query the Limit Theory oracle"),
+    "mlmpire": ("quals/MLMpire/extract.py", True, "KV-cached MLMpire flag extraction"),
+    "mlmpire-beam": ("quals/MLMpire/beam_extract.py", True, "batched MLMpire beam extraction"),
+    "mnist": ("quals/MNIST/solve_trigger.py", True, "recover the MNIST backdoor signature"),
+    "real-or-fake": ("quals/Real or Fake/solve.py", False, "classify the Real or Fake images"),
+    "real-or-fake-pipelined": ("quals/Real or Fake/solve_pipelined.py", False,
+                               "Real or Fake with pipelined downloads and a local detector"),
+    "stridesafe": ("quals/StrideSafe/solve.py", False, "label the StrideSafe images"),
+    "hedgehog": ("quals/The Best Hedgehog/hedgehog.py", False, "send the hedgehog injection"),
+    "hedgehog-bulk": ("quals/The Best Hedgehog/bulk_inject.py", True,
+                      "chunked, concurrent hedgehog injection"),
+    "well": ("quals/Well Well Well/solve.py", True, "recover the prompt from the layer-0 keys"),
+    "bench": ("sg_ai_ctf_25.bench.__main__", True, "offline benchmarks on synthetic fixtures"),
+    "cassette": ("sg_ai_ctf_25.cassette", True, "inspect or serve recorded oracle traffic"),
+}
+
+
+def run_script(path, args, workdir=None):
+    """Runs a challenge script as __main__ with args as its command line."""
+    script = REPO_ROOT / path
+    if not script.exists():
+        sys.exit(f"{script} not found; the subcommands need a repository checkout")
+    os.chdir(workdir or script.parent)
+    # the scripts import their neighbours (model.py, utils.py, ...)
+    sys.path.insert(0, str(script.parent))
+    sys.argv = [str(script), *args]
+    runpy.run_path(str(script), run_name="__main__")
+
+
+def run_module(name, args):
+    importlib.import_module(name).main(args)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="sg-ai-ctf-25", description="SG-AI CTF 2025 solvers")
+    parser.add_argument("-C", "--chdir", metavar="DIR",
+                        help="working directory for the script (default: its challenge folder)")
+    sub = parser.add_subparsers(dest="command", required=True, metavar="command")
+    for name, (_, own_args, help_text) in COMMANDS.items():
+        # scripts with their own argparse get --help and every option passed through
+        sub.add_parser(name, help=help_text, add_help=not own_args)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    opts, rest = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    target, own_args, _ = COMMANDS[opts.command]
+    if rest and not own_args:
+        parser.error(f"{opts.command} takes no arguments: {' '.join(rest)}")
+    if target.endswith(".py"):
+        workdir = os.path.abspath(opts.chdir) if opts.chdir else None
+        run_script(target, rest, workdir)
+    else:
+        run_module(target, rest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+"""
+Shared HTTP client for talking to challenge oracles and model APIs.
+
+Every remote-facing solver used to make its own requests calls with its own
+sleeps, timeouts and error handling. This module puts that in one place:
+
+  - per-host connection pools (one keep-alive requests.Session per host)
+  - a token-bucket rate limit per host, instead of fixed time.sleep()
+  - retries with exponential backoff and full jitter on connection errors,
+    timeouts and 429/5xx responses (Retry-After is honoured); requests made
+    with idempotent=False are retried only when they never reached the server
+  - a cap on requests in flight
+  - an optional on-disk response cache for deterministic oracles
+  - metrics: request/retry/error/cache counters and latency histograms
+  - recording to, or replaying from, a cassette file (SG_ORACLE_RECORD,
+    SG_ORACLE_REPLAY; see cassette.py) for offline benchmarks
+
+OracleClient is the async interface; its blocking work runs in a private
+thread pool, since the HTTP stack is requests. Oracle is a synchronous
+facade with the same methods. It can be shared by any number of threads,
+and its get()/post() return values behave like requests.Response (json(),
+raise_for_status(), ...), so it is a drop-in for requests or a Session:
+
+    from sg_ai_ctf_25.oracle import Oracle
+    oracle = Oracle(rate=2.5, max_concurrency=8)
+    oracle.post(url, json=payload).json()
+    print(oracle.metrics.render())
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# --- Defaults ---
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5        # first retry waits up to this long
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_CONCURRENCY = 8
+DEFAULT_POOL_SIZE = 16       # keep-alive connections per host
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+UNSENT_STATUSES = frozenset({429})   # the server turned the request away without acting on it
+HISTOGRAM_BUCKETS_MS = [10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+class OracleResponse:
+    """The parts of requests.Response the solvers use; identical for live and cached replies."""
+
+    def __init__(self, status_code, headers, content, url, elapsed=0.0, from_cache=False):
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.content = content
+        self.url = url
+        self.elapsed = elapsed
+        self.from_cache = from_cache
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode(errors="replace")
+
+    def json(self):
+        """Decoded JSON body; raises requests.JSONDecodeError (a RequestException) like requests does."""
+        try:
+            return json.loads(self.content)
+        except ValueError as e:
+            raise requests.exceptions.JSONDecodeError(getattr(e, "msg", str(e)), self.text,
+                                                      getattr(e, "pos", 0)) from e
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+    def __repr__(self):
+        return f"<OracleResponse [{self.status_code}]{' (cached)' if self.from_cache else ''}>"
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`. acquire() waits for a token."""
+
+    def __init__(self, rate, burst=1):
+        self.rate, self.burst = rate, burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram, in milliseconds."""
+
+    def __init__(self, buckets_ms=HISTOGRAM_BUCKETS_MS):
+        self.buckets_ms = list(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.total_ms = 0.0
+        self.n = 0
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect_left(self.buckets_ms, ms)] += 1
+        self.total_ms += ms
+        self.n += 1
+
+    def snapshot(self):
+        labels = [f"<={b}" for b in self.buckets_ms] + [f">{self.buckets_ms[-1]}"]
+        return {"count": self.n, "mean_ms": self.total_ms / self.n if self.n else 0.0,
+                "buckets": dict(zip(labels, self.counts))}
+
+
+class Metrics:
+    """Counters and per-host latency histograms. Thread-safe."""
+
+    def __init__(self):
+        self.counters = Counter()
+        self.latency = {}
+        self.lock = threading.Lock()
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def observe(self, host, seconds):
+        with self.lock:
+            self.latency.setdefault(host, LatencyHistogram()).add(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {"counters": dict(self.counters),
+                    "latency": {host: h.snapshot() for host, h in self.latency.items()}}
+
+    def export(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def render(self):
+        snap = self.snapshot()
+        lines = ["  ".join(f"{k}={v}" for k, v in sorted(snap["counters"].items())) or "no requests"]
+        for host, h in snap["latency"].items():
+            busy = "  ".join(f"{k}:{v}" for k, v in h["buckets"].items() if v)
+            lines.append(f"{host}: n={h['count']} mean={h['mean_ms']:.0f}ms  {busy}")
+        return "\n".join(lines)
+
+
+class DiskCache:
+    """One JSON file per response, keyed by a hash of method, URL and body."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(method, url, body):
+        return hashlib.sha256(b"\0".join([method.encode(), url.encode(), body])).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return OracleResponse(data["status"], data["headers"], base64.b64decode(data["content"]),
+                              data["url"], from_cache=True)
+
+    def put(self, key, response):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"status": response.status_code, "headers": dict(response.headers),
+                       "content": base64.b64encode(response.content).decode(), "url": response.url}, f)
+        os.replace(tmp_path, path)
+
+
+def request_body(json_body=None, data=None):
+    """The bytes a request will carry, for cache keys."""
+    if json_body is not None:
+        return json.dumps(json_body, sort_keys=True).encode()
+    if isinstance(data, dict):
+        return json.dumps(data, sort_keys=True).encode()
+    if isinstance(data, str):
+        return data.encode()
+    return data or b""
+
+
+def never_sent(error):
+    """True for a requests exception raised before the request reached the server."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], "reason", None), NewConnectionError)
+    return False
+
+
+class OracleClient:
+    """
+    Async client. rate is requests per second per host (None = unlimited),
+    burst is how many may go at once after an idle spell. Set cache_dir to
+    enable the disk cache; only requests made with cache=True use it.
+    """
+
+    def __init__(self, rate=None, burst=1, max_concurrency=DEFAULT_CONCURRENCY,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF,
+                 timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE, cache_dir=None,
+                 retry_statuses=RETRY_STATUSES, headers=None):
+        self.rate, self.burst = rate, burst
+        self.max_concurrency = max_concurrency
+        self.retries, self.backoff, self.max_backoff = retries, backoff, max_backoff
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.retry_statuses = frozenset(retry_statuses)
+        self.headers = dict(headers or {})
+        self.cache = DiskCache(cache_dir) if cache_dir else None
+        self.metrics = Metrics()
+        self._sessions = {}
+        self._buckets = {}
+        self._sessions_lock = threading.Lock()
+        self._semaphore = None
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix="oracle")
+        self.recorder = self.replayer = None
+        if os.environ.get("SG_ORACLE_REPLAY"):
+            from .cassette import shared_replayer
+            self.replayer = shared_replayer(os.environ["SG_ORACLE_REPLAY"],
+                                            os.environ.get("SG_ORACLE_FAULTS"))
+        elif os.environ.get("SG_ORACLE_RECORD"):
+            from .cassette import shared_recorder
+            self.recorder = shared_recorder(os.environ["SG_ORACLE_RECORD"])
+
+    def _session(self, host):
+        with self._sessions_lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                session.headers.update(self.headers)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+            return self._sessions[host]
+
+    def _bucket(self, host):
+        if self.rate is None:
+            return None
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._buckets[host]
+
+    def _delay(self, attempt, response=None):
+        """Full-jitter exponential backoff, or the server's Retry-After if it gave one."""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _send(self, session, method, url, kwargs):
+        if self.replayer:
+            return self._replay(session, method, url, kwargs)
+        start = time.perf_counter()
+        r = session.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - start
+        if self.recorder:
+            # the request as first sent, before any redirect
+            self.recorder.record((r.history[0] if r.history else r).request, r, elapsed)
+        return OracleResponse(r.status_code, r.headers, r.content, r.url, elapsed)
+
+    def _replay(self, session, method, url, kwargs):
+        """Answers from the cassette, waiting out the replayed latency like a real call."""
+        send_options = ("timeout", "allow_redirects", "proxies", "stream", "verify", "cert")
+        prepared = session.prepare_request(requests.Request(
+            method, url, **{k: v for k, v in kwargs.items() if k not in send_options}))
+        status, headers, content, delay = self.replayer.respond(
+            prepared.method, prepared.url, prepared.body, prepared.headers.get("Content-Type"))
+        timeout = kwargs.get("timeout")
+        timeout = timeout[-1] if isinstance(timeout, tuple) else timeout
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise requests.ReadTimeout(f"replayed latency {delay:.3f}s exceeds the {timeout}s timeout")
+        time.sleep(delay)
+        return OracleResponse(status, headers, content, prepared.url, delay)
+
+    async def request(self, method, url, *, cache=False, timeout=None, idempotent=True, **kwargs):
+        """
+        Sends one request with rate limiting and retries. Raises the last
+        requests exception when every attempt failed on the network; an HTTP
+        error status is returned as a response, as with requests.
+
+        Pass idempotent=False for a request that must not run twice (an
+        insert, a flag submission). It is then retried only when it cannot
+        have reached the server: a connect error or a 429. A read timeout or
+        a 5xx may come after the server acted on it, so they are not retried.
+        """
+        method = method.upper()
+        host = urlsplit(url).netloc
+        key = None
+        if cache and self.cache:
+            key = DiskCache.key(method, url, request_body(kwargs.get("json"), kwargs.get("data")))
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.metrics.count("cache_hits")
+                return cached
+            self.metrics.count("cache_misses")
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        kwargs["timeout"] = timeout or self.timeout
+        session = self._session(host)
+        bucket = self._bucket(host)
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(self.retries + 1):
+            if bucket:
+                await bucket.acquire()
+            response = error = None
+            async with self._semaphore:
+                self.metrics.count("requests")
+                try:
+                    response = await loop.run_in_executor(
+                        self._executor, self._send, session, method, url, kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                    self.metrics.count(f"error_{type(e).__name__}")
+            if response is not None:
+                self.metrics.observe(host, response.elapsed)
+                self.metrics.count(f"status_{response.status_code}")
+                if response.status_code not in self.retry_statuses:
+                    if key and response.ok:
+                        self.cache.put(key, response)
+                    return response
+            if attempt == self.retries:
+                break
+            if not idempotent and (response.status_code not in UNSENT_STATUSES if response is not None
+                                   else not never_sent(error)):
+                break
+            self.metrics.count("retries")
+            await asyncio.sleep(self._delay(attempt, response))
+
+        self.metrics.count("failures")
+        if error is not None:
+            raise error
+        return response
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+class Oracle:
+    """
+    Synchronous facade over OracleClient. Runs the client on an event loop in
+    a background thread. Takes the same arguments as OracleClient.
+    """
+
+    def __init__(self, **options):
+        self.client = OracleClient(**options)
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True, name="oracle-loop").start()
+
+    @property
+    def metrics(self):
+        return self.client.metrics
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def request(self, method, url, **kwargs):
+        return self._run(self.client.request(method, url, **kwargs))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def map(self, method, url, payloads, **kwargs):
+        """
+        Sends one request per payload (passed as json=) concurrently, up to
+        the concurrency cap. Returns responses or exceptions, in order.
+        """
+        async def run_all():
+            return await asyncio.gather(
+                *(self.client.request(method, url, json=p, **kwargs) for p in payloads),
+                return_exceptions=True)
+        return self._run(run_all())
+
+    def close(self):
+        self.client.close()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
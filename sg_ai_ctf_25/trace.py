@@ -0,0 +1,290 @@
+"""
+Lightweight phase instrumentation for the solvers.
+
+Three ways to mark the phases of a run:
+
+    from sg_ai_ctf_25 import trace
+
+    with trace.phase("ssim_matrix", items=n * n):   # context manager
+        ...
+    trace.step("load")                                # sequential marker: closes
+    ...                                               # the previous step
+    @trace.timed("assign")                            # decorator
+    def assign(...): ...
+
+    trace.count(len(batch))    # add items to the innermost open phase
+    trace.finish()             # close everything, print a summary, write the JSON trace if asked
+
+Every phase records:
+
+  - wall time and CPU time
+  - an item count and items/s
+  - the process peak RSS when the phase ended
+  - with SG_TRACE_MEMORY=1, the peak Python allocation during the phase
+    (tracemalloc; slows the run, so it is opt-in)
+
+Phases nest, and the trace is a tree.
+
+Environment:
+    SG_TRACE=1|path.json  write the trace to trace-<script>.json or to path.json
+                          (unset or "off": print the summary only)
+    SG_TRACE_MEMORY=1     enable tracemalloc peaks
+    SG_PROFILE=<phase>    profile every phase with that name
+    SG_PROFILE_MODE=cprofile|sample
+        cprofile writes profile-<phase>.prof (snakeviz, flameprof, pstats)
+        sample writes profile-<phase>.folded, collapsed stacks for
+        flamegraph.pl or speedscope
+"""
+
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+SAMPLE_INTERVAL = 0.005   # seconds between stack samples in "sample" mode
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:   # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and counts collapsed stacks."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id, self.interval = thread_id, interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, path):
+        self._stop.set()
+        self._thread.join()
+        with open(path, "w") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+class Phase:
+    __slots__ = ("name", "is_step", "children", "items", "wall", "cpu", "alloc_peak",
+                 "rss_mb", "_start_wall", "_start_cpu", "_outer_peak", "_profiler")
+
+    def __init__(self, name, items=None, is_step=False):
+        self.name, self.items, self.is_step = name, items, is_step
+        self.children = []
+        self.wall = self.cpu = self.alloc_peak = self.rss_mb = None
+        self._outer_peak = 0
+        self._profiler = None
+
+    def to_dict(self):
+        out = {"name": self.name, "wall_s": self.wall, "cpu_s": self.cpu}
+        if self.items is not None:
+            out["items"] = self.items
+            out["items_per_s"] = self.items / self.wall if self.wall else None
+        if self.alloc_peak is not None:
+            out["alloc_peak_mb"] = self.alloc_peak / (1024 * 1024)
+        out["peak_rss_mb"] = self.rss_mb
+        if self.children:
+            out["children"] = [c.to_dict() for c in self.children]
+        return out
+
+
+class Tracer:
+    def __init__(self, run_name, memory=None, profile=None, profile_mode=None):
+        self.run_name = run_name
+        self.memory = os.environ.get("SG_TRACE_MEMORY") == "1" if memory is None else memory
+        self.profile = profile or os.environ.get("SG_PROFILE")
+        self.profile_mode = profile_mode or os.environ.get("SG_PROFILE_MODE", "cprofile")
+        self.root = Phase(run_name)
+        self.stack = [self.root]
+        self.lock = threading.Lock()
+        self.finished = False
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._open(self.root)
+
+    # --- phase bookkeeping ---
+    def _open(self, phase):
+        if self.memory:
+            # reset_peak() is global, so fold the peak so far into the open phases first
+            current_peak = tracemalloc.get_traced_memory()[1]
+            for outer in self.stack:
+                if outer is not phase:
+                    outer._outer_peak = max(outer._outer_peak, current_peak)
+            tracemalloc.reset_peak()
+        if self.profile and phase.name == self.profile:
+            if self.profile_mode == "sample":
+                phase._profiler = StackSampler(threading.get_ident())
+                phase._profiler.start()
+            else:
+                phase._profiler = cProfile.Profile()
+                phase._profiler.enable()
+        phase._start_wall, phase._start_cpu = time.perf_counter(), time.process_time()
+
+    def _close(self, phase):
+        phase.wall = time.perf_counter() - phase._start_wall
+        phase.cpu = time.process_time() - phase._start_cpu
+        if phase._profiler is not None:
+            safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in phase.name)
+            if isinstance(phase._profiler, StackSampler):
+                phase._profiler.stop(f"profile-{safe}.folded")
+            else:
+                phase._profiler.disable()
+                phase._profiler.dump_stats(f"profile-{safe}.prof")
+            phase._profiler = None
+        if self.memory:
+            phase.alloc_peak = max(tracemalloc.get_traced_memory()[1], phase._outer_peak)
+            # let the enclosing phases see this peak after the next reset
+            for outer in self.stack:
+                if outer is not phase:
+                    outer._outer_peak = max(outer._outer_peak, phase.alloc_peak)
+        phase.rss_mb = peak_rss_mb()
+
+    def _push(self, name, items, is_step):
+        phase = Phase(name, items, is_step)
+        self.stack[-1].children.append(phase)
+        self.stack.append(phase)
+        self._open(phase)
+        return phase
+
+    def _pop_through(self, phase):
+        while len(self.stack) > 1:
+            top = self.stack.pop()
+            self._close(top)
+            if top is phase:
+                break
+
+    # --- public API ---
+    @contextmanager
+    def phase(self, name, items=None):
+        with self.lock:
+            phase = self._push(name, items, False)
+        try:
+            yield phase
+        finally:
+            with self.lock:
+                self._pop_through(phase)
+
+    def step(self, name, items=None):
+        """Ends the previous step at this level (if any) and starts a new one."""
+        with self.lock:
+            if self.stack[-1].is_step:
+                self._pop_through(self.stack[-1])
+            return self._push(name, items, True)
+
+    def end_step(self):
+        with self.lock:
+            if self.stack[-1].is_step:
+                self._pop_through(self.stack[-1])
+
+    def count(self, n=1):
+        with self.lock:
+            top = self.stack[-1]
+            top.items = (top.items or 0) + n
+
+    def timed(self, name=None):
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.phase(name or fn.__qualname__):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def finish(self, path=None):
+        """
+        Closes all phases, prints the summary and returns the trace. It is
+        written to path, or as SG_TRACE says; by default nothing is written,
+        so solvers that always call finish() leave no files behind.
+        """
+        with self.lock:
+            if self.finished:
+                return None
+            self.finished = True
+            self._pop_through(self.stack[1] if len(self.stack) > 1 else None)
+            self._close(self.root)
+            self.stack = [self.root]
+        trace = {"run": self.run_name, "argv": sys.argv, "memory_tracing": self.memory,
+                 **self.root.to_dict()}
+        path = path or os.environ.get("SG_TRACE") or "off"
+        if path == "1":
+            path = f"trace-{self.run_name}.json"
+        if path != "off":
+            with open(path, "w") as f:
+                json.dump(trace, f, indent=2)
+        print(self.summary(), file=sys.stderr)
+        return trace
+
+    def summary(self):
+        lines = [f"{'phase':<40} {'wall s':>9} {'cpu s':>9} {'items/s':>11} {'alloc MB':>9}"]
+
+        def walk(phase, depth):
+            rate = f"{phase.items / phase.wall:.1f}" if phase.items and phase.wall else ""
+            alloc = f"{phase.alloc_peak / 2 ** 20:.1f}" if phase.alloc_peak is not None else ""
+            lines.append(f"{'  ' * depth + phase.name:<40} {phase.wall or 0:>9.3f} "
+                         f"{phase.cpu or 0:>9.3f} {rate:>11} {alloc:>9}")
+            for child in phase.children:
+                walk(child, depth + 1)
+        walk(self.root, 0)
+        return "\n".join(lines)
+
+
+_default = None
+
+
+def get_tracer(run_name=None):
+    """The process-wide tracer, created on first use and named after the script."""
+    global _default
+    if _default is None:
+        name = run_name or os.path.splitext(os.path.basename(sys.argv[0] or "run"))[0] or "run"
+        _default = Tracer(name)
+    return _default
+
+
+def phase(name, items=None):
+    return get_tracer().phase(name, items)
+
+
+def step(name, items=None):
+    return get_tracer().step(name, items)
+
+
+def end_step():
+    return get_tracer().end_step()
+
+
+def count(n=1):
+    return get_tracer().count(n)
+
+
+def timed(name=None):
+    return get_tracer().timed(name)
+
+
+def finish(path=None):
+    return get_tracer().finish(path)